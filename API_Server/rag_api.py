@@ -1,13 +1,17 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import json
 import sys
 import os
+import atexit
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from RAG_System.complete_rag_system import ProductionRAGSystem
+from API_Server.utils.config import system_options
+from API_Server.utils.response_formatter import (API_ENDPOINTS, format_retrieval, format_conversation,
+                                                 format_exchange, format_stats, format_stream_event,
+                                                 format_stream_error)
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -16,13 +20,27 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Initialize RAG system
-try:
-    rag_system = ProductionRAGSystem()
-    logger.info("RAG System initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize RAG system: {e}")
-    rag_system = None
+def init_rag_system(**overrides):
+    """Build the RAG system used by the endpoints; returns None on failure"""
+    global rag_system
+    try:
+        rag_system = ProductionRAGSystem(**{**system_options(), **overrides})
+        logger.info("RAG System initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize RAG system: {e}")
+        rag_system = None
+    return rag_system
+
+# Initialize RAG system; the pre-fork server (serve_multiprocess.py) sets
+# RAG_PREFORK and builds one read replica per worker after forking instead
+rag_system = None
+if os.environ.get('RAG_PREFORK') != '1' and init_rag_system():
+    # Drain background writes and persist the index on shutdown so the
+    # next start can skip the rebuild
+    atexit.register(rag_system.shutdown)
+
+# Upper bound on queries accepted by /api/retrieve_batch
+MAX_BATCH_QUERIES = 100
 
 @app.route('/api/retrieve', methods=['POST'])
 def retrieve_context():
@@ -38,6 +56,8 @@ def retrieve_context():
         query = data.get('query', '')
         conversation_history = data.get('conversation_history', [])
         top_k = data.get('top_k', 5)
+        nprobe = data.get('nprobe')
+        ef_search = data.get('ef_search')
         
         if not query:
             return jsonify({'error': 'Query is required'}), 400
@@ -46,30 +66,59 @@ def retrieve_context():
         retrieved_docs = rag_system.retrieve_context(
             query, 
             conversation_history=conversation_history, 
-            top_k=top_k
+            top_k=top_k,
+            nprobe=nprobe,
+            ef_search=ef_search
         )
         
         # Format response
-        response = {
-            'query': query,
-            'context': rag_system.format_context_for_llm(retrieved_docs),
-            'sources': rag_system.get_sources(retrieved_docs),
-            'retrieved_documents': [
-                {
-                    'content': doc.content,
-                    'source': doc.source,
-                    'relevance_score': doc.relevance_score,
-                    'metadata': doc.metadata
-                } for doc in retrieved_docs
-            ]
-        }
-        
-        return jsonify(response)
+        return jsonify(format_retrieval(rag_system, query, retrieved_docs))
     
     except Exception as e:
         logger.error(f"Error in retrieve endpoint: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/retrieve_batch', methods=['POST'])
+def retrieve_context_batch():
+    """Retrieve context for a list of queries in one request"""
+    try:
+        if not rag_system:
+            return jsonify({'error': 'RAG system not initialized'}), 500
+            
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+        
+        # Items are either plain query strings or objects shaped like /api/retrieve bodies
+        items = data.get('queries', [])
+        if not items:
+            return jsonify({'error': 'Queries are required'}), 400
+        if len(items) > MAX_BATCH_QUERIES:
+            return jsonify({'error': f'At most {MAX_BATCH_QUERIES} queries per batch'}), 400
+        
+        items = [{'query': item} if isinstance(item, str) else item for item in items]
+        queries = [item.get('query', '') for item in items]
+        if not all(queries):
+            return jsonify({'error': 'Every item needs a query'}), 400
+        
+        default_top_k = data.get('top_k', 5)
+        results = rag_system.retrieve_context_batch(
+            queries,
+            conversation_histories=[item.get('conversation_history', []) for item in items],
+            top_ks=[item.get('top_k', default_top_k) for item in items],
+            nprobe=data.get('nprobe'),
+            ef_search=data.get('ef_search')
+        )
+        
+        return jsonify({
+            'results': [format_retrieval(rag_system, query, docs) for query, docs in zip(queries, results)],
+            'count': len(results)
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in retrieve_batch endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/add_knowledge', methods=['POST'])
 def add_knowledge():
     """Add new knowledge to the system"""
@@ -91,7 +140,7 @@ def add_knowledge():
         
         return jsonify({
             'message': f'Successfully added {len(documents)} documents',
-            'total_documents': len(rag_system.vector_store.documents)
+            'total_documents': rag_system.vector_store.document_count
         })
     
     except Exception as e:
@@ -107,7 +156,8 @@ def handle_conversation():
             
         data = request.get_json()
         user_message = data.get('message', '')
-        conversation_history = data.get('history', [])
+        session_id = data.get('session_id')
+        conversation_history = rag_system.conversation_history(session_id, data.get('history', []))
         
         if not user_message:
             return jsonify({'error': 'Message is required'}), 400
@@ -116,24 +166,12 @@ def handle_conversation():
         retrieved_docs = rag_system.retrieve_context(
             user_message, 
             conversation_history=conversation_history, 
-            top_k=5
+            top_k=5,
+            session_id=session_id
         )
         
         # Generate response context
-        response = {
-            'user_message': user_message,
-            'retrieved_context': rag_system.format_context_for_llm(retrieved_docs),
-            'sources': rag_system.get_sources(retrieved_docs),
-            'ready_for_llm': True,
-            'context_quality': len(retrieved_docs),
-            'retrieved_documents': [
-                {
-                    'content': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
-                    'source': doc.source,
-                    'relevance_score': doc.relevance_score
-                } for doc in retrieved_docs
-            ]
-        }
+        response = format_conversation(rag_system, user_message, retrieved_docs, session_id)
         
         return jsonify(response)
     
@@ -141,21 +179,67 @@ def handle_conversation():
         logger.error(f"Error in conversation endpoint: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/conversation/exchange', methods=['POST'])
+def add_conversation_exchange():
+    """Record a completed turn in a session's memory"""
+    try:
+        if not rag_system:
+            return jsonify({'error': 'RAG system not initialized'}), 500
+        
+        data = request.get_json(silent=True) or {}
+        session_id = data.get('session_id')
+        user_message = data.get('user_message', '')
+        assistant_response = data.get('assistant_response', '')
+        
+        if not session_id or not user_message or not assistant_response:
+            return jsonify({'error': 'session_id, user_message and assistant_response are required'}), 400
+        
+        rag_system.add_conversation_exchange(user_message, assistant_response, session_id)
+        return jsonify(format_exchange(rag_system, session_id))
+    
+    except Exception as e:
+        logger.error(f"Error in conversation exchange endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Keep proxies (nginx) from buffering the stream until it completes
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+@app.route('/api/conversation/stream', methods=['POST'])
+def handle_conversation_stream():
+    """Conversation turn as NDJSON: local hits first, then web hits, then the final ranked list"""
+    if not rag_system:
+        return jsonify({'error': 'RAG system not initialized'}), 500
+    
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message', '')
+    session_id = data.get('session_id')
+    conversation_history = rag_system.conversation_history(session_id, data.get('history', []))
+    
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    def generate():
+        try:
+            for event, docs in rag_system.retrieve_context_stream(
+                user_message, conversation_history=conversation_history, top_k=5, session_id=session_id
+            ):
+                yield format_stream_event(rag_system, event, user_message, docs, session_id)
+        except Exception as e:
+            logger.error(f"Error in conversation stream: {e}")
+            yield format_stream_error(str(e))
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers=STREAM_HEADERS)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     try:
-        documents_count = len(rag_system.vector_store.documents) if rag_system else 0
+        documents_count = rag_system.vector_store.document_count if rag_system else 0
         return jsonify({
             'status': 'healthy',
             'documents_count': documents_count,
             'system': 'RAG System v1.0',
-            'endpoints': [
-                'POST /api/retrieve - Retrieve context for queries',
-                'POST /api/add_knowledge - Add new documents',
-                'POST /api/conversation - Handle conversation with RAG',
-                'GET /api/health - Health check'
-            ]
+            'endpoints': API_ENDPOINTS
         })
     except Exception as e:
         return jsonify({
@@ -170,12 +254,7 @@ def get_stats():
         if not rag_system:
             return jsonify({'error': 'RAG system not initialized'}), 500
             
-        return jsonify({
-            'total_documents': len(rag_system.vector_store.documents),
-            'embedding_dimension': rag_system.vector_store.dimension,
-            'conversation_history_length': len(rag_system.conversation_memory.conversations),
-            'system_status': 'operational'
-        })
+        return jsonify(format_stats(rag_system))
     except Exception as e:
         logger.error(f"Error in stats endpoint: {e}")
         return jsonify({'error': str(e)}), 500
@@ -192,10 +271,12 @@ if __name__ == '__main__':
     print("Starting RAG API Server...")
     print("Available endpoints:")
     print("- POST /api/retrieve - Retrieve context for queries")
+    print("- POST /api/retrieve_batch - Retrieve context for a list of queries")
     print("- POST /api/add_knowledge - Add new documents")
     print("- POST /api/conversation - Handle conversation with RAG")
+    print("- POST /api/conversation/stream - Conversation context as NDJSON events")
     print("- GET /api/health - Health check")
     print("- GET /api/stats - System statistics")
     
-    # Run the app
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Run the app; the debug reloader would load the model twice, so it is opt-in
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG') == '1')
\ No newline at end of file
@@ -0,0 +1,290 @@
+import asyncio
+import sys
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RAG_System.complete_rag_system import ProductionRAGSystem
+from API_Server.utils.config import system_options
+from API_Server.utils.response_formatter import (API_ENDPOINTS, format_retrieval, format_conversation,
+                                                 format_exchange, format_stats, format_stream_event,
+                                                 format_stream_error)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Encode and FAISS search run here; the bound keeps CPU work from oversubscribing the cores
+cpu_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('RAG_CPU_WORKERS', min(8, os.cpu_count() or 1))),
+                                  thread_name_prefix="rag-cpu")
+# Web lookups mostly wait on sockets, so they get their own larger pool
+io_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('RAG_IO_WORKERS', 32)),
+                                 thread_name_prefix="rag-io")
+
+rag_system = None
+
+# Upper bound on queries accepted by /api/retrieve_batch
+MAX_BATCH_QUERIES = 100
+
+async def run_cpu(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, func, *args)
+
+async def run_io(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(io_executor, func, *args)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the RAG system off the event loop and shut it down cleanly"""
+    global rag_system
+    try:
+        rag_system = await run_cpu(lambda: ProductionRAGSystem(**system_options()))
+        logger.info("RAG System initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize RAG system: {e}")
+        rag_system = None
+    yield
+    if rag_system:
+        await run_cpu(rag_system.shutdown)
+    cpu_executor.shutdown()
+    io_executor.shutdown()
+
+app = FastAPI(title="RAG API Server", lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+def error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({'error': message}, status_code=status_code)
+
+async def read_json(request: Request):
+    """Parsed JSON body, or None when the body is missing or malformed"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+async def retrieve(query: str, conversation_history=None, top_k: int = 5, nprobe: int = None, ef_search: int = None,
+                   session_id: str = None):
+    """Async retrieve_context: each step of its flow on the CPU pool, the web awaited on the I/O pool"""
+    steps = rag_system.retrieval_steps(query, conversation_history, top_k, nprobe, ef_search, session_id)
+    web_request, results = await run_cpu(rag_system.advance, steps)
+    if web_request is not None:
+        web_results = await run_io(rag_system.fetch_web_results, *web_request)
+        _, results = await run_cpu(rag_system.advance, steps, web_results)
+    return results
+
+@app.post('/api/retrieve')
+async def retrieve_context(request: Request):
+    """Retrieve context for a given query"""
+    try:
+        if not rag_system:
+            return error('RAG system not initialized', 500)
+
+        data = await read_json(request)
+        if not data:
+            return error('No JSON data provided', 400)
+
+        query = data.get('query', '')
+        if not query:
+            return error('Query is required', 400)
+
+        retrieved_docs = await retrieve(query, data.get('conversation_history', []), data.get('top_k', 5),
+                                        data.get('nprobe'), data.get('ef_search'))
+        return format_retrieval(rag_system, query, retrieved_docs)
+
+    except Exception as e:
+        logger.error(f"Error in retrieve endpoint: {e}")
+        return error(str(e), 500)
+
+@app.post('/api/retrieve_batch')
+async def retrieve_context_batch(request: Request):
+    """Retrieve context for a list of queries in one request"""
+    try:
+        if not rag_system:
+            return error('RAG system not initialized', 500)
+
+        data = await read_json(request)
+        if not data:
+            return error('No JSON data provided', 400)
+
+        items = data.get('queries', [])
+        if not items:
+            return error('Queries are required', 400)
+        if len(items) > MAX_BATCH_QUERIES:
+            return error(f'At most {MAX_BATCH_QUERIES} queries per batch', 400)
+
+        items = [{'query': item} if isinstance(item, str) else item for item in items]
+        queries = [item.get('query', '') for item in items]
+        if not all(queries):
+            return error('Every item needs a query', 400)
+
+        default_top_k = data.get('top_k', 5)
+        top_ks = [item.get('top_k', default_top_k) for item in items]
+        local_results = await run_cpu(rag_system.local_search_batch, queries,
+                                      [item.get('conversation_history', []) for item in items],
+                                      top_ks, data.get('nprobe'), data.get('ef_search'))
+
+        async def augment(query, results, top_k):
+            web_docs = []
+            if rag_system.needs_web_results(results, top_k):
+                web_results = await run_io(rag_system.fetch_web_results, query, top_k)
+                web_docs = await run_cpu(rag_system.web_documents, web_results)
+            return rag_system.rank_results(results, top_k, web_docs)
+
+        # Web lookups for different queries overlap instead of running back to back
+        results = await asyncio.gather(*[augment(query, docs, top_k)
+                                         for query, docs, top_k in zip(queries, local_results, top_ks)])
+        return {
+            'results': [format_retrieval(rag_system, query, docs) for query, docs in zip(queries, results)],
+            'count': len(results)
+        }
+
+    except Exception as e:
+        logger.error(f"Error in retrieve_batch endpoint: {e}")
+        return error(str(e), 500)
+
+@app.post('/api/add_knowledge')
+async def add_knowledge(request: Request):
+    """Add new knowledge to the system"""
+    try:
+        if not rag_system:
+            return error('RAG system not initialized', 500)
+
+        data = await read_json(request) or {}
+        documents = data.get('documents', [])
+        if not documents:
+            return error('Documents are required', 400)
+
+        contents = [doc['content'] for doc in documents]
+        sources = [doc['source'] for doc in documents]
+        metadata = [doc.get('metadata', {}) for doc in documents]
+
+        await run_cpu(rag_system.vector_store.add_documents, contents, sources, metadata)
+
+        return {
+            'message': f'Successfully added {len(documents)} documents',
+            'total_documents': rag_system.vector_store.document_count
+        }
+
+    except Exception as e:
+        logger.error(f"Error in add_knowledge endpoint: {e}")
+        return error(str(e), 500)
+
+@app.post('/api/conversation')
+async def handle_conversation(request: Request):
+    """Handle a complete conversation turn with RAG"""
+    try:
+        if not rag_system:
+            return error('RAG system not initialized', 500)
+
+        data = await read_json(request) or {}
+        user_message = data.get('message', '')
+        if not user_message:
+            return error('Message is required', 400)
+
+        session_id = data.get('session_id')
+        history = await run_cpu(rag_system.conversation_history, session_id, data.get('history', []))
+        retrieved_docs = await retrieve(user_message, history, 5, session_id=session_id)
+        return format_conversation(rag_system, user_message, retrieved_docs, session_id)
+
+    except Exception as e:
+        logger.error(f"Error in conversation endpoint: {e}")
+        return error(str(e), 500)
+
+@app.post('/api/conversation/exchange')
+async def add_conversation_exchange(request: Request):
+    """Record a completed turn in a session's memory"""
+    try:
+        if not rag_system:
+            return error('RAG system not initialized', 500)
+
+        data = await read_json(request) or {}
+        session_id = data.get('session_id')
+        user_message = data.get('user_message', '')
+        assistant_response = data.get('assistant_response', '')
+        if not session_id or not user_message or not assistant_response:
+            return error('session_id, user_message and assistant_response are required', 400)
+
+        await run_cpu(rag_system.add_conversation_exchange, user_message, assistant_response, session_id)
+        return format_exchange(rag_system, session_id)
+
+    except Exception as e:
+        logger.error(f"Error in conversation exchange endpoint: {e}")
+        return error(str(e), 500)
+
+# Keep proxies (nginx) from buffering the stream until it completes
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+@app.post('/api/conversation/stream')
+async def handle_conversation_stream(request: Request):
+    """Conversation turn as NDJSON: local hits first, then web hits, then the final ranked list"""
+    if not rag_system:
+        return error('RAG system not initialized', 500)
+
+    data = await read_json(request) or {}
+    user_message = data.get('message', '')
+    session_id = data.get('session_id')
+    if not user_message:
+        return error('Message is required', 400)
+    conversation_history = await run_cpu(rag_system.conversation_history, session_id, data.get('history', []))
+
+    async def generate():
+        top_k = 5
+        try:
+            local_results = await run_cpu(rag_system.local_search, user_message, conversation_history, top_k,
+                                          None, None, session_id)
+            yield format_stream_event(rag_system, 'local', user_message, local_results, session_id)
+
+            web_docs = []
+            if rag_system.needs_web_results(local_results, top_k):
+                web_results = await run_io(rag_system.fetch_web_results, user_message, top_k)
+                web_docs = await run_cpu(rag_system.web_documents, web_results)
+                yield format_stream_event(rag_system, 'web', user_message, web_docs, session_id)
+
+            yield format_stream_event(rag_system, 'final', user_message,
+                                      rag_system.rank_results(local_results, top_k, web_docs), session_id)
+        except Exception as e:
+            logger.error(f"Error in conversation stream: {e}")
+            yield format_stream_error(str(e))
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson', headers=STREAM_HEADERS)
+
+@app.get('/api/health')
+async def health_check():
+    """Health check endpoint"""
+    try:
+        documents_count = rag_system.vector_store.document_count if rag_system else 0
+        return {
+            'status': 'healthy',
+            'documents_count': documents_count,
+            'system': 'RAG System v1.0',
+            'endpoints': API_ENDPOINTS
+        }
+    except Exception as e:
+        return JSONResponse({'status': 'unhealthy', 'error': str(e)}, status_code=500)
+
+@app.get('/api/stats')
+async def get_stats():
+    """Get system statistics"""
+    try:
+        if not rag_system:
+            return error('RAG system not initialized', 500)
+        return format_stats(rag_system)
+    except Exception as e:
+        logger.error(f"Error in stats endpoint: {e}")
+        return error(str(e), 500)
+
+@app.exception_handler(404)
+async def not_found(request: Request, exc):
+    return error('Endpoint not found', 404)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("Starting async RAG API Server on http://0.0.0.0:8000")
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 8000)))
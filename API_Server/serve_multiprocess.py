@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Pre-fork multi-process server for the RAG API.
+
+One writer process owns the database and publishes FAISS snapshots; N worker
+processes serve HTTP on a shared socket as read replicas that memory-map the
+published snapshot and fetch documents from SQLite on demand. The
+SentenceTransformer weights are loaded once before forking and shared
+copy-on-write, so memory stays roughly flat as --workers grows.
+
+Use an IVF index (RAG_INDEX_TYPE=ivf_flat or ivf_pq) to share the vectors too: FAISS
+can only memory-map inverted lists, so flat and HNSW indexes are still read
+into each worker.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import logging
+
+os.environ['RAG_PREFORK'] = '1'
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rag_api
+from RAG_System.embedding_cache import get_embedding_model
+from RAG_System.serving import run_snapshot_writer
+from werkzeug.serving import make_server
+
+logger = logging.getLogger(__name__)
+
+def run_writer(*args, **kwargs):
+    """Writer process: outlive Ctrl-C so it can publish what the workers flush"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_snapshot_writer(*args, **kwargs)
+
+def serve_worker(fd: int, write_queue):
+    """Worker process: build a read replica and serve requests on the shared socket"""
+    rag_api.init_rag_system(write_queue=write_queue, lazy_documents=True, mmap_snapshot=True)
+    server = make_server('0.0.0.0', 0, rag_api.app, threaded=True, fd=fd)
+    # shutdown() blocks until serve_forever returns, so it can't run on this thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    logger.info(f"Worker {os.getpid()} serving")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if rag_api.rag_system:
+            # Hand any queued web knowledge to the writer before exiting
+            rag_api.rag_system.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--publish-interval', type=float, default=1.0,
+                        help='seconds between snapshots published by the writer')
+    args = parser.parse_args()
+
+    options = rag_api.system_options()
+    if options['index_config'].index_type not in ('ivf_flat', 'ivf_pq'):
+        logger.warning(f"{options['index_config'].index_type} indexes cannot be memory-mapped; "
+                       f"each worker will hold its own copy of the vectors")
+
+    ctx = multiprocessing.get_context('fork')
+    write_queue = ctx.Queue()
+    ready = ctx.Event()
+
+    writer = ctx.Process(target=run_writer, name='snapshot-writer',
+                         args=(write_queue, ready, {**options, 'lazy_documents': True}),
+                         kwargs={'publish_interval': args.publish_interval})
+    writer.start()
+    ready.wait()
+
+    # Load the model weights once; forked workers share the pages copy-on-write
+    get_embedding_model()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    workers = [ctx.Process(target=serve_worker, name=f'rag-worker-{i}', args=(sock.fileno(), write_queue))
+               for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers and one snapshot writer")
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for worker in workers:
+            worker.join()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+        # Workers have flushed their writes; let the writer publish and stop
+        write_queue.put(None)
+        writer.join()
+        sock.close()
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ Utility functions for API Server
 """
 
 from .response_formatter import format_response, format_error
+from .config import system_options
 from .error_handler import handle_api_error
 
-__all__ = ['format_response', 'format_error', 'handle_api_error']
\ No newline at end of file
+__all__ = ['format_response', 'format_error', 'handle_api_error', 'system_options']
\ No newline at end of file
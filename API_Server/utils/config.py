@@ -0,0 +1,18 @@
+import os
+from typing import Any, Dict
+
+from RAG_System.index_factory import IndexConfig
+
+def system_options() -> Dict[str, Any]:
+    """ProductionRAGSystem options taken from the environment"""
+    return {
+        'index_config': IndexConfig(index_type=os.environ.get('RAG_INDEX_TYPE', 'flat'),
+                                    quantization=os.environ.get('RAG_QUANTIZATION', 'none'),
+                                    rerank_factor=int(os.environ.get('RAG_RERANK_FACTOR', 0))),
+        'lazy_documents': os.environ.get('RAG_LAZY_DOCUMENTS', '0') == '1',
+        'web_cache_path': os.environ.get('RAG_WEB_CACHE_PATH'),
+        'hybrid_search': os.environ.get('RAG_HYBRID_SEARCH', '1') == '1',
+        'query_cache_size': int(os.environ.get('RAG_QUERY_CACHE_SIZE', 1024)),
+        'session_cache_size': int(os.environ.get('RAG_SESSION_CACHE_SIZE', 1000)),
+        'web_concurrency': int(os.environ.get('RAG_WEB_CONCURRENCY', 8))
+    }
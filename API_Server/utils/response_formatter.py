@@ -1,6 +1,10 @@
+import os
+import json
 from typing import Any, Dict, List, Optional
 from datetime import datetime
 
+from RAG_System.index_factory import index_type_of, quantization_of
+
 def format_response(data: Any, status: str = "success", message: str = None) -> Dict[str, Any]:
     """Format API response in standard format"""
     response = {
@@ -46,3 +50,104 @@ def format_rag_response(
         "retrieved_documents": retrieved_docs,
         "document_count": len(retrieved_docs)
     })
+
+# Endpoints advertised by /api/health on both the Flask and the async server
+API_ENDPOINTS = [
+    'POST /api/retrieve - Retrieve context for queries',
+    'POST /api/retrieve_batch - Retrieve context for a list of queries',
+    'POST /api/add_knowledge - Add new documents',
+    'POST /api/conversation - Handle conversation with RAG',
+    'POST /api/conversation/stream - Conversation context as NDJSON events',
+    'POST /api/conversation/exchange - Record a turn in a session',
+    'GET /api/health - Health check'
+]
+
+def format_retrieval(rag_system, query: str, retrieved_docs: List) -> Dict[str, Any]:
+    """Body of /api/retrieve and of each /api/retrieve_batch result"""
+    return {
+        'query': query,
+        'context': rag_system.format_context_for_llm(retrieved_docs),
+        'sources': rag_system.get_sources(retrieved_docs),
+        'retrieved_documents': [
+            {
+                'content': doc.content,
+                'source': doc.source,
+                'relevance_score': doc.relevance_score,
+                'metadata': doc.metadata
+            } for doc in retrieved_docs
+        ]
+    }
+
+def format_document_previews(retrieved_docs: List) -> List[Dict[str, Any]]:
+    """Documents with content cut to 200 characters, as /api/conversation returns them"""
+    return [
+        {
+            'content': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
+            'source': doc.source,
+            'relevance_score': doc.relevance_score
+        } for doc in retrieved_docs
+    ]
+
+def format_conversation(rag_system, user_message: str, retrieved_docs: List,
+                        session_id: Optional[str] = None) -> Dict[str, Any]:
+    """Body of /api/conversation"""
+    return {
+        'user_message': user_message,
+        'session_id': session_id,
+        'retrieved_context': rag_system.format_context_for_llm(retrieved_docs),
+        'sources': rag_system.get_sources(retrieved_docs),
+        'ready_for_llm': True,
+        'context_quality': len(retrieved_docs),
+        'retrieved_documents': format_document_previews(retrieved_docs)
+    }
+
+def format_stream_event(rag_system, event: str, user_message: str, retrieved_docs: List,
+                        session_id: Optional[str] = None) -> str:
+    """One NDJSON line of /api/conversation/stream
+
+    'local' and 'web' events carry that stage's documents as they arrive; the
+    'final' event carries the full /api/conversation body for the ranked list.
+    """
+    if event == 'final':
+        body = format_conversation(rag_system, user_message, retrieved_docs, session_id)
+    else:
+        body = {
+            'sources': rag_system.get_sources(retrieved_docs),
+            'retrieved_documents': format_document_previews(retrieved_docs)
+        }
+    return json.dumps({'event': event, **body}) + "\n"
+
+def format_exchange(rag_system, session_id: str) -> Dict[str, Any]:
+    """Body of /api/conversation/exchange"""
+    return {
+        'session_id': session_id,
+        'history_length': len(rag_system.sessions.get(session_id).conversations)
+    }
+
+def format_stream_error(message: str) -> str:
+    """NDJSON line reporting a failure after the stream has started"""
+    return json.dumps({'event': 'error', 'error': message}) + "\n"
+
+def format_stats(rag_system) -> Dict[str, Any]:
+    """Body of /api/stats"""
+    vector_store = rag_system.vector_store
+    return {
+        'total_documents': vector_store.document_count,
+        'embedding_dimension': vector_store.dimension,
+        'index_type': index_type_of(vector_store.index),
+        'quantization': quantization_of(vector_store.index),
+        'store_version': vector_store.store_version,
+        'read_only': vector_store.read_only,
+        'pid': os.getpid(),
+        'document_cache': vector_store.document_cache.stats(),
+        'embedding_cache': vector_store.embedding_model.stats(),
+        'embedding_batcher': vector_store.query_encoder.stats(),
+        'web_cache': rag_system.knowledge_cache.stats(),
+        'query_cache': rag_system.query_cache.stats(),
+        'history_embeddings': rag_system.history_embeddings.stats(),
+        'ingestion': rag_system.ingestion_worker.stats(),
+        'conversation_history_length': len(rag_system.conversation_memory.conversations),
+        'sessions': rag_system.sessions.stats(),
+        'conversation_writer': rag_system.conversation_writer.stats(),
+        'system_status': 'operational'
+    }
@@ -0,0 +1,75 @@
+import re
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
+# Room for the [CLS] / [SEP] tokens the model adds around every input
+SPECIAL_TOKENS = 2
+
+class TextChunker:
+    """Token-aware sliding-window splitter
+
+    Windows are measured in the embedding model's own tokens (falling back
+    to whitespace words when no tokenizer is available) and cut on token
+    boundaries, so each chunk fits the model's max_seq_length and nothing
+    is silently truncated. Consecutive windows share `overlap` tokens.
+    """
+    def __init__(self, tokenizer=None, max_tokens: int = 256, overlap: int = 32):
+        if overlap >= max_tokens:
+            raise ValueError("overlap must be smaller than max_tokens")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+
+    @classmethod
+    def for_model(cls, model, overlap: int = 32) -> "TextChunker":
+        """Chunker sized to a SentenceTransformer-like model's input limit"""
+        max_seq_length = getattr(model, 'max_seq_length', None) or 256
+        return cls(getattr(model, 'tokenizer', None), max_seq_length - SPECIAL_TOKENS, overlap)
+
+    def token_spans(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) character offsets of each token"""
+        if self.tokenizer is not None and getattr(self.tokenizer, 'is_fast', False):
+            encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+            return [tuple(span) for span in encoding['offset_mapping']]
+        return [match.span() for match in re.finditer(r'\S+', text)]
+
+    def split(self, text: str) -> List[str]:
+        """The text itself if it fits one window, else overlapping windows of it"""
+        spans = self.token_spans(text)
+        if len(spans) <= self.max_tokens:
+            return [text]
+
+        chunks = []
+        step = self.max_tokens - self.overlap
+        for start in range(0, len(spans), step):
+            window = spans[start:start + self.max_tokens]
+            chunks.append(text[window[0][0]:window[-1][1]])
+            if start + self.max_tokens >= len(spans):
+                break
+        return chunks
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Consecutive lists of up to size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def collapse_siblings(results: List, top_k: int) -> List:
+    """Keep the best-scoring chunk per parent document, preserving rank order
+
+    The kept chunk's metadata gains matched_chunks, the number of sibling
+    chunks that were hits.
+    """
+    collapsed = {}
+    for doc in results:
+        key = doc.metadata.get('parent_id', doc.id)
+        if key in collapsed:
+            collapsed[key].metadata['matched_chunks'] += 1
+            continue
+        if 'parent_id' in doc.metadata:
+            doc.metadata = {**doc.metadata, 'matched_chunks': 1}
+        collapsed[key] = doc
+    return list(collapsed.values())[:top_k]
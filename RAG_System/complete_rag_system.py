@@ -2,77 +2,159 @@ import numpy as np
 import faiss
 import sqlite3
 import requests
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Union, Iterable, Iterator, Callable, Generator
+from collections import deque
 import json
 import hashlib
 from datetime import datetime
 import logging
-from dataclasses import dataclass
-from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, replace
+from concurrent.futures import ThreadPoolExecutor, wait
+import threading
 import re
+import time
 import os
 
+from .index_factory import IndexConfig, build_index, upgrade_index, search_parameters, trained_nlist, undertrained
+from .lru_cache import LRUCache
+from .embedding_cache import get_embedding_model
+from .embedding_batcher import EmbeddingBatcher
+from .retriever import WebRetriever
+from .ttl_cache import TTLCache
+from .ingestion import IngestionWorker
+from .rwlock import ReadWriteLock
+from .chunking import TextChunker, batched, collapse_siblings
+from .sqlite_pool import SQLiteConnectionManager
+from .query_cache import SemanticQueryCache
+from .quantization import encode_embedding, decode_embedding, read_index, write_index
+from .session_store import SessionManager
+from .conversation_writer import ConversationWriter
+from .context_window import ContextWindow, count_tokens
+from .history_embeddings import HistoryEmbeddingCache
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump when the on-disk snapshot layout changes
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Reciprocal-rank fusion damping constant; 60 is the value from the original RRF paper
+RRF_K = 60
+# Candidates taken from each retriever per requested result before fusing
+HYBRID_DEPTH = 4
+# Best BM25 hits matching every query term kept even below the cosine threshold
+LEXICAL_TRUSTED = 2
+# Hits fetched per requested result so collapsing sibling chunks still fills top_k
+SIBLING_OVERFETCH = 2
+# Words too common to count as lexical evidence
+LEXICAL_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me of on or "
+    "should that the this to use used using what when where which who why with you your".split()
+)
+
 @dataclass
 class Document:
     id: str
     content: str
     source: str
-    embedding: np.ndarray
+    embedding: Optional[np.ndarray]  # None when the vector only lives in the FAISS snapshot
     metadata: Dict[str, Any]
     timestamp: datetime
     relevance_score: float = 0.0
+    lexical_match: bool = False  # hybrid search found every query term in it
 
 class ConversationMemory:
-    """Manages conversation history and context"""
-    def __init__(self, max_history: int = 10):
+    """Manages conversation history and context
+    
+    The context is the most recent context_turns exchanges that fit in
+    context_tokens tokens, kept up to date incrementally by a ContextWindow.
+    """
+    def __init__(self, max_history: int = 10, context_turns: int = 5, context_tokens: int = 1024,
+                 token_counter: Callable[[str], int] = count_tokens):
         self.max_history = max_history
-        self.conversations = []
-        self.context_summary = ""
+        self.conversations = deque(maxlen=max_history)
+        self.context = ContextWindow(context_tokens, context_turns, max_history, token_counter)
     
-    def add_exchange(self, user_message: str, assistant_response: str):
+    def add_exchange(self, user_message: str, assistant_response: str, timestamp: datetime = None):
         """Add a conversation exchange"""
         exchange = {
             "user": user_message,
             "assistant": assistant_response,
-            "timestamp": datetime.now()
+            "timestamp": timestamp or datetime.now()
         }
         self.conversations.append(exchange)
-        
-        # Maintain history limit
-        if len(self.conversations) > self.max_history:
-            self.conversations = self.conversations[-self.max_history:]
-        
-        # Update context summary
-        self._update_context_summary()
+        self.context.append(f"User: {user_message}\nAssistant: {assistant_response}\n")
     
-    def _update_context_summary(self):
-        """Create a summary of recent conversation context"""
-        recent_context = ""
-        for exchange in self.conversations[-5:]:  # Last 5 exchanges
-            recent_context += f"User: {exchange['user']}\nAssistant: {exchange['assistant']}\n"
-        self.context_summary = recent_context
+    @property
+    def context_summary(self) -> str:
+        return self.context.text()
     
     def get_context(self) -> str:
         """Get conversation context for RAG retrieval"""
-        return self.context_summary
+        return self.context.text()
 
 class EnhancedVectorStore:
-    """Production-ready vector store with persistence"""
-    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2", db_path: str = "Database/data/rag_store.db"):
-        self.embedding_model = SentenceTransformer(embedding_model)
+    """Production-ready vector store with persistence
+    
+    With lazy_documents=True only the FAISS index stays resident; content and
+    metadata for search hits are read from SQLite by faiss_id and kept in a
+    bounded LRU of hot documents, and self.documents stays empty.
+    
+    Searches run concurrently under a shared read lock. Writers are
+    serialized by _write_mutex and do their encoding and SQLite work outside
+    the read/write lock, holding it exclusively only while the index and id
+    maps are updated, so readers never see a FAISS id without its document.
+    
+    Passing write_queue makes the store a read replica for multi-process
+    serving: writes are forwarded to the queue for a single writer process
+    (see serving.run_snapshot_writer), and searches pick up the snapshots it
+    publishes. Replicas must use lazy_documents so hits come from SQLite.
+    """
+    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2", db_path: str = "Database/data/rag_store.db",
+                 index_config: IndexConfig = None, mmap_snapshot: bool = False,
+                 lazy_documents: bool = False, document_cache_size: int = 1024,
+                 embedding_cache_path: Optional[str] = None,
+                 batch_max_size: int = 32, batch_max_wait_ms: float = 5.0,
+                 write_queue=None, refresh_interval: float = 1.0, chunk_overlap: int = 32):
+        if write_queue is not None and not lazy_documents:
+            raise ValueError("Read replicas require lazy_documents=True")
+        self.embedding_model_name = embedding_model
+        # Embeddings are cached next to the store unless another path is given
+        self.embedding_model = get_embedding_model(
+            embedding_model,
+            embedding_cache_path or os.path.join(os.path.dirname(db_path), "embedding_cache.db")
+        )
+        # Query-time encodes from concurrent request threads share forward passes
+        self.query_encoder = EmbeddingBatcher(self.embedding_model, batch_max_size, batch_max_wait_ms)
         self.dimension = self.embedding_model.get_sentence_embedding_dimension()
+        # Documents longer than the model's input window are split instead of truncated
+        self.chunker = TextChunker.for_model(self.embedding_model, chunk_overlap)
         self.db_path = db_path
+        # Per-thread WAL connections, reused across calls
+        self.db = SQLiteConnectionManager(db_path)
+        self.index_config = index_config or IndexConfig()
+        self.mmap_snapshot = mmap_snapshot
+        self.lazy_documents = lazy_documents
+        self.document_cache = LRUCache(document_cache_size)  # faiss_id -> Document (lazy mode)
+        self.store_version = 0
+        self._index_mapped = False
+        self._rw_lock = ReadWriteLock()
+        self._write_mutex = threading.RLock()
+        self.write_queue = write_queue
+        self.refresh_interval = refresh_interval
+        self._snapshot_mtime = None
+        self._snapshot_checked = 0.0
         
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
-        # Initialize FAISS index
-        self.index = faiss.IndexFlatIP(self.dimension)
+        # Initialize FAISS index; rows are addressed by the int64 faiss_id
+        # persisted in the documents table rather than by insertion order
+        self.index = build_index(self.index_config, self.dimension)
         self.documents = {}
+        self._faiss_ids = {}  # doc_id -> faiss_id
+        self._doc_ids = []    # faiss_id -> doc_id (array-backed, O(1) lookup)
+        self._next_faiss_id = 0
         
         # Initialize SQLite for metadata persistence
         self._init_database()
@@ -80,35 +162,216 @@ class EnhancedVectorStore:
     
     def _init_database(self):
         """Initialize SQLite database for document persistence"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS documents (
-                id TEXT PRIMARY KEY,
-                content TEXT NOT NULL,
-                source TEXT NOT NULL,
-                embedding BLOB NOT NULL,
-                metadata TEXT NOT NULL,
-                timestamp TEXT NOT NULL
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    metadata TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    faiss_id INTEGER
+                )
+            ''')
+            
+            # Stores created before faiss_id existed need the column and a backfill
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(documents)')]
+            if 'faiss_id' not in columns:
+                cursor.execute('ALTER TABLE documents ADD COLUMN faiss_id INTEGER')
+            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_faiss_id ON documents(faiss_id)')
+            
+            cursor.execute('SELECT COALESCE(MAX(faiss_id), -1) FROM documents')
+            next_id = cursor.fetchone()[0] + 1
+            cursor.execute('SELECT id FROM documents WHERE faiss_id IS NULL ORDER BY rowid')
+            missing = [row[0] for row in cursor.fetchall()]
+            if missing:
+                cursor.executemany(
+                    'UPDATE documents SET faiss_id = ? WHERE id = ?',
+                    [(next_id + i, doc_id) for i, doc_id in enumerate(missing)]
+                )
+                logger.info(f"Assigned faiss ids to {len(missing)} existing documents")
+            
+            # Change counter used to tell whether an index snapshot is still current
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS store_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('version', 0)")
+            if missing:
+                self._bump_store_version(cursor)
+            
+            # BM25 index over content and source, keyed by faiss_id; it reads the
+            # text from the documents table instead of keeping a second copy
+            try:
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                        content, source,
+                        content='documents', content_rowid='faiss_id',
+                        tokenize='porter unicode61'
+                    )
+                ''')
+                # New, or created empty next to existing documents (e.g. by an older
+                # setup script): the docsize shadow table counts the rows indexed
+                cursor.execute('SELECT COUNT(*) FROM documents_fts_docsize')
+                indexed = cursor.fetchone()[0]
+                cursor.execute('SELECT COUNT(*) FROM documents')
+                if indexed != cursor.fetchone()[0]:
+                    cursor.execute("INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')")
+                self.lexical_index = True
+            except sqlite3.OperationalError as e:
+                logger.warning(f"SQLite FTS5 unavailable, hybrid search disabled: {e}")
+                self.lexical_index = False
+    
+    def _bump_store_version(self, cursor) -> int:
+        """Increment the change counter inside the caller's transaction, returning the new value
+        
+        store_version is left alone: the caller publishes the new value together
+        with the index rows it describes, so readers never pair it with an older index.
+        """
+        cursor.execute("UPDATE store_meta SET value = value + 1 WHERE key = 'version'")
+        cursor.execute("SELECT value FROM store_meta WHERE key = 'version'")
+        return cursor.fetchone()[0]
+    
+    def _snapshot_paths(self) -> Tuple[str, str, str]:
+        """Index, id map and manifest paths stored next to the database"""
+        base = os.path.splitext(self.db_path)[0]
+        return f"{base}.faiss", f"{base}.ids.npy", f"{base}.snapshot.json"
+    
+    def _snapshot_manifest(self) -> Dict[str, Any]:
+        """Everything a snapshot must match to be reused"""
+        build_config = asdict(self.index_config)
+        # Search-time knobs don't change the stored index
+        build_config.pop('nprobe')
+        build_config.pop('ef_search')
+        build_config.pop('rerank_factor')
+        return {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'store_version': self.store_version,
+            'embedding_model': self.embedding_model_name,
+            'dimension': self.dimension,
+            'index_config': build_config,
+            'count': int(self.index.ntotal),
+            'trained_nlist': trained_nlist(self.index)
+        }
+    
+    def save_snapshot(self):
+        """Write the FAISS index and id map next to the database for fast cold starts"""
+        index_path, ids_path, manifest_path = self._snapshot_paths()
+        
+        # Writers are held off so the index, id map and manifest agree
+        with self._write_mutex:
+            # Write to temporary files first so a crash never leaves a torn snapshot;
+            # the manifest goes last since it is what marks the snapshot as valid
+            doc_ids = self._doc_ids
+            if self.lazy_documents:
+                doc_ids = [None] * self._next_faiss_id
+                for doc_id, faiss_id in self.db.connection().execute('SELECT id, faiss_id FROM documents'):
+                    doc_ids[faiss_id] = doc_id
+            
+            write_index(self.index, f"{index_path}.tmp")
+            with open(f"{ids_path}.tmp", 'wb') as f:
+                np.save(f, np.array([doc_id or '' for doc_id in doc_ids], dtype=str))
+            with open(f"{manifest_path}.tmp", 'w') as f:
+                json.dump(self._snapshot_manifest(), f)
+            
+            os.replace(f"{index_path}.tmp", index_path)
+            os.replace(f"{ids_path}.tmp", ids_path)
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+            logger.info(f"Saved index snapshot at store version {self.store_version}")
+    
+    def _load_snapshot(self, version: int) -> bool:
+        """Load the index snapshot if it matches the database at version, returning False when stale"""
+        index_path, ids_path, manifest_path = self._snapshot_paths()
+        if not all(os.path.exists(path) for path in (index_path, ids_path, manifest_path)):
+            return False
+        
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            
+            expected = self._snapshot_manifest()
+            expected['store_version'] = version
+            expected.pop('count')
+            expected.pop('trained_nlist')
+            if any(manifest.get(key) != value for key, value in expected.items()):
+                logger.info("Index snapshot is stale, rebuilding from database")
+                return False
+            if undertrained(self.index_config, manifest['count'], manifest.get('trained_nlist', 0)):
+                logger.info(f"Index snapshot has nlist={manifest['trained_nlist']} for {manifest['count']} "
+                            f"vectors, retraining from database")
+                return False
+            
+            # Memory-mapping keeps IVF lists on disk, but makes them read-only
+            flags = faiss.IO_FLAG_MMAP if self.mmap_snapshot else 0
+            index = read_index(index_path, self.dimension, self.index_config.quantization, flags)
+            # Lazy stores resolve hits through SQLite and never need the id map
+            doc_ids = np.empty(0, dtype=str) if self.lazy_documents else np.load(ids_path)
+            if index.ntotal != manifest['count']:
+                logger.warning("Index snapshot is incomplete, rebuilding from database")
+                return False
+        except Exception as e:
+            logger.error(f"Failed to load index snapshot: {e}")
+            return False
+        
+        self.index = index
+        self._index_mapped = self.mmap_snapshot
+        self._snapshot_mtime = mtime
+        for faiss_id, doc_id in enumerate(doc_ids.tolist()):
+            if doc_id:
+                self._register_id(doc_id, faiss_id)
+        return True
     
     def _load_from_database(self):
         """Load existing documents from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM documents')
+        cursor = self.db.connection().cursor()
+        cursor.execute("SELECT value FROM store_meta WHERE key = 'version'")
+        version = cursor.fetchone()[0]
+        
+        if self.lazy_documents:
+            rebuilt = self._load_index_only(cursor, version)
+        else:
+            rebuilt = self._load_documents(cursor, version)
+        # Set once the index and id map match it, so readers never see it ahead of them
+        self.store_version = version
+        if rebuilt and not self.read_only:
+            self.save_snapshot()
+    
+    def _load_documents(self, cursor, version: int) -> bool:
+        """Load documents and the index, returning True if the index was rebuilt from the database"""
+        if self._load_snapshot(version):
+            # Vectors and id map came from the snapshot; skip the embedding blobs
+            cursor.execute('SELECT id, content, source, metadata, timestamp FROM documents')
+            for doc_id, content, source, metadata_json, timestamp in cursor.fetchall():
+                self.documents[doc_id] = Document(
+                    id=doc_id,
+                    content=content,
+                    source=source,
+                    embedding=None,
+                    metadata=json.loads(metadata_json),
+                    timestamp=datetime.fromisoformat(timestamp)
+                )
+            logger.info(f"Loaded {len(self.documents)} documents from database (index from snapshot)")
+            return False
+        
+        cursor.execute('''
+            SELECT id, content, source, embedding, metadata, timestamp, faiss_id
+            FROM documents ORDER BY faiss_id
+        ''')
         rows = cursor.fetchall()
         
         embeddings = []
+        faiss_ids = []
         for row in rows:
-            doc_id, content, source, embedding_blob, metadata_json, timestamp = row
+            doc_id, content, source, embedding_blob, metadata_json, timestamp, faiss_id = row
             
             # Deserialize embedding
-            embedding = np.frombuffer(embedding_blob, dtype=np.float32)
+            embedding = decode_embedding(embedding_blob, self.dimension)
             embeddings.append(embedding)
+            faiss_ids.append(faiss_id)
             
             # Create document object
             metadata = json.loads(metadata_json)
@@ -116,86 +379,540 @@ class EnhancedVectorStore:
                 id=doc_id,
                 content=content,
                 source=source,
-                embedding=embedding,
+                embedding=self._resident_embedding(embedding),
                 metadata=metadata,
                 timestamp=datetime.fromisoformat(timestamp)
             )
             self.documents[doc_id] = doc
+            self._register_id(doc_id, faiss_id)
         
-        # Rebuild FAISS index
+        # Rebuild FAISS index, training it on the stored embeddings if needed
         if embeddings:
-            embeddings_array = np.vstack(embeddings)
-            self.index.add(embeddings_array.astype('float32'))
+            embeddings_array = np.vstack(embeddings).astype('float32')
+            self.index = build_index(self.index_config, self.dimension, embeddings_array)
+            self.index.add_with_ids(embeddings_array,
+                                    np.array(faiss_ids, dtype=np.int64))
         
-        conn.close()
         logger.info(f"Loaded {len(self.documents)} documents from database")
+        return bool(embeddings)
+    
+    def _load_index_only(self, cursor, version: int) -> bool:
+        """Lazy-mode load: bring up the FAISS index without materializing documents"""
+        cursor.execute('SELECT COUNT(*), COALESCE(MAX(faiss_id), -1) FROM documents')
+        count, max_faiss_id = cursor.fetchone()
+        self._next_faiss_id = max_faiss_id + 1
+        
+        if self._load_snapshot(version):
+            logger.info(f"Loaded index for {count} documents from snapshot (lazy documents)")
+            return False
+        
+        if count == 0:
+            return False
+        
+        embeddings, faiss_ids = self._stored_vectors(cursor, count)
+        self.index = build_index(self.index_config, self.dimension, embeddings)
+        self.index.add_with_ids(embeddings, faiss_ids)
+        logger.info(f"Loaded index for {count} documents from database (lazy documents)")
+        return True
     
-    def add_documents(self, contents: List[str], sources: List[str], metadata_list: List[Dict] = None):
-        """Add documents to the vector store"""
+    def _stored_vectors(self, cursor, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """All stored embeddings and their faiss_ids, in faiss_id order"""
+        # Fill preallocated arrays straight from the cursor to avoid a second copy
+        embeddings = np.empty((count, self.dimension), dtype=np.float32)
+        faiss_ids = np.empty(count, dtype=np.int64)
+        cursor.execute('SELECT embedding, faiss_id FROM documents ORDER BY faiss_id LIMIT ?', (count,))
+        for i, (embedding_blob, faiss_id) in enumerate(cursor):
+            embeddings[i] = decode_embedding(embedding_blob, self.dimension)
+            faiss_ids[i] = faiss_id
+        return embeddings, faiss_ids
+    
+    def _retrain_index(self):
+        """Rebuild the IVF index with as many lists as the corpus now supports; caller holds _write_mutex"""
+        cursor = self.db.connection().cursor()
+        cursor.execute('SELECT COUNT(*) FROM documents')
+        embeddings, faiss_ids = self._stored_vectors(cursor, cursor.fetchone()[0])
+        index = build_index(self.index_config, self.dimension, embeddings)
+        index.add_with_ids(embeddings, faiss_ids)
+        
+        # Searches keep using the old index until the new one is complete; it holds the
+        # same rows, so store_version already describes it
+        with self._rw_lock.write_lock():
+            self.index = index
+            self._index_mapped = False
+        logger.info(f"Retrained index with nlist={trained_nlist(index)} for {index.ntotal} vectors")
+    
+    @property
+    def read_only(self) -> bool:
+        """True for replicas that forward writes to a writer process"""
+        return self.write_queue is not None
+    
+    def refresh_snapshot(self) -> bool:
+        """Swap in a newer snapshot published by the writer, returning True if one was loaded"""
+        index_path, _, manifest_path = self._snapshot_paths()
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+            if mtime == self._snapshot_mtime:
+                return False
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest['store_version'] <= self.store_version:
+                self._snapshot_mtime = mtime
+                return False
+            # The writer replaces the index before the manifest, so this is at
+            # least as new as the manifest; every row it holds is in SQLite
+            flags = faiss.IO_FLAG_MMAP if self.mmap_snapshot else 0
+            index = read_index(index_path, self.dimension, self.index_config.quantization, flags)
+        except Exception as e:
+            logger.error(f"Failed to refresh index snapshot: {e}")
+            return False
+        
+        with self._rw_lock.write_lock():
+            self.index = index
+            self._index_mapped = self.mmap_snapshot
+            self.store_version = manifest['store_version']
+            self._snapshot_mtime = mtime
+            # Rows may have been refreshed in place under the same faiss_id
+            self.document_cache.clear()
+        logger.info(f"Refreshed index snapshot to store version {self.store_version}")
+        return True
+    
+    def _maybe_refresh(self):
+        """Replicas poll for new snapshots at most once per refresh_interval"""
+        if not self.read_only:
+            return
+        now = time.monotonic()
+        if now - self._snapshot_checked >= self.refresh_interval:
+            self._snapshot_checked = now
+            self.refresh_snapshot()
+    
+    def current_version(self) -> int:
+        """store_version, after picking up any newer snapshot on replicas"""
+        self._maybe_refresh()
+        return self.store_version
+    
+    def _register_id(self, doc_id: str, faiss_id: int):
+        """Record the mapping between a document id and its FAISS row id"""
+        self._next_faiss_id = max(self._next_faiss_id, faiss_id + 1)
+        if self.lazy_documents:
+            return
+        if faiss_id >= len(self._doc_ids):
+            self._doc_ids.extend([None] * (faiss_id + 1 - len(self._doc_ids)))
+        self._doc_ids[faiss_id] = doc_id
+        self._faiss_ids[doc_id] = faiss_id
+    
+    def _resident_embedding(self, embedding: np.ndarray) -> Optional[np.ndarray]:
+        """Embedding kept on in-memory documents; quantized stores leave vectors to the index and SQLite"""
+        if self.index_config.quantization != "none":
+            return None
+        return np.asarray(embedding, dtype=np.float32)
+    
+    def _known_faiss_ids(self, cursor, doc_ids: List[str]) -> Dict[str, int]:
+        """faiss_ids already assigned to any of the given document ids"""
+        if not self.lazy_documents:
+            return {doc_id: self._faiss_ids[doc_id] for doc_id in doc_ids if doc_id in self._faiss_ids}
+        
+        unique_ids = list(set(doc_ids))
+        placeholders = ','.join('?' * len(unique_ids))
+        cursor.execute(f'SELECT id, faiss_id FROM documents WHERE id IN ({placeholders})', unique_ids)
+        return dict(cursor.fetchall())
+    
+    def stored_ids(self, doc_ids: List[str]) -> set:
+        """The document ids among doc_ids that are already in the store"""
+        if not doc_ids:
+            return set()
+        return set(self._known_faiss_ids(self.db.connection().cursor(), doc_ids))
+    
+    def _fetch_documents(self, faiss_ids: List[int]) -> Dict[int, Document]:
+        """Resolve FAISS hits to documents, reading misses from SQLite in one query"""
+        if not self.lazy_documents:
+            # Lexical hits can name rows committed to SQLite but not yet published here
+            return {faiss_id: self.documents[self._doc_ids[faiss_id]] for faiss_id in faiss_ids
+                    if faiss_id < len(self._doc_ids) and self._doc_ids[faiss_id] is not None}
+        
+        found = {}
+        missing = []
+        for faiss_id in faiss_ids:
+            doc = self.document_cache.get(faiss_id)
+            if doc is None:
+                missing.append(faiss_id)
+            else:
+                found[faiss_id] = doc
+        
+        if missing:
+            placeholders = ','.join('?' * len(missing))
+            rows = self.db.connection().execute(f'''
+                SELECT id, content, source, metadata, timestamp, faiss_id
+                FROM documents WHERE faiss_id IN ({placeholders})
+            ''', missing).fetchall()
+            
+            for doc_id, content, source, metadata_json, timestamp, faiss_id in rows:
+                doc = Document(
+                    id=doc_id,
+                    content=content,
+                    source=source,
+                    embedding=None,
+                    metadata=json.loads(metadata_json),
+                    timestamp=datetime.fromisoformat(timestamp)
+                )
+                self.document_cache.put(faiss_id, doc)
+                found[faiss_id] = doc
+        
+        return found
+    
+    @property
+    def document_count(self) -> int:
+        """Number of unique documents in the store"""
+        return int(self.index.ntotal)
+    
+    def add_documents(self, contents: Iterable[str], sources: Iterable[str], metadata_list: Iterable[Dict] = None,
+                      batch_size: int = 64):
+        """Add documents to the vector store
+        
+        Long documents are split into overlapping token windows (see
+        iter_chunks). Chunks are streamed through the encoder and written in
+        batches of batch_size, so inputs can be generators of any length.
+        """
+        for batch in batched(self.iter_chunks(contents, sources, metadata_list), batch_size):
+            chunk_contents, chunk_sources, chunk_metadata = zip(*batch)
+            embeddings = self.embedding_model.encode(list(chunk_contents), normalize_embeddings=True)
+            self.add_embedded_documents(list(chunk_contents), list(chunk_sources), embeddings, list(chunk_metadata))
+    
+    def iter_chunks(self, contents: Iterable[str], sources: Iterable[str],
+                    metadata_list: Iterable[Dict] = None) -> Iterator[Tuple[str, str, Dict]]:
+        """Lazily yield (content, source, metadata) per chunk
+        
+        Documents that fit one window pass through unchanged. Chunks of longer
+        documents carry parent_id (the id the whole document would have had),
+        chunk_index and chunk_count in their metadata.
+        """
+        if metadata_list is None:
+            metadata_list = iter(dict, None)
+        for content, source, metadata in zip(contents, sources, metadata_list):
+            chunks = self.chunker.split(content)
+            if len(chunks) == 1:
+                yield content, source, metadata
+                continue
+            
+            parent_id = self.document_id(content, source)
+            for index, chunk in enumerate(chunks):
+                yield chunk, source, {**metadata, 'parent_id': parent_id,
+                                      'chunk_index': index, 'chunk_count': len(chunks)}
+    
+    @staticmethod
+    def document_id(content: str, source: str) -> str:
+        """Stable id derived from content and source"""
+        return hashlib.md5(f"{content}{source}".encode()).hexdigest()
+    
+    def add_embedded_documents(self, contents: List[str], sources: List[str], embeddings: np.ndarray,
+                               metadata_list: List[Dict] = None):
+        """Add documents whose normalized embeddings were already computed"""
         if metadata_list is None:
             metadata_list = [{}] * len(contents)
         
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(contents, normalize_embeddings=True)
+        if self.read_only:
+            # The writer process owns the index; it dedups and publishes a snapshot
+            self.write_queue.put((list(contents), list(sources),
+                                  np.asarray(embeddings, dtype=np.float32), list(metadata_list)))
+            return
         
-        # Add to FAISS
-        self.index.add(embeddings.astype('float32'))
-        
-        # Store documents
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._write_mutex:
+            self._write_documents(contents, sources, embeddings, metadata_list)
+    
+    def _write_documents(self, contents: List[str], sources: List[str], embeddings: np.ndarray,
+                         metadata_list: List[Dict]):
+        """Persist a batch and publish it to readers; caller holds _write_mutex"""
+        doc_ids = [self.document_id(content, source) for content, source in zip(contents, sources)]
+        timestamp = datetime.now()
         
-        for content, source, embedding, metadata in zip(contents, sources, embeddings, metadata_list):
-            doc_id = hashlib.md5(f"{content}{source}".encode()).hexdigest()
-            timestamp = datetime.now()
+        with self.db.transaction() as cursor:
+            known_ids = self._known_faiss_ids(cursor, doc_ids)
+            stored_metadata = {}
+            if known_ids:
+                placeholders = ','.join('?' * len(known_ids))
+                cursor.execute(f'SELECT id, metadata FROM documents WHERE id IN ({placeholders})', list(known_ids))
+                stored_metadata = dict(cursor.fetchall())
             
-            doc = Document(
-                id=doc_id,
-                content=content,
-                source=source,
-                embedding=embedding,
-                metadata=metadata,
-                timestamp=timestamp
-            )
+            next_faiss_id = self._next_faiss_id
+            new_docs = []
+            new_embeddings = []
+            new_ids = []
+            rows = []
+            fts_rows = []
+            for doc_id, content, source, embedding, metadata in zip(doc_ids, contents, sources, embeddings,
+                                                                    metadata_list):
+                # The id is derived from content and source, so a known id already
+                # has an identical vector in FAISS; only changed metadata needs writing
+                metadata_json = json.dumps(metadata)
+                faiss_id = known_ids.get(doc_id)
+                if faiss_id is not None and stored_metadata.get(doc_id) == metadata_json:
+                    continue
+                if faiss_id is None:
+                    faiss_id = next_faiss_id
+                    next_faiss_id += 1
+                    known_ids[doc_id] = faiss_id
+                    new_embeddings.append(embedding)
+                    new_ids.append(faiss_id)
+                    fts_rows.append((faiss_id, content, source))
+                
+                doc = Document(
+                    id=doc_id,
+                    content=content,
+                    source=source,
+                    embedding=self._resident_embedding(embedding),
+                    metadata=metadata,
+                    timestamp=timestamp
+                )
+                new_docs.append((faiss_id, doc))
+                rows.append((doc_id, content, source, encode_embedding(embedding, self.index_config.quantization),
+                             metadata_json, timestamp.isoformat(), faiss_id))
             
-            self.documents[doc_id] = doc
+            if not rows:
+                # Everything is stored already; readers and the version stay as they are
+                logger.info(f"Added {len(contents)} documents to vector store (0 new)")
+                return
             
-            # Save to database
-            cursor.execute('''
+            # Save to database in one statement per table
+            cursor.executemany('''
                 INSERT OR REPLACE INTO documents 
-                (id, content, source, embedding, metadata, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                doc_id,
-                content,
-                source,
-                embedding.tobytes(),
-                json.dumps(metadata),
-                timestamp.isoformat()
-            ))
-        
-        conn.commit()
-        conn.close()
-        logger.info(f"Added {len(contents)} documents to vector store")
-    
-    def search(self, query: str, top_k: int = 5, threshold: float = 0.3) -> List[Document]:
-        """Search for similar documents"""
-        if len(self.documents) == 0:
+                (id, content, source, embedding, metadata, timestamp, faiss_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            if self.lexical_index:
+                cursor.executemany('INSERT INTO documents_fts (rowid, content, source) VALUES (?, ?, ?)', fts_rows)
+            version = self._bump_store_version(cursor)
+        
+        # Publish to readers: documents and id maps first, then the FAISS rows, then the
+        # version, so a query cached under the new version was searched against them
+        with self._rw_lock.write_lock():
+            # A memory-mapped IVF index is read-only; pull it into RAM before writing
+            if self._index_mapped:
+                self.index = read_index(self._snapshot_paths()[0], self.dimension, self.index_config.quantization)
+                self._index_mapped = False
+            
+            for faiss_id, doc in new_docs:
+                self._register_id(doc.id, faiss_id)
+                self.document_cache.pop(faiss_id)
+                if not self.lazy_documents:
+                    self.documents[doc.id] = doc
+            
+            if new_embeddings:
+                self.index.add_with_ids(np.vstack(new_embeddings).astype('float32'),
+                                        np.array(new_ids, dtype=np.int64))
+                self.index = upgrade_index(self.index, self.index_config)
+            self.store_version = version
+        if undertrained(self.index_config, self.index.ntotal, trained_nlist(self.index)):
+            self._retrain_index()
+        logger.info(f"Added {len(contents)} documents to vector store ({len(new_ids)} new)")
+    
+    def insert_documents(self, cursor, contents: List[str], sources: List[str], embeddings: np.ndarray,
+                         metadata_list: List[Dict]) -> int:
+        """Bulk-load rows without touching the FAISS index, returning how many were new
+        
+        Documents already stored (or repeated within the batch) are skipped.
+        The caller owns the transaction on cursor and must call rebuild_index()
+        once loading is done; until then searches don't see the new rows.
+        """
+        with self._write_mutex:
+            doc_ids = [self.document_id(content, source) for content, source in zip(contents, sources)]
+            unique_ids = list(set(doc_ids))
+            placeholders = ','.join('?' * len(unique_ids))
+            cursor.execute(f'SELECT id FROM documents WHERE id IN ({placeholders})', unique_ids)
+            seen = {row[0] for row in cursor.fetchall()}
+            
+            timestamp = datetime.now().isoformat()
+            rows = []
+            for doc_id, content, source, embedding, metadata in zip(doc_ids, contents, sources, embeddings, metadata_list):
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                rows.append((doc_id, content, source, encode_embedding(embedding, self.index_config.quantization),
+                             json.dumps(metadata), timestamp, self._next_faiss_id))
+                self._next_faiss_id += 1
+            
+            cursor.executemany('''
+                INSERT INTO documents (id, content, source, embedding, metadata, timestamp, faiss_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            if self.lexical_index:
+                cursor.executemany('INSERT INTO documents_fts (rowid, content, source) VALUES (?, ?, ?)',
+                                   [(row[6], row[1], row[2]) for row in rows])
+            if rows:
+                self._bump_store_version(cursor)
+            return len(rows)
+    
+    def rebuild_index(self):
+        """Rebuild the FAISS index (training it if needed) from the database and save a snapshot"""
+        with self._write_mutex, self._rw_lock.write_lock():
+            self.index = build_index(self.index_config, self.dimension)
+            self.documents = {}
+            self._faiss_ids = {}
+            self._doc_ids = []
+            self.document_cache.clear()
+            self._load_from_database()
+    
+    def close(self):
+        """Close the store's SQLite connections"""
+        self.db.close()
+    
+    def search(self, query: str, top_k: int = 5, threshold: float = 0.3,
+               nprobe: int = None, ef_search: int = None, hybrid: bool = False,
+               query_embedding: np.ndarray = None) -> List[Document]:
+        """Search for similar documents
+        
+        nprobe / ef_search override the configured accuracy-speed trade-off
+        for IVF / HNSW indexes on this query only. hybrid=True fuses the
+        vector ranking with BM25 (see _fuse_lexical). A precomputed, normalized
+        query_embedding is searched instead of encoding the query text.
+        """
+        self._maybe_refresh()
+        if self.index.ntotal == 0:
             return []
         
         # Generate query embedding
-        query_embedding = self.embedding_model.encode([query], normalize_embeddings=True)
+        if query_embedding is None:
+            query_embedding = self.query_encoder.encode(query)
+        query_embedding = query_embedding[None, :]
+        return self._search_collapsed([query], query_embedding, [top_k], threshold, nprobe, ef_search, hybrid)[0]
+    
+    def search_batch(self, queries: List[str], top_k: Union[int, List[int]] = 5, threshold: float = 0.3,
+                     nprobe: int = None, ef_search: int = None, hybrid: bool = False,
+                     query_embeddings: np.ndarray = None) -> List[List[Document]]:
+        """Search for several queries with one encode call and one multi-row FAISS search"""
+        if isinstance(top_k, int):
+            top_k = [top_k] * len(queries)
+        self._maybe_refresh()
+        if not queries or self.index.ntotal == 0:
+            return [[] for _ in queries]
+        
+        if query_embeddings is None:
+            query_embeddings = self.embedding_model.encode(queries, normalize_embeddings=True)
+        return self._search_collapsed(queries, query_embeddings, top_k, threshold, nprobe, ef_search, hybrid)
+    
+    def _search_collapsed(self, queries: List[str], query_embeddings: np.ndarray, top_ks: List[int],
+                          threshold: float, nprobe: int, ef_search: int, hybrid: bool) -> List[List[Document]]:
+        """Over-fetch, then collapse sibling chunks so each parent document appears once"""
+        fetch_ks = [top_k * SIBLING_OVERFETCH for top_k in top_ks]
+        with self._rw_lock.read_lock():
+            if hybrid and self.lexical_index:
+                results = self._hybrid_search(queries, query_embeddings, fetch_ks, threshold, nprobe, ef_search)
+            else:
+                results = self._search_embeddings(query_embeddings, fetch_ks, threshold, nprobe, ef_search)
+        return [collapse_siblings(docs, top_k) for docs, top_k in zip(results, top_ks)]
+    
+    @staticmethod
+    def lexical_query(query: str, match_all: bool = False) -> str:
+        """FTS5 MATCH expression OR-ing (or AND-ing) the query's non-stopword terms, each quoted"""
+        terms = [term for term in re.findall(r'\w+', query.lower()) if term not in LEXICAL_STOPWORDS]
+        return (' AND ' if match_all else ' OR ').join(f'"{term}"' for term in dict.fromkeys(terms))
+    
+    def lexical_search(self, query: str, limit: int, match_all: bool = False) -> List[int]:
+        """faiss_ids of the best BM25 matches (containing every term with match_all), best first"""
+        match = self.lexical_query(query, match_all)
+        if not self.lexical_index or not match:
+            return []
+        
+        rows = self.db.connection().execute('''
+            SELECT rowid FROM documents_fts WHERE documents_fts MATCH ?
+            ORDER BY bm25(documents_fts) LIMIT ?
+        ''', (match, limit)).fetchall()
+        return [row[0] for row in rows]
+    
+    def _hybrid_search(self, queries: List[str], query_embeddings: np.ndarray, top_ks: List[int],
+                       threshold: float, nprobe: int = None, ef_search: int = None) -> List[List[Document]]:
+        """Vector and BM25 candidates fused per query; caller holds the read lock
+        
+        BM25 hits are held to the cosine threshold, except the LEXICAL_TRUSTED
+        best ones containing every query term: an exact keyword match such as
+        an API name counts on its own, and is flagged with lexical_match.
+        """
+        depths = [top_k * HYBRID_DEPTH for top_k in top_ks]
+        vector_results = self._search_embeddings(query_embeddings, depths, threshold, nprobe, ef_search)
+        trusted_ids = [self.lexical_search(query, LEXICAL_TRUSTED, match_all=True) for query in queries]
+        lexical_ids = [list(dict.fromkeys(trusted + self.lexical_search(query, depth)))
+                       for query, trusted, depth in zip(queries, trusted_ids, depths)]
+        lexical_docs = self._fetch_documents(list({faiss_id for ids in lexical_ids for faiss_id in ids}))
+        
+        # Hits only BM25 found get their cosine score too, so relevance_score
+        # means the same for every document returned
+        vector_scores = [{doc.id: doc.relevance_score for doc in vector_docs} for vector_docs in vector_results]
+        vectors = self._stored_embeddings(sorted({
+            faiss_id for ids, scores in zip(lexical_ids, vector_scores) for faiss_id in ids
+            if faiss_id in lexical_docs and lexical_docs[faiss_id].id not in scores
+        }))
+        
+        fused = []
+        for query_embedding, vector_docs, scores, ids, trusted, top_k in zip(
+                query_embeddings, vector_results, vector_scores, lexical_ids, trusted_ids, top_ks):
+            ranking = []
+            for faiss_id in ids:
+                doc = lexical_docs.get(faiss_id)
+                if doc is None:
+                    continue
+                score = scores.get(doc.id)
+                if score is None and faiss_id in vectors:
+                    score = float(vectors[faiss_id] @ query_embedding)
+                if score is None:
+                    continue
+                if faiss_id in trusted:
+                    ranking.append(replace(doc, relevance_score=score, lexical_match=True))
+                elif score >= threshold:
+                    ranking.append(replace(doc, relevance_score=score))
+            fused.append(self._fuse_lexical(vector_docs, ranking, top_k))
+        return fused
+    
+    @staticmethod
+    def _fuse_lexical(vector_docs: List[Document], lexical_docs: List[Document], top_k: int) -> List[Document]:
+        """Reciprocal-rank fusion of the vector and BM25 rankings
+        
+        RRF only decides the order; every document keeps its cosine
+        relevance_score, so web documents compare against the same scale with
+        or without hybrid search. lexical_match carries over from the BM25 side.
+        """
+        if not lexical_docs:
+            return vector_docs[:top_k]
+        
+        scores = {}
+        docs = {}
+        for ranking in (vector_docs, lexical_docs):
+            for rank, doc in enumerate(ranking):
+                scores[doc.id] = scores.get(doc.id, 0.0) + 1.0 / (RRF_K + rank + 1)
+                if doc.lexical_match or doc.id not in docs:
+                    docs[doc.id] = doc
         
+        ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        return [docs[doc_id] for doc_id in ranked]
+    
+    def _search_embeddings(self, query_embeddings: np.ndarray, top_ks: List[int], threshold: float,
+                           nprobe: int = None, ef_search: int = None) -> List[List[Document]]:
+        """Run one FAISS search for all query rows and resolve hits; caller holds the read lock"""
         # Search in FAISS
-        scores, indices = self.index.search(query_embedding.astype('float32'), 
-                                          min(top_k, len(self.documents)))
+        params = search_parameters(
+            self.index,
+            nprobe=nprobe or self.index_config.nprobe,
+            ef_search=ef_search or self.index_config.ef_search
+        )
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32')
+        # Quantized scores are approximate; re-score a wider candidate set when asked to
+        rerank_factor = self.index_config.rerank_factor if self.index_config.quantization != "none" else 0
+        k = min(max(top_ks) * max(rerank_factor, 1), self.index.ntotal)
+        scores, indices = self.index.search(query_embeddings, k, params=params)
+        if rerank_factor:
+            scores, indices = self._rerank(query_embeddings, indices)
         
-        results = []
-        doc_list = list(self.documents.values())
+        hits = []
+        for row_scores, row_ids, row_k in zip(scores, indices, top_ks):
+            hits.append([(float(score), int(faiss_id))
+                         for score, faiss_id in zip(row_scores[:row_k], row_ids[:row_k])
+                         if faiss_id >= 0 and score >= threshold])
+        docs = self._fetch_documents(list({faiss_id for row in hits for _, faiss_id in row}))
         
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(doc_list) and score >= threshold:
-                doc = doc_list[idx]
+        all_results = []
+        for row in hits:
+            results = []
+            for score, faiss_id in row:
+                doc = docs.get(faiss_id)
+                if doc is None:
+                    continue
                 # Create a copy to avoid modifying the original
                 result_doc = Document(
                     id=doc.id,
@@ -204,95 +921,251 @@ class EnhancedVectorStore:
                     embedding=doc.embedding,
                     metadata=doc.metadata,
                     timestamp=doc.timestamp,
-                    relevance_score=float(score)
+                    relevance_score=score
                 )
                 results.append(result_doc)
+            all_results.append(sorted(results, key=lambda x: x.relevance_score, reverse=True))
+        
+        return all_results
+
+    def _stored_embeddings(self, faiss_ids: List[int]) -> Dict[int, np.ndarray]:
+        """Stored vectors of the given faiss_ids, read from SQLite in one query"""
+        if not faiss_ids:
+            return {}
+        placeholders = ','.join('?' * len(faiss_ids))
+        rows = self.db.connection().execute(
+            f'SELECT faiss_id, embedding FROM documents WHERE faiss_id IN ({placeholders})', faiss_ids
+        ).fetchall()
+        return {faiss_id: decode_embedding(blob, self.dimension) for faiss_id, blob in rows}
+    
+    def _rerank(self, query_embeddings: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score FAISS candidates against the vectors stored in SQLite, best first per row"""
+        candidates = sorted({int(faiss_id) for faiss_id in indices.ravel() if faiss_id >= 0})
+        if not candidates:
+            return np.full(indices.shape, -np.inf, dtype=np.float32), indices
+        vectors = self._stored_embeddings(candidates)
         
-        return sorted(results, key=lambda x: x.relevance_score, reverse=True)
+        scores = np.full(indices.shape, -np.inf, dtype=np.float32)
+        for i, (query, row_ids) in enumerate(zip(query_embeddings, indices)):
+            for j, faiss_id in enumerate(row_ids):
+                vector = vectors.get(int(faiss_id))
+                if vector is not None:
+                    scores[i, j] = float(vector @ query)
+        order = np.argsort(-scores, axis=1)
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(indices, order, axis=1)
 
 class WebKnowledgeRetriever:
-    """Retrieves information from web sources"""
-    def __init__(self, max_workers: int = 3):
+    """Retrieves information from web sources
+    
+    search_web fans out to every configured source on a thread pool and
+    returns whatever arrived before the global deadline; each source is
+    additionally bounded by its own HTTP timeout. The pool is shared by all
+    requests and sized for `concurrency` simultaneous searches (unless
+    max_workers is given); calls still queued at the deadline are cancelled.
+    With a cache, results are stored per (source, normalized query); empty
+    results and failures are cached for the shorter negative_ttl.
+    """
+    SOURCES = ("wikipedia_summary", "wikipedia_search", "duckduckgo")
+    
+    def __init__(self, max_workers: Optional[int] = None, source_timeout: float = 3.0, deadline: float = 4.0,
+                 sources: Tuple[str, ...] = SOURCES, wikipedia_url: str = "https://en.wikipedia.org",
+                 duckduckgo_url: str = "https://api.duckduckgo.com/",
+                 cache: Optional[TTLCache] = None, negative_ttl: float = 300, concurrency: int = 8):
+        max_workers = max_workers or concurrency * len(sources)
         self.max_workers = max_workers
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (compatible; RAGBot/1.0)'
-        })
+        self.cache = cache
+        self.negative_ttl = negative_ttl
+        self.source_timeout = source_timeout
+        self.deadline = deadline
+        self.sources = sources
+        self.wikipedia_url = wikipedia_url.rstrip('/')
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-retriever")
+        self.duckduckgo = WebRetriever(base_url=duckduckgo_url, timeout=source_timeout)
+        self._local = threading.local()
+    
+    @property
+    def session(self) -> requests.Session:
+        """Per-thread session, since requests.Session is not guaranteed thread-safe"""
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+            self._local.session.headers.update({
+                'User-Agent': 'Mozilla/5.0 (compatible; RAGBot/1.0)'
+            })
+        return self._local.session
+    
+    def search_wikipedia_summary(self, query: str) -> List[Dict[str, str]]:
+        """Look the query up as a Wikipedia page title"""
+        # Clean query for Wikipedia
+        clean_query = re.sub(r'[^\w\s]', '', query).replace(' ', '_')
+        
+        response = self.session.get(f"{self.wikipedia_url}/api/rest_v1/page/summary/{clean_query}",
+                                    timeout=self.source_timeout)
+        if response.status_code == 200:
+            data = response.json()
+            if 'extract' in data and data['extract']:
+                return [{
+                    'content': data['extract'],
+                    'source': f"Wikipedia: {data.get('title', query)}",
+                    'url': data.get('content_urls', {}).get('desktop', {}).get('page', '')
+                }]
+        return []
+    
+    def search_wikipedia_articles(self, query: str, max_results: int = 3) -> List[Dict[str, str]]:
+        """Full-text search over Wikipedia articles"""
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'list': 'search',
+            'srsearch': query,
+            'srlimit': max_results
+        }
+        
+        response = self.session.get(f"{self.wikipedia_url}/w/api.php", params=params,
+                                    timeout=self.source_timeout)
+        results = []
+        if response.status_code == 200:
+            data = response.json()
+            
+            for item in data.get('query', {}).get('search', []):
+                title = item['title']
+                snippet = item['snippet']
+                # Clean HTML tags
+                snippet = re.sub(r'<[^>]+>', '', snippet)
+                
+                if snippet.strip():  # Only add if snippet has content
+                    results.append({
+                        'content': snippet,
+                        'source': f"Wikipedia: {title}",
+                        'url': f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
+                    })
+        
+        return results[:max_results]
+    
+    def search_duckduckgo(self, query: str, max_results: int = 3) -> List[Dict[str, str]]:
+        """DuckDuckGo instant answers, normalized to the Wikipedia result shape"""
+        return [{
+            'content': result['content'],
+            'source': f"DuckDuckGo: {result['title']}",
+            'url': result['source'] if result['source'].startswith('http') else ''
+        } for result in self.duckduckgo.search_web(query, max_results=max_results)]
     
     def search_wikipedia(self, query: str, max_results: int = 3) -> List[Dict[str, str]]:
         """Search Wikipedia for information"""
         try:
-            # Wikipedia API search
-            search_url = "https://en.wikipedia.org/api/rest_v1/page/summary/"
-            
-            # Clean query for Wikipedia
-            clean_query = re.sub(r'[^\w\s]', '', query).replace(' ', '_')
-            
-            response = self.session.get(f"{search_url}{clean_query}", timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'extract' in data and data['extract']:
-                    return [{
-                        'content': data['extract'],
-                        'source': f"Wikipedia: {data.get('title', query)}",
-                        'url': data.get('content_urls', {}).get('desktop', {}).get('page', '')
-                    }]
+            results = self.search_wikipedia_summary(query)
+            if results:
+                return results
             
             # Fallback: search for articles
-            search_api = "https://en.wikipedia.org/w/api.php"
-            params = {
-                'action': 'query',
-                'format': 'json',
-                'list': 'search',
-                'srsearch': query,
-                'srlimit': max_results
-            }
-            
-            response = self.session.get(search_api, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                
-                for item in data.get('query', {}).get('search', []):
-                    title = item['title']
-                    snippet = item['snippet']
-                    # Clean HTML tags
-                    snippet = re.sub(r'<[^>]+>', '', snippet)
-                    
-                    if snippet.strip():  # Only add if snippet has content
-                        results.append({
-                            'content': snippet,
-                            'source': f"Wikipedia: {title}",
-                            'url': f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
-                        })
-                
-                return results[:max_results]
-                
+            return self.search_wikipedia_articles(query, max_results)
         except Exception as e:
             logger.error(f"Wikipedia search failed: {e}")
         
         return []
     
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Case, punctuation and whitespace-insensitive form used for cache keys"""
+        return " ".join(re.sub(r'[^\w\s]', ' ', query.lower()).split())
+    
+    def _cache_key(self, source: str, query: str, max_results: int) -> str:
+        return f"{source}:{max_results}:{self.normalize_query(query)}"
+    
+    def _store_in_cache(self, key: str, future):
+        """Cache a finished source call, including ones that missed the deadline"""
+        try:
+            results = future.result()
+        except Exception:
+            results = []
+        self.cache.put(key, results, ttl=None if results else self.negative_ttl)
+    
     def search_web(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
-        """Search web using multiple sources"""
-        results = []
+        """Search all configured sources concurrently under a global deadline"""
+        per_source = min(max_results, 3)
+        source_calls = {
+            "wikipedia_summary": lambda: self.search_wikipedia_summary(query),
+            "wikipedia_search": lambda: self.search_wikipedia_articles(query, per_source),
+            "duckduckgo": lambda: self.search_duckduckgo(query, per_source)
+        }
+        
+        cached = {}
+        futures = {}
+        for name in self.sources:
+            hit = self.cache.get(self._cache_key(name, query, per_source)) if self.cache is not None else None
+            if hit is not None:
+                cached[name] = hit
+            else:
+                futures[name] = self.executor.submit(source_calls[name])
+        
+        done = set()
+        if futures:
+            done, _ = wait(futures.values(), timeout=self.deadline)
         
-        # Search Wikipedia
-        wiki_results = self.search_wikipedia(query, max_results=min(max_results, 3))
-        results.extend(wiki_results)
+        for name, future in futures.items():
+            key = self._cache_key(name, query, per_source)
+            if future in done:
+                if self.cache is not None:
+                    self._store_in_cache(key, future)
+            elif future.cancel():
+                # Never started: don't let it hold a worker other requests are waiting for
+                continue
+            elif self.cache is not None:
+                # Late results still warm the cache for the next request
+                future.add_done_callback(lambda future, key=key: self._store_in_cache(key, future))
         
-        # Add more sources here if needed (DuckDuckGo, etc.)
+        results = []
+        seen = set()
+        # Collect in source priority order, not completion order
+        for name in self.sources:
+            if name in cached:
+                source_results = cached[name]
+            elif futures[name] not in done:
+                logger.warning(f"Web source {name} missed the {self.deadline}s deadline for '{query}'")
+                continue
+            else:
+                try:
+                    source_results = futures[name].result()
+                except Exception as e:
+                    logger.error(f"Web source {name} failed: {e}")
+                    continue
+            
+            for result in source_results:
+                if result['content'] not in seen:
+                    seen.add(result['content'])
+                    results.append(result)
         
         return results[:max_results]
 
 class ProductionRAGSystem:
     """Complete RAG system for production use"""
-    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2"):
-        self.vector_store = EnhancedVectorStore(embedding_model)
-        self.web_retriever = WebKnowledgeRetriever()
+    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2", index_config: IndexConfig = None,
+                 lazy_documents: bool = False, web_cache_path: Optional[str] = None,
+                 mmap_snapshot: bool = False, write_queue=None, hybrid_search: bool = True,
+                 query_cache_size: int = 1024, query_cache_threshold: float = 0.95,
+                 session_cache_size: int = 1000, session_idle_timeout: float = 1800.0,
+                 web_concurrency: int = 8):
+        self.hybrid_search = hybrid_search
+        self.vector_store = EnhancedVectorStore(embedding_model, index_config=index_config,
+                                                lazy_documents=lazy_documents, mmap_snapshot=mmap_snapshot,
+                                                write_queue=write_queue)
+        # Repeat and near-duplicate questions skip search and web lookups until the corpus changes
+        self.query_cache = SemanticQueryCache(self.vector_store.query_encoder.encode, self.vector_store.dimension,
+                                              maxsize=query_cache_size, similarity_threshold=query_cache_threshold)
+        # History messages are embedded once and blended with each new query
+        self.history_embeddings = HistoryEmbeddingCache(self.vector_store.query_encoder.encode_many)
         self.conversation_memory = ConversationMemory()
-        self.knowledge_cache = {}
+        # Per-client memories keyed by session_id, persisted next to the documents;
+        # turns are written behind so requests never wait on the disk
+        self.conversation_writer = ConversationWriter(self.vector_store.db)
+        self.sessions = SessionManager(self.vector_store.db, ConversationMemory, max_sessions=session_cache_size,
+                                       idle_timeout=session_idle_timeout, writer=self.conversation_writer)
+        self.knowledge_cache = TTLCache(maxsize=5000, db_path=web_cache_path, table="web_cache")
+        self.web_retriever = WebKnowledgeRetriever(cache=self.knowledge_cache, concurrency=web_concurrency)
+        # Batched queries fetch their web results side by side; a pool of its own so these
+        # callers never occupy the workers that run the individual source calls
+        self.web_batch_pool = ThreadPoolExecutor(max_workers=web_concurrency, thread_name_prefix="web-batch")
+        # Web knowledge is written to the store in the background
+        self.ingestion_worker = IngestionWorker(self.vector_store)
         
         # Initialize with some base knowledge
         self._initialize_base_knowledge()
@@ -323,67 +1196,228 @@ class ProductionRAGSystem:
         ]
         
         # Check if documents already exist
-        if len(self.vector_store.documents) == 0:
+        if self.vector_store.document_count == 0:
             contents = [item["content"] for item in base_knowledge]
             sources = [item["source"] for item in base_knowledge]
             
             self.vector_store.add_documents(contents, sources)
             logger.info("Initialized base knowledge")
     
-    def retrieve_context(self, query: str, conversation_history: List[Dict] = None, top_k: int = 5) -> List[Document]:
+    def retrieve_context(self, query: str, conversation_history: List[Dict] = None, top_k: int = 5,
+                         nprobe: int = None, ef_search: int = None, session_id: str = None) -> List[Document]:
         """Retrieve relevant context for a query"""
-        # 1. Get conversation context
-        context_query = query
-        if conversation_history:
-            # Add recent conversation context to query
-            recent_context = " ".join([
-                f"{msg.get('content', '')}" 
-                for msg in conversation_history[-3:] 
-                if msg.get('content')
-            ])
-            context_query = f"{recent_context} {query}"
-        
-        # 2. Search local vector store
-        local_results = self.vector_store.search(context_query, top_k=top_k)
-        
-        # 3. Search web if not enough local results or low relevance
-        all_results = local_results.copy()
-        
-        if len(local_results) < top_k//2 or (local_results and max(r.relevance_score for r in local_results) < 0.6):
-            web_results = self.web_retriever.search_web(query, max_results=top_k//2 + 1)
-            
-            # Convert web results to Document objects
-            for web_result in web_results:
-                embedding = self.vector_store.embedding_model.encode(
-                    [web_result['content']], 
-                    normalize_embeddings=True
-                )[0]
-                
-                doc = Document(
-                    id=hashlib.md5(web_result['content'].encode()).hexdigest(),
-                    content=web_result['content'],
-                    source=web_result['source'],
-                    embedding=embedding,
-                    metadata={'url': web_result.get('url', ''), 'type': 'web'},
-                    timestamp=datetime.now(),
-                    relevance_score=0.7  # Default score for web results
-                )
-                all_results.append(doc)
-            
-            # Add new web knowledge to vector store for future use
-            if web_results:
-                contents = [r['content'] for r in web_results]
-                sources = [r['source'] for r in web_results]
-                metadata = [{'url': r.get('url', ''), 'type': 'web'} for r in web_results]
-                self.vector_store.add_documents(contents, sources, metadata)
-        
-        # 4. Sort by relevance and return top_k
-        all_results.sort(key=lambda x: x.relevance_score, reverse=True)
-        return all_results[:top_k]
-    
-    def add_conversation_exchange(self, user_message: str, assistant_response: str):
-        """Add a conversation exchange to memory"""
-        self.conversation_memory.add_exchange(user_message, assistant_response)
+        steps = self.retrieval_steps(query, conversation_history, top_k, nprobe, ef_search, session_id)
+        web_request, results = self.advance(steps)
+        if web_request is not None:
+            _, results = self.advance(steps, self.fetch_web_results(*web_request))
+        return results
+    
+    def retrieval_steps(self, query: str, conversation_history: List[Dict] = None, top_k: int = 5,
+                        nprobe: int = None, ef_search: int = None,
+                        session_id: str = None) -> Generator[Tuple[str, int], List[Dict[str, str]], List[Document]]:
+        """retrieve_context's cache, search and ranking flow, paused for web results
+        
+        Yields (query, top_k) when web results are needed and expects
+        fetch_web_results' output back through send(); the ranked documents
+        are the return value. Drive it with advance(): retrieve_context fetches
+        inline, the async server runs each step on its CPU pool and awaits the
+        fetch on its I/O pool.
+        """
+        cache_query, variant, version = self.cache_key(query, conversation_history, top_k, nprobe, ef_search)
+        cached = self.query_cache.get_exact(cache_query, variant, version)
+        if cached is not None:
+            return cached
+        
+        # Only a miss pays for the embedding, shared by the near-duplicate lookup and the search
+        embedding = self.history_embeddings.context_embedding(query, conversation_history, session_id)
+        cached = self.query_cache.get_similar(cache_query, variant, version, embedding)
+        if cached is not None:
+            return cached
+        
+        # 1-2. Search local vector store with the conversation context
+        local_results = self.local_search(query, conversation_history, top_k, nprobe, ef_search,
+                                          session_id=session_id, query_embedding=embedding)
+        
+        # 3. Search web if needed, then sort by relevance and return top_k
+        web_results = []
+        if self.needs_web_results(local_results, top_k):
+            web_results = self.web_documents((yield query, top_k))
+        results = self.rank_results(local_results, top_k, web_results)
+        self.query_cache.put(cache_query, variant, version, results, embedding=embedding)
+        return results
+    
+    @staticmethod
+    def advance(steps: Generator, web_results: List[Dict[str, str]] = None
+                ) -> Tuple[Optional[Tuple[str, int]], Optional[List[Document]]]:
+        """Run retrieval_steps to its web request or its end: (request, None) or (None, documents)"""
+        try:
+            return steps.send(web_results), None
+        except StopIteration as done:
+            return None, done.value
+    
+    def cache_key(self, query: str, conversation_history: List[Dict] = None, top_k: int = 5,
+                  nprobe: int = None, ef_search: int = None) -> Tuple[str, Tuple, int]:
+        """(query text, variant, corpus version) identifying a retrieval in query_cache"""
+        return (self._build_context_query(query, conversation_history), (top_k, nprobe, ef_search),
+                self.vector_store.current_version())
+    
+    def retrieve_context_stream(self, query: str, conversation_history: List[Dict] = None, top_k: int = 5,
+                                nprobe: int = None, ef_search: int = None,
+                                session_id: str = None) -> Iterator[Tuple[str, List[Document]]]:
+        """retrieve_context in stages: ('local', hits), then ('web', docs) if needed, then ('final', ranked)"""
+        local_results = self.local_search(query, conversation_history, top_k, nprobe, ef_search, session_id=session_id)
+        yield 'local', local_results
+        
+        web_results = []
+        if self.needs_web_results(local_results, top_k):
+            web_results = self.web_documents(self.fetch_web_results(query, top_k))
+            yield 'web', web_results
+        
+        yield 'final', self.rank_results(local_results, top_k, web_results)
+    
+    def retrieve_context_batch(self, queries: List[str], conversation_histories: List[List[Dict]] = None,
+                               top_ks: List[int] = None, nprobe: int = None,
+                               ef_search: int = None) -> List[List[Document]]:
+        """Retrieve context for many queries, sharing one encode and one index search"""
+        top_ks = top_ks or [5] * len(queries)
+        local_results = self.local_search_batch(queries, conversation_histories, top_ks, nprobe, ef_search)
+        
+        # Web lookups are network-bound, so the queries that need them wait concurrently
+        fetches = {i: self.web_batch_pool.submit(self.fetch_web_results, queries[i], top_ks[i])
+                   for i, (results, top_k) in enumerate(zip(local_results, top_ks))
+                   if self.needs_web_results(results, top_k)}
+        augmented = []
+        for i, (results, top_k) in enumerate(zip(local_results, top_ks)):
+            web_results = self.web_documents(fetches[i].result()) if i in fetches else []
+            augmented.append(self.rank_results(results, top_k, web_results))
+        return augmented
+    
+    def local_search(self, query: str, conversation_history: List[Dict] = None, top_k: int = 5,
+                     nprobe: int = None, ef_search: int = None, session_id: str = None,
+                     query_embedding: np.ndarray = None) -> List[Document]:
+        """Vector-store hits for a query and its conversation context, without web results"""
+        if query_embedding is None:
+            query_embedding = self.history_embeddings.context_embedding(query, conversation_history, session_id)
+        context_query = self._build_context_query(query, conversation_history)
+        return self.vector_store.search(context_query, top_k=top_k, nprobe=nprobe, ef_search=ef_search,
+                                        hybrid=self.hybrid_search, query_embedding=query_embedding)
+    
+    def local_search_batch(self, queries: List[str], conversation_histories: List[List[Dict]] = None,
+                           top_ks: List[int] = None, nprobe: int = None,
+                           ef_search: int = None) -> List[List[Document]]:
+        """Vector-store hits for many queries in one encode and one index search"""
+        conversation_histories = conversation_histories or [None] * len(queries)
+        top_ks = top_ks or [5] * len(queries)
+        
+        context_queries = [self._build_context_query(query, history)
+                           for query, history in zip(queries, conversation_histories)]
+        query_embeddings = self.history_embeddings.context_embeddings(queries, conversation_histories)
+        return self.vector_store.search_batch(context_queries, top_k=top_ks, nprobe=nprobe, ef_search=ef_search,
+                                              hybrid=self.hybrid_search, query_embeddings=query_embeddings)
+    
+    def _build_context_query(self, query: str, conversation_history: List[Dict] = None) -> str:
+        """Prefix the query with recent conversation turns (for BM25 and the query cache key)"""
+        if not conversation_history:
+            return query
+        
+        # Add recent conversation context to query
+        recent_context = " ".join([
+            f"{msg.get('content', '')}" 
+            for msg in conversation_history[-self.history_embeddings.history_turns:] 
+            if msg.get('content')
+        ])
+        return f"{recent_context} {query}"
+    
+    @staticmethod
+    def needs_web_results(local_results: List[Document], top_k: int) -> bool:
+        """Local results are too few or too weak to answer on their own
+        
+        A hit containing every query term (see _hybrid_search) answers a
+        keyword query even when its cosine score is low.
+        """
+        if any(r.lexical_match for r in local_results):
+            return False
+        return len(local_results) < top_k//2 or bool(local_results and max(r.relevance_score for r in local_results) < 0.6)
+    
+    def fetch_web_results(self, query: str, top_k: int) -> List[Dict[str, str]]:
+        """Network half of web augmentation"""
+        return self.web_retriever.search_web(query, max_results=top_k//2 + 1)
+    
+    def web_documents(self, web_results: List[Dict[str, str]]) -> List[Document]:
+        """Embed web results as Documents and queue them for the vector store"""
+        # Convert web results to Document objects
+        web_embeddings = self.vector_store.query_encoder.encode_many(
+            [web_result['content'] for web_result in web_results]
+        )
+        documents = []
+        for web_result, embedding in zip(web_results, web_embeddings):
+            doc = Document(
+                id=hashlib.md5(web_result['content'].encode()).hexdigest(),
+                content=web_result['content'],
+                source=web_result['source'],
+                embedding=embedding,
+                metadata={'url': web_result.get('url', ''), 'type': 'web'},
+                timestamp=datetime.now(),
+                relevance_score=0.7  # Default score for web results
+            )
+            documents.append(doc)
+        
+        # Queue new web knowledge for the vector store, reusing the embeddings; results
+        # already stored are skipped so repeats don't bump the version and reset query_cache
+        doc_ids = [self.vector_store.document_id(r['content'], r['source']) for r in web_results]
+        stored = self.vector_store.stored_ids(doc_ids)
+        new = [i for i, doc_id in enumerate(doc_ids) if doc_id not in stored]
+        if new:
+            contents = [web_results[i]['content'] for i in new]
+            sources = [web_results[i]['source'] for i in new]
+            metadata = [{'url': web_results[i].get('url', ''), 'type': 'web'} for i in new]
+            self.ingestion_worker.submit(contents, sources, [web_embeddings[i] for i in new], metadata)
+        return documents
+    
+    @staticmethod
+    def rank_results(local_results: List[Document], top_k: int,
+                     web_results: List[Document] = None) -> List[Document]:
+        """Local hits in their ranked order with web documents merged in by relevance, keeping top_k
+        
+        Hybrid search orders local hits by fused rank rather than by
+        relevance_score, so they are merged with the web documents, not re-sorted.
+        """
+        web_results = sorted(web_results or [], key=lambda x: x.relevance_score, reverse=True)
+        ranked = []
+        local, web = 0, 0
+        while len(ranked) < top_k and (local < len(local_results) or web < len(web_results)):
+            if web < len(web_results) and (local == len(local_results) or
+                                           web_results[web].relevance_score > local_results[local].relevance_score):
+                ranked.append(web_results[web])
+                web += 1
+            else:
+                ranked.append(local_results[local])
+                local += 1
+        return ranked
+    
+    def shutdown(self):
+        """Finish background writes and persist the index snapshot"""
+        self.web_batch_pool.shutdown(wait=True)
+        self.ingestion_worker.close()
+        self.conversation_writer.close()
+        self.knowledge_cache.close()
+        self.vector_store.query_encoder.close()
+        if not self.vector_store.read_only:
+            self.vector_store.save_snapshot()
+        self.vector_store.close()
+    
+    def add_conversation_exchange(self, user_message: str, assistant_response: str, session_id: str = None):
+        """Add a conversation exchange to the session's memory, or the shared one without a session"""
+        if session_id:
+            self.sessions.add_exchange(session_id, user_message, assistant_response)
+        else:
+            self.conversation_memory.add_exchange(user_message, assistant_response)
+    
+    def conversation_history(self, session_id: str = None, history: List[Dict] = None) -> List[Dict]:
+        """History sent by the client, else the stored history of the session"""
+        if history or not session_id:
+            return history or []
+        return self.sessions.history(session_id)
     
     def format_context_for_llm(self, retrieved_docs: List[Document]) -> str:
         """Format retrieved context for LLM consumption"""
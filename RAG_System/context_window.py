@@ -0,0 +1,70 @@
+import re
+from collections import deque
+from typing import Callable, Optional
+
+def count_tokens(text: str) -> int:
+    """Approximate LLM token count: words and punctuation marks"""
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+class ContextWindow:
+    """Ring buffer of rendered turns with an incrementally maintained context window
+
+    Each turn's text and token count are computed once, on append. The
+    window is the longest run of most recent turns holding at most max_turns
+    turns and token_budget tokens; it only ever moves forward, so appending
+    costs O(1) amortized, and it is cut at turn boundaries so no message is
+    split. Up to max_history turns are kept for callers asking for a
+    different number of turns.
+    """
+    def __init__(self, token_budget: int = 1024, max_turns: int = 5, max_history: int = 20,
+                 token_counter: Callable[[str], int] = count_tokens, separator: str = ""):
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.token_counter = token_counter
+        self.separator = separator
+        self._turns = deque(maxlen=max(max_history, max_turns))  # (text, tokens)
+        self._window_size = 0
+        self.tokens = 0
+        self._text = ""
+
+    def append(self, text: str):
+        """Add the newest turn and slide the window past whatever no longer fits"""
+        if len(self._turns) == self._turns.maxlen and self._window_size == len(self._turns):
+            # The oldest turn is about to leave the buffer while still in the window
+            self.tokens -= self._turns[0][1]
+            self._window_size -= 1
+        tokens = self.token_counter(text)
+        self._turns.append((text, tokens))
+        self._window_size += 1
+        self.tokens += tokens
+
+        while self._window_size and (self._window_size > self.max_turns or self.tokens > self.token_budget):
+            self.tokens -= self._turns[-self._window_size][1]
+            self._window_size -= 1
+        self._text = None
+
+    def text(self, max_turns: Optional[int] = None) -> str:
+        """Rendered window, or the most recent max_turns turns that fit the budget"""
+        if max_turns is None or max_turns == self.max_turns:
+            if self._text is None:
+                turns = [self._turns[-i][0] for i in range(self._window_size, 0, -1)]
+                self._text = self.separator.join(turns)
+            return self._text
+
+        turns, tokens = [], 0
+        for text, turn_tokens in reversed(self._turns):
+            if len(turns) == max_turns or tokens + turn_tokens > self.token_budget:
+                break
+            turns.append(text)
+            tokens += turn_tokens
+        return self.separator.join(reversed(turns))
+
+    def clear(self):
+        self._turns.clear()
+        self._window_size = 0
+        self.tokens = 0
+        self._text = ""
+
+    def __len__(self) -> int:
+        """Turns currently in the window"""
+        return self._window_size
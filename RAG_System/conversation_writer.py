@@ -0,0 +1,56 @@
+from typing import List, Tuple
+
+from .sqlite_pool import SQLiteConnectionManager
+from .write_behind import WriteBehindWorker
+
+# (id, session_id, user_message, assistant_response, context, metadata json, ISO timestamp)
+ConversationRow = Tuple[str, str, str, str, str, str, str]
+
+class ConversationWriter(WriteBehindWorker):
+    """Write-behind persistence for conversation turns
+
+    Callers queue rows and return immediately; the worker inserts them into
+    the conversations table (and bumps user_sessions.last_activity) in one
+    transaction per batch. Rows stay visible through pending() until they
+    are committed or dropped, and close() writes everything still queued.
+    """
+    name = "conversation-writer"
+
+    def __init__(self, db: SQLiteConnectionManager, batch_size: int = 256, flush_interval: float = 0.5,
+                 max_retries: int = 3, retry_delay: float = 0.1):
+        self.db = db
+        self._pending = {}  # row id -> row, until committed
+        super().__init__(batch_size, flush_interval, max_retries, retry_delay)
+
+    def submit(self, row: ConversationRow):
+        """Queue one turn for writing"""
+        with self._lock:
+            self._check_open()
+            self._pending[row[0]] = row
+            self._enqueue(row)
+
+    def pending(self, session_id: str) -> List[ConversationRow]:
+        """Queued rows of a session that are not committed yet"""
+        with self._lock:
+            return [row for row in self._pending.values() if row[1] == session_id]
+
+    def _write_batch(self, batch: List[ConversationRow]):
+        """Write one batch in a single transaction; INSERT OR IGNORE keeps retries idempotent"""
+        last_activity = {}
+        for row in batch:
+            last_activity[row[1]] = max(last_activity.get(row[1], row[6]), row[6])
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                INSERT OR IGNORE INTO conversations
+                (id, session_id, user_message, assistant_response, context, metadata, timestamp, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [row + (row[6],) for row in batch])
+            cursor.executemany('''
+                INSERT INTO user_sessions (session_id, created_at, last_activity) VALUES (?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET last_activity = MAX(last_activity, excluded.last_activity)
+            ''', [(session_id, timestamp, timestamp) for session_id, timestamp in last_activity.items()])
+
+    def _release(self, batch: List[ConversationRow]):
+        with self._lock:
+            for row in batch:
+                self._pending.pop(row[0], None)
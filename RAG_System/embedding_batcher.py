@@ -0,0 +1,136 @@
+import numpy as np
+import queue
+import time
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from .embedding_cache import CachedEmbeddingModel
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text encode calls into batched forward passes
+
+    Callers get a Future per text. A background thread takes the first
+    pending request, waits up to max_wait_ms for more to arrive (or until
+    max_batch_size is reached) and encodes them all in one model call. The
+    window is only held open under concurrent load, so a lone caller is not
+    delayed waiting for a batch that never fills.
+    """
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._closed = False
+
+        self.requests = 0
+        self.batches = 0
+        self.cache_hits = 0
+        self._last_batch_size = 0
+
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str, normalize_embeddings: bool = True) -> Future:
+        """Queue a text for encoding and return a Future for its embedding"""
+        future = Future()
+
+        # Cached texts don't need to wait for a batch window
+        if isinstance(self.model, CachedEmbeddingModel):
+            cached = self.model.get_cached(text, normalize_embeddings)
+            if cached is not None:
+                self.cache_hits += 1
+                future.set_result(cached)
+                return future
+
+        if self._closed:
+            raise RuntimeError("EmbeddingBatcher is closed")
+        self._queue.put((text, normalize_embeddings, future))
+        return future
+
+    def encode(self, text: str, normalize_embeddings: bool = True, timeout: Optional[float] = None) -> np.ndarray:
+        """Blocking single-text encode through the batcher"""
+        return self.submit(text, normalize_embeddings).result(timeout)
+
+    def encode_many(self, texts: List[str], normalize_embeddings: bool = True,
+                    timeout: Optional[float] = None) -> np.ndarray:
+        """Encode several texts, letting them share batches with other callers"""
+        futures = [self.submit(text, normalize_embeddings) for text in texts]
+        if not futures:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.vstack([future.result(timeout) for future in futures])
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            under_load = self._last_batch_size > 1 or not self._queue.empty()
+            deadline = time.monotonic() + (self.max_wait if under_load else 0.0)
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+            if stop:
+                break
+
+        # Anything that slipped in after close() will never be batched
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                item[2].set_exception(RuntimeError("EmbeddingBatcher is closed"))
+
+    def _process(self, batch):
+        """Run one model call per normalization setting and resolve the futures"""
+        groups: Dict[bool, list] = {}
+        for text, normalize, future in batch:
+            groups.setdefault(normalize, []).append((text, future))
+
+        for normalize, items in groups.items():
+            try:
+                embeddings = self.model.encode([text for text, _ in items], normalize_embeddings=normalize)
+            except Exception as e:
+                logger.error(f"Batched encode of {len(items)} texts failed: {e}")
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(items, embeddings):
+                future.set_result(embedding)
+
+        self.requests += len(batch)
+        self.batches += 1
+        self._last_batch_size = len(batch)
+
+    def close(self):
+        """Stop the worker after it drains already queued requests"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'cache_hits': self.cache_hits,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0
+        }
@@ -0,0 +1,201 @@
+import numpy as np
+import hashlib
+import unicodedata
+import os
+import logging
+from threading import Lock
+from typing import Dict, List, Optional, Union
+from sentence_transformers import SentenceTransformer
+
+from .lru_cache import LRUCache
+from .sqlite_pool import SQLiteConnectionManager
+
+logger = logging.getLogger(__name__)
+
+class CachedEmbeddingModel:
+    """SentenceTransformer wrapper with a two-tier embedding cache
+
+    Lookups go to an in-process LRU first, then to an SQLite table keyed by
+    (model name, embedding dimension, normalized text hash); only texts
+    missing from both are encoded, in a single batched call. Stored blobs of
+    the wrong size are ignored, so a cache file shared across models never
+    yields embeddings of another shape. Exposes the subset of the
+    SentenceTransformer API the vector stores use.
+    """
+    def __init__(self, model_name: str, cache_path: Optional[str] = None,
+                 memory_size: int = 10000, max_persistent_entries: int = 1000000):
+        self.model_name = model_name
+        self.model = _load_transformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.cache_path = cache_path
+        self.db = SQLiteConnectionManager(cache_path) if cache_path else None
+        self.max_persistent_entries = max_persistent_entries
+        self.memory_cache = LRUCache(memory_size)
+        self._lock = Lock()
+
+        # Uncased models map "SwiftUI" and "swiftui" to the same embedding
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        self._lowercase = bool(getattr(tokenizer, 'do_lower_case', False))
+
+        self.disk_hits = 0
+        self.encoded = 0
+        self._persistent_count = 0
+        if cache_path:
+            self._init_database()
+
+    def _init_database(self):
+        """Create the persistent cache table, replacing one without a dimension column"""
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        with self.db.transaction() as cursor:
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(embedding_cache)')]
+            if columns and 'dimension' not in columns:
+                logger.info(f"Discarding embedding cache at {self.cache_path} written without dimensions")
+                cursor.execute('DROP TABLE embedding_cache')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    model TEXT NOT NULL,
+                    dimension INTEGER NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    PRIMARY KEY (model, dimension, text_hash)
+                )
+            ''')
+            self._persistent_count = cursor.execute(
+                'SELECT COUNT(*) FROM embedding_cache WHERE model = ? AND dimension = ?',
+                (self.model_name, self.dimension)
+            ).fetchone()[0]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    @property
+    def tokenizer(self):
+        return getattr(self.model, 'tokenizer', None)
+
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        return getattr(self.model, 'max_seq_length', None)
+
+    def normalize_text(self, text: str) -> str:
+        """Canonical form used for cache keys: NFC, collapsed whitespace"""
+        text = ' '.join(unicodedata.normalize('NFC', text).split())
+        return text.lower() if self._lowercase else text
+
+    def _key(self, text: str, normalize_embeddings: bool) -> str:
+        normalized = self.normalize_text(text)
+        return hashlib.sha1(f"{int(normalize_embeddings)}:{normalized}".encode()).hexdigest()
+
+    def get_cached(self, text: str, normalize_embeddings: bool = False) -> Optional[np.ndarray]:
+        """Memory-tier lookup only; never touches SQLite or the model"""
+        return self.memory_cache.get(self._key(text, normalize_embeddings))
+
+    def encode(self, sentences: Union[str, List[str]], normalize_embeddings: bool = False,
+               batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Drop-in replacement for SentenceTransformer.encode backed by the cache"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        keys = [self._key(text, normalize_embeddings) for text in texts]
+
+        unique_keys = list(dict.fromkeys(keys))
+        found: Dict[str, np.ndarray] = {}
+        for key in unique_keys:
+            embedding = self.memory_cache.get(key)
+            if embedding is not None:
+                found[key] = embedding
+
+        missing = [key for key in unique_keys if key not in found]
+        if missing and self.cache_path:
+            for key, embedding in self._read_persistent(missing).items():
+                found[key] = embedding
+                self.memory_cache.put(key, embedding)
+            self.disk_hits += sum(1 for key in missing if key in found)
+
+        # Encode each distinct missing text once
+        to_encode = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in to_encode:
+                to_encode[key] = text
+        if to_encode:
+            embeddings = self.model.encode(list(to_encode.values()), normalize_embeddings=normalize_embeddings,
+                                           batch_size=batch_size, **kwargs)
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            new_entries = dict(zip(to_encode.keys(), embeddings))
+            for key, embedding in new_entries.items():
+                found[key] = embedding
+                self.memory_cache.put(key, embedding)
+            self.encoded += len(new_entries)
+            if self.cache_path:
+                self._write_persistent(new_entries)
+
+        if not texts:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        result = np.vstack([found[key] for key in keys])
+        return result[0] if single else result
+
+    def _read_persistent(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Fetch cached embeddings from SQLite in one query"""
+        placeholders = ','.join('?' * len(keys))
+        rows = self.db.connection().execute(f'''
+            SELECT text_hash, embedding FROM embedding_cache
+            WHERE model = ? AND dimension = ? AND text_hash IN ({placeholders})
+        ''', [self.model_name, self.dimension] + keys).fetchall()
+        size = self.dimension * np.dtype(np.float32).itemsize
+        return {key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows if len(blob) == size}
+
+    def _write_persistent(self, entries: Dict[str, np.ndarray]):
+        """Store new embeddings, trimming the oldest rows beyond the size bound"""
+        with self._lock, self.db.transaction() as cursor:
+            changes_before = cursor.connection.total_changes
+            cursor.executemany(
+                'INSERT OR IGNORE INTO embedding_cache (model, dimension, text_hash, embedding) VALUES (?, ?, ?, ?)',
+                [(self.model_name, self.dimension, key, embedding.tobytes()) for key, embedding in entries.items()]
+            )
+            self._persistent_count += cursor.connection.total_changes - changes_before
+
+            overflow = self._persistent_count - self.max_persistent_entries
+            if overflow > 0:
+                cursor.execute('''
+                    DELETE FROM embedding_cache WHERE rowid IN (
+                        SELECT rowid FROM embedding_cache WHERE model = ? AND dimension = ? ORDER BY rowid LIMIT ?
+                    )
+                ''', (self.model_name, self.dimension, overflow))
+                self._persistent_count -= overflow
+
+    def close(self):
+        """Close the persistent cache's connections"""
+        if self.db:
+            self.db.close()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Hit/miss counters for both tiers"""
+        memory = self.memory_cache.stats()
+        lookups = memory['hits'] + memory['misses']
+        return {
+            'model': self.model_name,
+            'memory': memory,
+            'persistent_hits': self.disk_hits,
+            'persistent_entries': self._persistent_count if self.cache_path else None,
+            'encoded': self.encoded,
+            'hit_rate': (memory['hits'] + self.disk_hits) / lookups if lookups else None
+        }
+
+_transformers: Dict[str, SentenceTransformer] = {}
+_shared_models: Dict[tuple, CachedEmbeddingModel] = {}
+_shared_lock = Lock()
+
+def _load_transformer(model_name: str) -> SentenceTransformer:
+    """Load each SentenceTransformer once per process"""
+    with _shared_lock:
+        if model_name not in _transformers:
+            _transformers[model_name] = SentenceTransformer(model_name)
+        return _transformers[model_name]
+
+def get_embedding_model(model_name: str = "all-MiniLM-L6-v2", cache_path: Optional[str] = None) -> CachedEmbeddingModel:
+    """Process-wide cached model, so every store shares one model and one cache"""
+    key = (model_name, os.path.abspath(cache_path) if cache_path else None)
+    if key not in _shared_models:
+        model = CachedEmbeddingModel(model_name, cache_path)
+        with _shared_lock:
+            _shared_models.setdefault(key, model)
+        logger.info(f"Loaded embedding model {model_name} with cache at {cache_path or 'memory only'}")
+    return _shared_models[key]
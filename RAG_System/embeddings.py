@@ -1,14 +1,15 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List, Union
+from typing import List, Union, Optional
 import logging
 
+from .embedding_cache import get_embedding_model
+
 logger = logging.getLogger(__name__)
 
 class EmbeddingGenerator:
     """Embedding generation service"""
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", cache_path: Optional[str] = None):
+        self.model = get_embedding_model(model_name, cache_path)
         self.dimension = self.model.get_sentence_embedding_dimension()
         logger.info(f"Loaded embedding model: {model_name}, dimension: {self.dimension}")
     
@@ -0,0 +1,107 @@
+import threading
+import faiss
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+class FactStore:
+    """Bounded set of user facts, retrieved by relevance to a query
+
+    Each fact is embedded once, when added, into a small inner-product index.
+    A fact whose cosine similarity to a stored one reaches
+    duplicate_threshold replaces it (the newer statement wins, e.g. a changed
+    job). Past max_facts the least recently used fact is evicted, where both
+    adding and being retrieved count as use.
+    """
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], dimension: int, max_facts: int = 256,
+                 duplicate_threshold: float = 0.9):
+        self.encode = encode
+        self.dimension = dimension
+        self.max_facts = max_facts
+        self.duplicate_threshold = duplicate_threshold
+        self._lock = threading.Lock()
+        self._reset()
+
+        self.merged = 0
+        self.evictions = 0
+
+    def _reset(self):
+        self._facts = OrderedDict()  # row id -> fact dict, least recently used first
+        self._index = faiss.IndexIDMap(faiss.IndexFlatIP(self.dimension))
+        self._next_row = 0
+
+    def _remove(self, row: int):
+        del self._facts[row]
+        self._index.remove_ids(np.array([row], dtype=np.int64))
+
+    def add(self, fact: str, context: str = "user_statement", timestamp: Optional[str] = None) -> Dict:
+        return self.add_many([{
+            "fact": fact,
+            "timestamp": timestamp or datetime.now().isoformat(),
+            "context": context
+        }])[0]
+
+    def add_many(self, facts: List[Dict]) -> List[Dict]:
+        """Store fact dicts (fact, timestamp, context), encoding them in one call"""
+        if not facts:
+            return []
+        embeddings = np.asarray(self.encode([fact["fact"] for fact in facts]), dtype=np.float32)
+        embeddings = embeddings.reshape(len(facts), -1)
+        with self._lock:
+            for fact, embedding in zip(facts, embeddings):
+                embedding = embedding[None, :]
+                if self._index.ntotal:
+                    scores, rows = self._index.search(embedding, 1)
+                    if scores[0, 0] >= self.duplicate_threshold:
+                        self._remove(int(rows[0, 0]))
+                        self.merged += 1
+
+                row = self._next_row
+                self._next_row += 1
+                self._index.add_with_ids(embedding, np.array([row], dtype=np.int64))
+                self._facts[row] = fact
+                while len(self._facts) > self.max_facts:
+                    self._remove(next(iter(self._facts)))
+                    self.evictions += 1
+        return facts
+
+    def relevant(self, query: str, k: int = 5, min_score: float = 0.0) -> List[Dict]:
+        """Up to k facts most similar to the query, best first"""
+        if not self._facts or k <= 0:
+            return []
+        embedding = np.asarray(self.encode([query]), dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            scores, rows = self._index.search(embedding, min(k, self._index.ntotal))
+            found = []
+            for score, row in zip(scores[0], rows[0]):
+                row = int(row)
+                if row < 0 or score < min_score or row not in self._facts:
+                    continue
+                self._facts.move_to_end(row)
+                found.append(self._facts[row])
+            return found
+
+    def recent(self, k: int = 5) -> List[Dict]:
+        """The k most recently stated facts, oldest first"""
+        return self.facts()[-k:] if k > 0 else []
+
+    def facts(self) -> List[Dict]:
+        """All facts in the order they were stated"""
+        with self._lock:
+            return sorted(self._facts.values(), key=lambda fact: fact["timestamp"])
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def __len__(self) -> int:
+        return len(self._facts)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._facts),
+            'max_facts': self.max_facts,
+            'merged': self.merged,
+            'evictions': self.evictions
+        }
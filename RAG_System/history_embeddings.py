@@ -0,0 +1,74 @@
+import hashlib
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .lru_cache import LRUCache
+
+class HistoryEmbeddingCache:
+    """Conversation message embeddings, computed once per session and message
+
+    Messages are keyed by session and content hash in a bounded LRU, so each
+    history message (and each query, which becomes history on the next turn)
+    is encoded once. A context embedding is the weighted mean of the query
+    embedding (weight 1) and the last history_turns messages, the newest
+    weighted history_weight and each older one decay times less, normalized
+    to unit length.
+    """
+    def __init__(self, encode_many: Callable[[List[str]], List[np.ndarray]], maxsize: int = 4096,
+                 history_turns: int = 3, history_weight: float = 0.5, decay: float = 0.5):
+        self.encode_many = encode_many
+        self.history_turns = history_turns
+        self.history_weight = history_weight
+        self.decay = decay
+        self.cache = LRUCache(maxsize)
+
+    @staticmethod
+    def _key(session_id: Optional[str], text: str) -> Tuple[str, str]:
+        return session_id or '', hashlib.sha1(text.encode()).hexdigest()
+
+    def embed(self, texts: List[str], session_ids: List[Optional[str]]) -> List[np.ndarray]:
+        """Embeddings of texts, encoding the uncached ones in a single call"""
+        keys = [self._key(session_id, text) for text, session_id in zip(texts, session_ids)]
+        vectors = [self.cache.get(key) for key in keys]
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], []).append(i)
+        if missing:
+            encoded = self.encode_many([texts[positions[0]] for positions in missing.values()])
+            for (key, positions), vector in zip(missing.items(), encoded):
+                self.cache.put(key, vector)
+                for i in positions:
+                    vectors[i] = vector
+        return vectors
+
+    def context_embeddings(self, queries: List[str], histories: List[Optional[List[Dict]]],
+                           session_ids: List[Optional[str]] = None) -> np.ndarray:
+        """One unit-length context embedding per query, blending in its recent history"""
+        if not queries:
+            return np.empty((0, 0), dtype=np.float32)
+        session_ids = session_ids or [None] * len(queries)
+        texts, owners, weights = [], [], []
+        for row, (query, history, session_id) in enumerate(zip(queries, histories, session_ids)):
+            messages = [msg['content'] for msg in (history or [])[-self.history_turns:] if msg.get('content')]
+            for age, message in enumerate(reversed(messages)):
+                texts.append(message)
+                owners.append((row, session_id))
+                weights.append(self.history_weight * self.decay ** age)
+            texts.append(query)
+            owners.append((row, session_id))
+            weights.append(1.0)
+
+        vectors = self.embed(texts, [session_id for _, session_id in owners])
+        combined = np.zeros((len(queries), len(vectors[0])), dtype=np.float32)
+        for (row, _), weight, vector in zip(owners, weights, vectors):
+            combined[row] += weight * np.asarray(vector, dtype=np.float32)
+        norms = np.linalg.norm(combined, axis=1, keepdims=True)
+        return combined / np.where(norms > 0, norms, 1.0)
+
+    def context_embedding(self, query: str, history: Optional[List[Dict]] = None,
+                          session_id: Optional[str] = None) -> np.ndarray:
+        return self.context_embeddings([query], [history], [session_id])[0]
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        return self.cache.stats()
@@ -0,0 +1,188 @@
+import faiss
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional
+import logging
+
+from .quantization import QUANTIZATIONS, SCALAR_QUANTIZER_TYPES, BinaryIndex
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# FAISS warns below ~39 training points per IVF centroid
+MIN_POINTS_PER_CENTROID = 39
+
+@dataclass
+class IndexConfig:
+    """FAISS index settings shared by the vector stores"""
+    index_type: str = "flat"
+    nlist: int = 1024           # IVF coarse centroids
+    hnsw_m: int = 32            # HNSW graph degree
+    ef_construction: int = 200  # HNSW build-time beam width
+    pq_m: int = 16              # PQ sub-quantizers, must divide the dimension
+    pq_nbits: int = 8           # bits per PQ code
+    nprobe: int = 16            # default IVF lists visited per query
+    ef_search: int = 64         # default HNSW beam width per query
+    quantization: str = "none"  # vector codes: none, fp16, int8 or binary (sign bits)
+    rerank_factor: int = 0      # re-score top_k * rerank_factor candidates with stored vectors, 0 = off
+
+    def __post_init__(self):
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{self.index_type}', expected one of {INDEX_TYPES}")
+        if self.quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{self.quantization}', expected one of {QUANTIZATIONS}")
+        if self.quantization == "binary" and self.index_type != "flat":
+            raise ValueError("Binary quantization is only supported with the flat index")
+        if self.quantization != "none" and self.index_type == "ivf_pq":
+            raise ValueError("ivf_pq already compresses vectors; use quantization='none'")
+
+    @property
+    def requires_training(self) -> bool:
+        return self.index_type in ("ivf_flat", "ivf_pq")
+
+    @property
+    def min_training_size(self) -> int:
+        """Smallest corpus the configured index can be trained on"""
+        if self.index_type == "ivf_flat":
+            return MIN_POINTS_PER_CENTROID
+        if self.index_type == "ivf_pq":
+            return max(MIN_POINTS_PER_CENTROID, 2 ** self.pq_nbits)
+        return 0
+
+def target_nlist(config: IndexConfig, n_vectors: int) -> int:
+    """IVF list count for a corpus: the configured nlist, or fewer while it is too small to train them"""
+    return max(1, min(config.nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+
+def undertrained(config: IndexConfig, n_vectors: int, nlist: int) -> bool:
+    """An IVF index with nlist lists should be retrained for n_vectors
+
+    Retraining waits until the target list count doubles (or reaches the
+    configured nlist), so a growing corpus is retrained O(log n) times.
+    """
+    if not config.requires_training or nlist <= 0:
+        return False
+    target = target_nlist(config, n_vectors)
+    return target > nlist and target >= min(config.nlist, 2 * nlist)
+
+def _scalar_quantizer_training(training_vectors: Optional[np.ndarray], dimension: int) -> np.ndarray:
+    """Vectors to fit scalar quantizer ranges on; the [-1, 1] box of unit vectors when there are none"""
+    if training_vectors is not None and len(training_vectors):
+        return np.ascontiguousarray(training_vectors, dtype='float32')
+    return np.vstack([-np.ones(dimension), np.ones(dimension)]).astype('float32')
+
+def build_index(config: IndexConfig, dimension: int, training_vectors: Optional[np.ndarray] = None):
+    """Create an empty inner-product index wrapped in an IndexIDMap.
+
+    Indexes that need training are trained on ``training_vectors``; when too
+    few are available a flat index is returned instead so the store keeps
+    working until ``upgrade_index`` can build the configured type. IVF
+    indexes get ``target_nlist`` lists; see ``undertrained`` for when to
+    retrain as the corpus grows. With
+    quantization the flat, HNSW and IVF indexes store fp16/int8 codes, and
+    binary quantization returns a BinaryIndex.
+    """
+    index_type = config.index_type
+    n_train = 0 if training_vectors is None else len(training_vectors)
+    qtype = SCALAR_QUANTIZER_TYPES.get(config.quantization)
+
+    if config.quantization == "binary":
+        return BinaryIndex(dimension)
+
+    if config.requires_training and n_train < config.min_training_size:
+        index_type = "flat"
+
+    if index_type == "flat":
+        if qtype is None:
+            inner = faiss.IndexFlatIP(dimension)
+        else:
+            inner = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+            inner.train(_scalar_quantizer_training(training_vectors, dimension))
+    elif index_type == "hnsw":
+        if qtype is None:
+            inner = faiss.IndexHNSWFlat(dimension, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        else:
+            inner = faiss.IndexHNSWSQ(dimension, qtype, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            inner.train(_scalar_quantizer_training(training_vectors, dimension))
+        inner.hnsw.efConstruction = config.ef_construction
+        inner.hnsw.efSearch = config.ef_search
+    else:
+        nlist = target_nlist(config, n_train)
+        quantizer = faiss.IndexFlatIP(dimension)
+        if index_type == "ivf_flat" and qtype is not None:
+            inner = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, qtype, faiss.METRIC_INNER_PRODUCT)
+        elif index_type == "ivf_flat":
+            inner = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            if dimension % config.pq_m != 0:
+                raise ValueError(f"pq_m={config.pq_m} must divide the embedding dimension {dimension}")
+            inner = faiss.IndexIVFPQ(quantizer, dimension, nlist, config.pq_m,
+                                     config.pq_nbits, faiss.METRIC_INNER_PRODUCT)
+        inner.train(np.ascontiguousarray(training_vectors, dtype='float32'))
+        inner.nprobe = min(config.nprobe, nlist)
+        logger.info(f"Trained {index_type} index with nlist={nlist} on {n_train} vectors")
+
+    return faiss.IndexIDMap(inner)
+
+def _unwrap(index: faiss.Index) -> faiss.Index:
+    """Index behind an IndexIDMap (indexes saved before the id map are returned as is)"""
+    if isinstance(index, BinaryIndex):
+        return index
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return faiss.downcast_index(index)
+
+def index_type_of(index: faiss.Index) -> str:
+    """Name of the index type behind an IndexIDMap"""
+    inner = _unwrap(index)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+def trained_nlist(index) -> int:
+    """IVF list count of an index, 0 for indexes without lists"""
+    inner = _unwrap(index)
+    return int(inner.nlist) if isinstance(inner, faiss.IndexIVF) else 0
+
+def quantization_of(index) -> str:
+    """Vector codes an index stores"""
+    inner = _unwrap(index)
+    if isinstance(inner, BinaryIndex):
+        return "binary"
+    if isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    if isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return {qtype: name for name, qtype in SCALAR_QUANTIZER_TYPES.items()}.get(inner.sq.qtype, "sq")
+    return "none"
+
+def upgrade_index(index: faiss.Index, config: IndexConfig) -> faiss.Index:
+    """Replace a flat fallback index with the configured type once it holds enough vectors to train"""
+    if not config.requires_training or index_type_of(index) != "flat":
+        return index
+    if not isinstance(index, faiss.IndexIDMap):
+        return index
+    if index.ntotal < config.min_training_size:
+        return index
+
+    inner = _unwrap(index)
+    vectors = inner.reconstruct_n(0, index.ntotal)
+    ids = faiss.vector_to_array(index.id_map)
+
+    upgraded = build_index(config, index.d, vectors)
+    upgraded.add_with_ids(vectors, ids)
+    logger.info(f"Upgraded flat index to {config.index_type} with {index.ntotal} vectors")
+    return upgraded
+
+def search_parameters(index: faiss.Index, nprobe: Optional[int] = None,
+                      ef_search: Optional[int] = None) -> Optional[faiss.SearchParameters]:
+    """Per-query search parameters for the index, or None for exhaustive indexes"""
+    inner = _unwrap(index)
+    if isinstance(inner, faiss.IndexIVF) and nprobe is not None:
+        return faiss.SearchParametersIVF(nprobe=min(nprobe, inner.nlist))
+    if isinstance(inner, faiss.IndexHNSW) and ef_search is not None:
+        return faiss.SearchParametersHNSW(efSearch=ef_search)
+    return None
@@ -0,0 +1,55 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+from .write_behind import WriteBehindWorker
+
+class IngestionWorker(WriteBehindWorker):
+    """Background writer that moves document ingestion off the request path
+
+    Callers hand over documents with embeddings they already computed; the
+    worker drops ids that are already pending and writes the rest to the
+    store (SQLite and FAISS) in batches, retrying failed ones.
+    """
+    name = "ingestion-worker"
+
+    def __init__(self, vector_store, batch_size: int = 64, flush_interval: float = 1.0,
+                 max_retries: int = 3, retry_delay: float = 0.1):
+        self.vector_store = vector_store
+        self._pending = set()
+        self.duplicates = 0
+        super().__init__(batch_size, flush_interval, max_retries, retry_delay)
+
+    def submit(self, contents: List[str], sources: List[str], embeddings: np.ndarray,
+               metadata_list: Optional[List[Dict]] = None) -> int:
+        """Queue documents for writing; returns how many were accepted"""
+        if metadata_list is None:
+            metadata_list = [{}] * len(contents)
+        doc_ids = [self.vector_store.document_id(content, source) for content, source in zip(contents, sources)]
+
+        accepted = 0
+        with self._lock:
+            self._check_open()
+            for doc_id, content, source, embedding, metadata in zip(doc_ids, contents, sources, embeddings,
+                                                                    metadata_list):
+                if doc_id in self._pending:
+                    self.duplicates += 1
+                    continue
+                self._pending.add(doc_id)
+                self._enqueue((doc_id, content, source, embedding, metadata))
+                accepted += 1
+        return accepted
+
+    def _write_batch(self, batch):
+        """Write one batch in a single store transaction"""
+        _, contents, sources, embeddings, metadata_list = zip(*batch)
+        self.vector_store.add_embedded_documents(list(contents), list(sources),
+                                                 np.vstack(embeddings), list(metadata_list))
+
+    def _release(self, batch):
+        with self._lock:
+            self._pending.difference_update(item[0] for item in batch)
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats['duplicates'] = self.duplicates
+        return stats
@@ -8,11 +8,44 @@ __author__ = "Sanika Chavan"
 from .complete_rag_system import ProductionRAGSystem, ConversationMemory
 from .vector_store import EnhancedVectorStore
 from .retriever import RAGRetriever, WebKnowledgeRetriever
+from .index_factory import IndexConfig
+from .embedding_cache import CachedEmbeddingModel, get_embedding_model
+from .embedding_batcher import EmbeddingBatcher
+from .ttl_cache import TTLCache
+from .write_behind import WriteBehindWorker
+from .ingestion import IngestionWorker
+from .rwlock import ReadWriteLock
+from .serving import run_snapshot_writer
+from .chunking import TextChunker
+from .sqlite_pool import SQLiteConnectionManager
+from .query_cache import SemanticQueryCache
+from .session_store import SessionManager
+from .conversation_writer import ConversationWriter
+from .context_window import ContextWindow
+from .history_embeddings import HistoryEmbeddingCache
+from .fact_store import FactStore
 
 __all__ = [
     'ProductionRAGSystem',
     'ConversationMemory', 
     'EnhancedVectorStore',
     'RAGRetriever',
-    'WebKnowledgeRetriever'
+    'WebKnowledgeRetriever',
+    'IndexConfig',
+    'CachedEmbeddingModel',
+    'get_embedding_model',
+    'EmbeddingBatcher',
+    'TTLCache',
+    'WriteBehindWorker',
+    'IngestionWorker',
+    'ReadWriteLock',
+    'run_snapshot_writer',
+    'TextChunker',
+    'SQLiteConnectionManager',
+    'SemanticQueryCache',
+    'SessionManager',
+    'ConversationWriter',
+    'ContextWindow',
+    'HistoryEmbeddingCache',
+    'FactStore'
 ]
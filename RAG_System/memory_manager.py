@@ -1,19 +1,53 @@
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from typing import List, Dict, Callable, Optional, Union
+from collections import deque
+from datetime import datetime
 import json
 import logging
+import re
+
+from .context_window import ContextWindow, count_tokens
+from .embedding_cache import CachedEmbeddingModel, get_embedding_model
+from .fact_store import FactStore
 
 logger = logging.getLogger(__name__)
 
+# User statements worth remembering about the user
+FACT_PATTERN = re.compile(r"name is|\bi am\b|\bi work\b|\bi like\b|my favorite", re.IGNORECASE)
+
 class MemoryManager:
-    """Manages conversation memory and context"""
-    def __init__(self, max_history: int = 20, context_window: int = 4000):
+    """Manages conversation memory and context
+    
+    context_window is a budget in tokens (counted by token_counter); the
+    context holds whole turns only, newest first until the budget is spent.
+    Facts the user states about themselves go to a bounded FactStore and are
+    recalled by relevance to the current query. Unless a fact_store is given,
+    one is created with the first fact, embedding with embedding_model (a
+    model name or an already loaded, shared model).
+    """
+    def __init__(self, max_history: int = 20, context_window: int = 1000, recent_turns: int = 5,
+                 token_counter: Callable[[str], int] = count_tokens,
+                 embedding_model: Union[str, CachedEmbeddingModel] = "all-MiniLM-L6-v2",
+                 max_facts: int = 256, fact_store: Optional[FactStore] = None):
         self.max_history = max_history
         self.context_window = context_window
-        self.conversation_history = []
-        self.important_facts = []
+        self.conversation_history = deque(maxlen=max_history)
+        self.context = ContextWindow(context_window, recent_turns, max_history, token_counter, separator="\n")
+        self.embedding_model = embedding_model
+        self.max_facts = max_facts
+        self._fact_store = fact_store
         self.user_preferences = {}
     
+    @property
+    def fact_store(self) -> FactStore:
+        """The fact store, loading the embedding model on first use"""
+        if self._fact_store is None:
+            model = self.embedding_model
+            if isinstance(model, str):
+                model = get_embedding_model(model)
+            self._fact_store = FactStore(lambda texts: model.encode(texts, normalize_embeddings=True),
+                                         model.get_sentence_embedding_dimension(), max_facts=self.max_facts)
+        return self._fact_store
+    
     def add_exchange(self, user_message: str, assistant_response: str, metadata: Dict = None):
         """Add a conversation exchange"""
         exchange = {
@@ -24,58 +58,41 @@ class MemoryManager:
         }
         
         self.conversation_history.append(exchange)
-        
-        # Maintain history limit
-        if len(self.conversation_history) > self.max_history:
-            self.conversation_history = self.conversation_history[-self.max_history:]
+        self.context.append(self._render(exchange))
         
         # Extract important facts
         self._extract_important_facts(user_message, assistant_response)
     
-    def get_context(self, recent_turns: int = 5) -> str:
-        """Get formatted conversation context"""
-        recent_history = self.conversation_history[-recent_turns:]
-        
-        context_parts = []
-        for exchange in recent_history:
-            context_parts.append(f"User: {exchange['user_message']}")
-            context_parts.append(f"Assistant: {exchange['assistant_response']}")
-        
-        context = "\n".join(context_parts)
-        
-        # Truncate if too long
-        if len(context) > self.context_window:
-            context = context[-self.context_window:]
-        
-        return context
+    @staticmethod
+    def _render(exchange: Dict) -> str:
+        return f"User: {exchange['user_message']}\nAssistant: {exchange['assistant_response']}"
+    
+    def get_context(self, recent_turns: Optional[int] = None) -> str:
+        """Get formatted conversation context (the configured recent_turns by default)"""
+        return self.context.text(recent_turns)
+    
+    @property
+    def important_facts(self) -> List[Dict]:
+        return self._fact_store.facts() if self._fact_store else []
     
     def _extract_important_facts(self, user_message: str, assistant_response: str):
         """Extract and store important facts from conversation"""
-        # Simple fact extraction based on keywords
-        keywords = ["name is", "I am", "I work", "I like", "my favorite"]
-        
-        for keyword in keywords:
-            if keyword in user_message.lower():
-                fact = {
-                    "fact": user_message,
-                    "timestamp": datetime.now().isoformat(),
-                    "context": "user_statement"
-                }
-                self.important_facts.append(fact)
-                break
+        if FACT_PATTERN.search(user_message):
+            self.fact_store.add(user_message, context="user_statement")
     
-    def get_user_context(self) -> str:
-        """Get relevant user context and preferences"""
-        if not self.important_facts:
+    def get_user_context(self, query: Optional[str] = None, max_facts: int = 5) -> str:
+        """Facts most relevant to the query (the most recent ones without a query)"""
+        if not self._fact_store:
             return ""
-        
-        recent_facts = [f["fact"] for f in self.important_facts[-5:]]
-        return "User context: " + "; ".join(recent_facts)
+        facts = self.fact_store.relevant(query, max_facts) if query else self.fact_store.recent(max_facts)
+        if not facts:
+            return ""
+        return "User context: " + "; ".join(f["fact"] for f in facts)
     
     def save_memory(self, filepath: str):
         """Save memory to file"""
         memory_data = {
-            "conversation_history": self.conversation_history,
+            "conversation_history": list(self.conversation_history),
             "important_facts": self.important_facts,
             "user_preferences": self.user_preferences
         }
@@ -89,8 +106,15 @@ class MemoryManager:
             with open(filepath, 'r') as f:
                 memory_data = json.load(f)
             
-            self.conversation_history = memory_data.get("conversation_history", [])
-            self.important_facts = memory_data.get("important_facts", [])
+            self.conversation_history = deque(memory_data.get("conversation_history", []), maxlen=self.max_history)
+            self.context.clear()
+            for exchange in self.conversation_history:
+                self.context.append(self._render(exchange))
+            facts = memory_data.get("important_facts", [])
+            if self._fact_store:
+                self._fact_store.clear()
+            if facts:
+                self.fact_store.add_many(facts)
             self.user_preferences = memory_data.get("user_preferences", {})
             
             logger.info(f"Loaded memory with {len(self.conversation_history)} exchanges")
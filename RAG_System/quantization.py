@@ -0,0 +1,87 @@
+import faiss
+import numpy as np
+from typing import Optional, Tuple
+
+QUANTIZATIONS = ("none", "fp16", "int8", "binary")
+
+SCALAR_QUANTIZER_TYPES = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+def encode_embedding(embedding: np.ndarray, quantization: str = "none") -> bytes:
+    """Stored form of a normalized embedding
+
+    float32 when unquantized, float16 for fp16, and int8 codes with a
+    float32 per-vector scale prefix for int8 and binary (binary indexes only
+    keep sign bits in FAISS, so the database holds enough to re-rank and
+    rebuild them).
+    """
+    embedding = np.asarray(embedding, dtype=np.float32)
+    if quantization == "none":
+        return embedding.tobytes()
+    if quantization == "fp16":
+        return embedding.astype(np.float16).tobytes()
+    scale = float(np.abs(embedding).max()) / 127 or 1.0
+    codes = np.round(embedding / scale).astype(np.int8)
+    return np.float32(scale).tobytes() + codes.tobytes()
+
+def decode_embedding(blob: bytes, dimension: int) -> np.ndarray:
+    """float32 embedding from any stored form, told apart by its length
+
+    Rows written before a store switched quantization keep decoding.
+    """
+    if len(blob) == 4 * dimension:
+        return np.frombuffer(blob, dtype=np.float32)
+    if len(blob) == 2 * dimension:
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+    if len(blob) == dimension + 4:
+        scale = np.frombuffer(blob[:4], dtype=np.float32)[0]
+        return np.frombuffer(blob[4:], dtype=np.int8).astype(np.float32) * scale
+    raise ValueError(f"Embedding blob of {len(blob)} bytes does not match dimension {dimension}")
+
+class BinaryIndex:
+    """Float-vector interface over a FAISS binary index of sign bits
+
+    Vectors are stored as one bit per dimension (32x smaller than float32)
+    and compared by Hamming distance, reported as the cosine estimate
+    cos(pi * hamming / d) so scores stay comparable with the float indexes.
+    """
+    def __init__(self, dimension: int, index: Optional[faiss.IndexBinary] = None):
+        self.d = dimension
+        self.bits = (dimension + 7) // 8 * 8
+        self.index = index if index is not None else faiss.IndexBinaryIDMap(faiss.IndexBinaryFlat(self.bits))
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @staticmethod
+    def pack(vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray):
+        self.index.add_with_ids(self.pack(vectors), np.asarray(ids, dtype=np.int64))
+
+    def search(self, queries: np.ndarray, k: int, params=None) -> Tuple[np.ndarray, np.ndarray]:
+        distances, ids = self.index.search(self.pack(queries), k)
+        return np.cos(np.pi * distances / self.d).astype(np.float32), ids
+
+def write_index(index, path: str):
+    """Save a float or binary index"""
+    if isinstance(index, BinaryIndex):
+        faiss.write_index_binary(index.index, path)
+    else:
+        faiss.write_index(index, path)
+
+def read_index(path: str, dimension: int, quantization: str = "none", flags: int = 0):
+    """Load an index saved by write_index"""
+    if quantization == "binary":
+        return BinaryIndex(dimension, faiss.read_index_binary(path, flags))
+    return faiss.read_index(path, flags)
+
+def index_bytes(index) -> int:
+    """Serialized size of an index, a close proxy for its resident memory"""
+    if isinstance(index, BinaryIndex):
+        return faiss.serialize_index_binary(index.index).nbytes
+    return faiss.serialize_index(index).nbytes
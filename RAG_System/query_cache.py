@@ -0,0 +1,164 @@
+import re
+import threading
+import faiss
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+class SemanticQueryCache:
+    """Retrieval results keyed by query text, reused for near-identical queries
+
+    A lookup first matches the normalized query text ("What is SwiftUI?" and
+    "what is swiftui" share an entry), then falls back to the nearest cached
+    query embedding in a small inner-product index, accepting it when the
+    cosine similarity reaches similarity_threshold. Entries are only reused
+    for the same variant (top_k and search parameters).
+
+    Every entry belongs to a corpus version; a lookup or insert at a newer
+    version drops the whole cache, so results never outlive the documents
+    they were ranked against. Least recently used entries are evicted past
+    maxsize.
+    """
+    def __init__(self, encode: Callable[[str], np.ndarray], dimension: int, maxsize: int = 1024,
+                 similarity_threshold: float = 0.95, neighbors: int = 4):
+        self.encode = encode
+        self.dimension = dimension
+        self.maxsize = maxsize
+        self.similarity_threshold = similarity_threshold
+        self.neighbors = neighbors
+        self._lock = threading.Lock()
+        self._reset(version=None)
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _reset(self, version: Optional[int]):
+        self.version = version
+        self._entries = OrderedDict()  # (normalized text, variant) -> (row id, results)
+        self._rows = {}                # row id -> (normalized text, variant)
+        self._index = faiss.IndexIDMap(faiss.IndexFlatIP(self.dimension))
+        self._next_row = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Case-, punctuation- and whitespace-insensitive form of a query"""
+        return ' '.join(re.findall(r'\w+', query.lower()))
+
+    def _check_version(self, version: int) -> bool:
+        """Drop everything cached for an older corpus; False if version is older than the cache"""
+        if self.version is None or version > self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._reset(version)
+        return version == self.version
+
+    def get(self, query: str, variant: Hashable, version: int,
+            embedding: Optional[np.ndarray] = None) -> Optional[List[Any]]:
+        """Cached results for query (or a near-duplicate of it) at this corpus version
+
+        embedding, when the caller already has one, replaces encoding the query.
+        """
+        results = self.get_exact(query, variant, version)
+        if results is not None:
+            return results
+        return self.get_similar(query, variant, version, embedding)
+
+    def get_exact(self, query: str, variant: Hashable, version: int) -> Optional[List[Any]]:
+        """Cached results for the normalized query text; never encodes
+
+        A miss is not counted here, since callers follow it with get_similar.
+        """
+        if self.maxsize <= 0:
+            return None
+        key = (self.normalize_query(query), variant)
+        with self._lock:
+            if not self._check_version(version):
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return list(entry[1])
+
+    def get_similar(self, query: str, variant: Hashable, version: int,
+                    embedding: Optional[np.ndarray] = None) -> Optional[List[Any]]:
+        """Cached results of the nearest cached query, if it is similar enough"""
+        if self.maxsize <= 0:
+            return None
+        with self._lock:
+            if version != self.version or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+
+        # Encode outside the lock; the encoder batches concurrent callers itself
+        if embedding is None:
+            embedding = self.encode(query)
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            if version != self.version:
+                self.misses += 1
+                return None
+            scores, rows = self._index.search(embedding, min(self.neighbors, self._index.ntotal))
+            for score, row in zip(scores[0], rows[0]):
+                if score < self.similarity_threshold:
+                    break
+                match = self._rows.get(int(row))
+                if match is not None and match[1] == variant:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return list(self._entries[match][1])
+            self.misses += 1
+            return None
+
+    def put(self, query: str, variant: Hashable, version: int, results: List[Any],
+            embedding: Optional[np.ndarray] = None):
+        """Cache results computed against the given corpus version"""
+        if self.maxsize <= 0:
+            return
+        key = (self.normalize_query(query), variant)
+        if embedding is None:
+            embedding = self.encode(query)
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            # Results ranked against a corpus that has since changed are not cached
+            if not self._check_version(version):
+                return
+            if key in self._entries:
+                row, _ = self._entries[key]
+                self._entries[key] = (row, list(results))
+                self._entries.move_to_end(key)
+                return
+
+            row = self._next_row
+            self._next_row += 1
+            self._index.add_with_ids(embedding, np.array([row], dtype=np.int64))
+            self._entries[key] = (row, list(results))
+            self._rows[row] = key
+            while len(self._entries) > self.maxsize:
+                _, (old_row, _) = self._entries.popitem(last=False)
+                del self._rows[old_row]
+                self._index.remove_ids(np.array([old_row], dtype=np.int64))
+
+    def clear(self):
+        with self._lock:
+            self._reset(self.version)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Hit/miss counters for monitoring"""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'version': self.version,
+            'exact_hits': self.exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': (self.exact_hits + self.semantic_hits) / lookups if lookups else None
+        }
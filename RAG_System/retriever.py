@@ -7,7 +7,9 @@ logger = logging.getLogger(__name__)
 
 class WebRetriever:
     """Web retrieval component"""
-    def __init__(self):
+    def __init__(self, base_url: str = "https://api.duckduckgo.com/", timeout: float = 10):
+        self.base_url = base_url
+        self.timeout = timeout
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (compatible; RAGBot/1.0)'
@@ -17,7 +19,7 @@ class WebRetriever:
         """Search web for information"""
         try:
             # Using DuckDuckGo Instant Answer API
-            url = "https://api.duckduckgo.com/"
+            url = self.base_url
             params = {
                 'q': query,
                 'format': 'json',
@@ -25,7 +27,7 @@ class WebRetriever:
                 'skip_disambig': '1'
             }
             
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=self.timeout)
             data = response.json()
             
             results = []
@@ -0,0 +1,65 @@
+import numpy as np
+import queue
+import time
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+def run_snapshot_writer(write_queue, ready, system_options: Dict[str, Any],
+                        batch_size: int = 64, publish_interval: float = 1.0):
+    """Single writer for multi-process serving
+
+    Owns the only writable EnhancedVectorStore. Read replicas forward their
+    writes over write_queue as (contents, sources, embeddings, metadata_list)
+    tuples; they are applied in batches and a new snapshot is published at
+    most once per publish_interval, which replicas then memory-map. A None
+    item stops the writer after a final publish.
+    """
+    from .complete_rag_system import ProductionRAGSystem
+
+    rag_system = ProductionRAGSystem(**system_options)
+    store = rag_system.vector_store
+    # Replicas start from the snapshot, so make sure one matches the database
+    store.save_snapshot()
+    ready.set()
+    logger.info(f"Snapshot writer ready at store version {store.store_version}")
+
+    published_version = store.store_version
+    last_publish = time.monotonic()
+    stop = False
+    while not stop:
+        batches = []
+        try:
+            item = write_queue.get(timeout=publish_interval)
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                batches.append(item)
+                if sum(len(batch[0]) for batch in batches) >= batch_size:
+                    break
+                item = write_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+        if batches:
+            contents, sources, embeddings, metadata_list = [], [], [], []
+            for batch in batches:
+                contents.extend(batch[0])
+                sources.extend(batch[1])
+                embeddings.append(batch[2])
+                metadata_list.extend(batch[3])
+            try:
+                store.add_embedded_documents(contents, sources, np.vstack(embeddings), metadata_list)
+            except Exception as e:
+                logger.error(f"Snapshot writer failed to add {len(contents)} documents: {e}")
+
+        now = time.monotonic()
+        if store.store_version != published_version and (stop or now - last_publish >= publish_interval):
+            store.save_snapshot()
+            published_version = store.store_version
+            last_publish = now
+
+    rag_system.shutdown()
+    logger.info("Snapshot writer stopped")
@@ -0,0 +1,178 @@
+import threading
+import time
+import uuid
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .sqlite_pool import SQLiteConnectionManager
+from .conversation_writer import ConversationWriter
+
+logger = logging.getLogger(__name__)
+
+class SessionManager:
+    """Per-session conversation memory backed by the conversations table
+
+    Hot sessions live in a bounded LRU of memory objects (built by
+    memory_factory, e.g. ConversationMemory). Every exchange is queued for
+    persistence as it is added (written behind by writer when one is given,
+    else synchronously), so sessions evicted for being idle longer than
+    idle_timeout seconds, or pushed out past max_sessions, lose nothing and
+    are reloaded lazily (their last max_history turns, including queued
+    ones) on next use.
+
+    The LRU is per process; under the pre-fork server a session's turns are
+    shared through SQLite, but a worker may serve an older cached copy until
+    the session goes idle there.
+    """
+    def __init__(self, db: SQLiteConnectionManager, memory_factory: Callable[[], Any],
+                 max_sessions: int = 1000, idle_timeout: float = 1800.0, max_history: int = 10,
+                 writer: Optional[ConversationWriter] = None):
+        self.db = db
+        self.writer = writer
+        self.memory_factory = memory_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_history = max_history
+        self._sessions = OrderedDict()  # session_id -> (memory, last access)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._init_database()
+
+    def _init_database(self):
+        """Create the session tables (same layout as database/init_database.sql)"""
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    user_message TEXT NOT NULL,
+                    assistant_response TEXT NOT NULL,
+                    context TEXT DEFAULT '',
+                    metadata TEXT DEFAULT '{}',
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    user_id TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    last_activity DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    metadata TEXT DEFAULT '{}'
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations(session_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_activity ON user_sessions(last_activity)')
+
+    def _evict(self, now: float):
+        """Drop idle sessions and trim to max_sessions; caller holds the lock"""
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - last_access <= self.idle_timeout:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def _load(self, session_id: str):
+        """Rebuild a session's memory from its most recent stored and queued turns"""
+        # Queued rows are read first: one committed in between then shows up
+        # in both reads and is deduplicated by id, rather than in neither
+        queued = self.writer.pending(session_id) if self.writer else []
+        rows = self.db.connection().execute('''
+            SELECT id, user_message, assistant_response, timestamp FROM conversations
+            WHERE session_id = ? ORDER BY timestamp DESC, rowid DESC LIMIT ?
+        ''', (session_id, self.max_history)).fetchall()
+        turns = {row_id: (timestamp, user_message, assistant_response)
+                 for row_id, user_message, assistant_response, timestamp in rows}
+        for row_id, _, user_message, assistant_response, _, _, timestamp in queued:
+            turns[row_id] = (timestamp, user_message, assistant_response)
+        
+        memory = self.memory_factory()
+        for timestamp, user_message, assistant_response in sorted(turns.values())[-self.max_history:]:
+            memory.add_exchange(user_message, assistant_response, timestamp=datetime.fromisoformat(timestamp))
+        return memory
+
+    def get(self, session_id: str):
+        """The session's memory, loading it from SQLite if it is not resident"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions[session_id] = (entry[0], now)
+                self._sessions.move_to_end(session_id)
+                self.hits += 1
+                self._evict(now)
+                return entry[0]
+
+        # Read outside the lock so one cold session doesn't stall the others
+        memory = self._load(session_id)
+        with self._lock:
+            # Another request may have loaded it meanwhile; keep the resident copy
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                memory = entry[0]
+            else:
+                self.loads += 1
+            self._sessions[session_id] = (memory, now)
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+            return memory
+
+    def add_exchange(self, session_id: str, user_message: str, assistant_response: str,
+                     context: str = '', metadata: Dict = None):
+        """Record a turn in the session's memory and persist it"""
+        memory = self.get(session_id)
+        timestamp = datetime.now()
+        with self._lock:
+            memory.add_exchange(user_message, assistant_response, timestamp=timestamp)
+
+        row = (uuid.uuid4().hex, session_id, user_message, assistant_response, context,
+               json.dumps(metadata or {}), timestamp.isoformat())
+        if self.writer:
+            self.writer.submit(row)
+            return memory
+        
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO conversations (id, session_id, user_message, assistant_response, context, metadata,
+                                           timestamp, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', row + (row[6],))
+            cursor.execute('''
+                INSERT INTO user_sessions (session_id, created_at, last_activity) VALUES (?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET last_activity = excluded.last_activity
+            ''', (session_id, row[6], row[6]))
+        return memory
+
+    def history(self, session_id: str) -> List[Dict[str, str]]:
+        """The session's turns as role/content messages, oldest first"""
+        memory = self.get(session_id)
+        with self._lock:
+            exchanges = list(memory.conversations)
+        messages = []
+        for exchange in exchanges:
+            messages.append({'role': 'user', 'content': exchange['user']})
+            messages.append({'role': 'assistant', 'content': exchange['assistant']})
+        return messages
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Residency counters for monitoring"""
+        lookups = self.hits + self.loads
+        return {
+            'resident': len(self._sessions),
+            'max_sessions': self.max_sessions,
+            'hits': self.hits,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else None
+        }
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import threading
+import weakref
+import logging
+from contextlib import contextmanager
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+class _Connection(sqlite3.Connection):
+    """sqlite3.Connection that can be weakly referenced"""
+
+class SQLiteConnectionManager:
+    """One long-lived SQLite connection per thread, opened in WAL mode
+
+    WAL lets readers run alongside a writer, and synchronous=NORMAL fsyncs at
+    checkpoints instead of on every commit. Each thread reuses its own
+    connection, so requests skip the open/schema-parse cost; a thread's
+    connection is closed when the thread exits. A forked child opens fresh
+    connections instead of reusing its parent's.
+    """
+    def __init__(self, db_path: str, cache_size_kb: int = 16384, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False,
+                               factory=_Connection)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{self.cache_size_kb}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        if self._pid != os.getpid():
+            # Connections must not cross fork(); keep the inherited ones referenced
+            # so they are never used or closed (closing could disturb the parent's locks)
+            self._inherited = self._local
+            self._local = threading.local()
+            self._connections = weakref.WeakSet()
+            self._pid = os.getpid()
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Cursor whose writes commit together, or roll back on error"""
+        conn = self.connection()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def close(self):
+        """Close every open connection; threads reconnect on next use"""
+        with self._lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
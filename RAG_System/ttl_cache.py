@@ -0,0 +1,136 @@
+import json
+import time
+import os
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from .sqlite_pool import SQLiteConnectionManager
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire, optionally backed by SQLite
+
+    Values must be JSON-serializable when db_path is set. Expired entries
+    are dropped lazily on lookup; whenever the in-memory tier evicts, the
+    persistent table loses its expired rows and is trimmed to the maxsize
+    most recently written ones.
+    """
+    def __init__(self, maxsize: int = 1000, ttl: float = 6 * 3600, db_path: Optional[str] = None,
+                 table: str = "ttl_cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.db_path = db_path
+        self.db = SQLiteConnectionManager(db_path) if db_path else None
+        self.table = table
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if db_path:
+            self._init_database()
+
+    def _init_database(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        with self.db.transaction() as cursor:
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{self.table}_expires ON {self.table}(expires_at)')
+            self._prune(cursor)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a live entry, falling back to the persistent tier"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+
+        if self.db:
+            row = self.db.connection().execute(
+                f'SELECT value, expires_at FROM {self.table} WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                if self._put_memory(key, value, row[1]):
+                    with self.db.transaction() as cursor:
+                        self._prune(cursor)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value for ttl seconds (the cache default when omitted)"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        evicted = self._put_memory(key, value, expires_at)
+
+        if self.db:
+            with self.db.transaction() as cursor:
+                cursor.execute(f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)',
+                               (key, json.dumps(value), expires_at))
+                if evicted:
+                    self._prune(cursor)
+
+    def _put_memory(self, key: str, value: Any, expires_at: float) -> bool:
+        """Store in the memory tier, returning True if that evicted an entry"""
+        evicted = False
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+                evicted = True
+        return evicted
+
+    def _prune(self, cursor):
+        """Drop expired rows, then all but the maxsize most recently written"""
+        cursor.execute(f'DELETE FROM {self.table} WHERE expires_at < ?', (time.time(),))
+        # INSERT OR REPLACE gives a rewritten key a new rowid, so rowid order is write order
+        cursor.execute(f'''
+            DELETE FROM {self.table} WHERE rowid <= (
+                SELECT rowid FROM {self.table} ORDER BY rowid DESC LIMIT 1 OFFSET ?
+            )
+        ''', (self.maxsize,))
+
+    def close(self):
+        """Close the persistent tier's connections"""
+        if self.db:
+            self.db.close()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'persistent': bool(self.db_path)
+        }
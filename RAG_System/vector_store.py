@@ -1,18 +1,22 @@
 import faiss
 import numpy as np
 import pickle
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Optional
 import logging
 
+from .index_factory import IndexConfig, build_index, upgrade_index, search_parameters
+from .embedding_cache import get_embedding_model
+
 logger = logging.getLogger(__name__)
 
 class VectorStore:
     """Standalone vector store implementation"""
-    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2"):
-        self.embedding_model = SentenceTransformer(embedding_model)
+    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2", index_config: IndexConfig = None,
+                 embedding_cache_path: Optional[str] = None):
+        self.embedding_model = get_embedding_model(embedding_model, embedding_cache_path)
         self.dimension = self.embedding_model.get_sentence_embedding_dimension()
-        self.index = faiss.IndexFlatIP(self.dimension)
+        self.index_config = index_config or IndexConfig()
+        self.index = build_index(self.index_config, self.dimension)
         self.documents = []
         self.metadata = []
     
@@ -22,20 +26,27 @@ class VectorStore:
             metadata = [{}] * len(documents)
         
         embeddings = self.embedding_model.encode(documents, normalize_embeddings=True)
-        self.index.add(embeddings.astype('float32'))
+        ids = np.arange(len(self.documents), len(self.documents) + len(documents), dtype=np.int64)
+        self.index.add_with_ids(embeddings.astype('float32'), ids)
+        self.index = upgrade_index(self.index, self.index_config)
         self.documents.extend(documents)
         self.metadata.extend(metadata)
         
         logger.info(f"Added {len(documents)} documents to vector store")
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, top_k: int = 5, nprobe: int = None, ef_search: int = None) -> List[Dict[str, Any]]:
         """Search for similar documents"""
         query_embedding = self.embedding_model.encode([query], normalize_embeddings=True)
-        scores, indices = self.index.search(query_embedding.astype('float32'), top_k)
+        params = search_parameters(
+            self.index,
+            nprobe=nprobe or self.index_config.nprobe,
+            ef_search=ef_search or self.index_config.ef_search
+        )
+        scores, indices = self.index.search(query_embedding.astype('float32'), top_k, params=params)
         
         results = []
         for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.documents):
+            if 0 <= idx < len(self.documents):
                 results.append({
                     "document": self.documents[idx],
                     "metadata": self.metadata[idx],
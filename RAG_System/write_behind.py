@@ -0,0 +1,129 @@
+import queue
+import time
+import threading
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindWorker:
+    """Single background thread that writes queued items in batches
+
+    Items are grouped into batches of up to batch_size, or whatever has
+    queued after flush_interval seconds, and handed to _write_batch, which
+    subclasses implement. A batch whose write raises is retried up to
+    max_retries times, waiting retry_delay seconds and doubling it after each
+    attempt, before it is dropped and counted in stats()['dropped'].
+    """
+    name = "write-behind"
+
+    def __init__(self, batch_size: int, flush_interval: float, max_retries: int = 3, retry_delay: float = 0.1):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+
+        self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._worker.start()
+
+    def _check_open(self):
+        """Raise once close() has started; call with _lock held"""
+        if self._closed:
+            raise RuntimeError(f"{type(self).__name__} is closed")
+
+    def _enqueue(self, item: Any):
+        """Queue one item; call with _lock held, after _check_open, so it lands before the sentinel"""
+        self._queue.put(item)
+        self.submitted += 1
+
+    def _write_batch(self, batch: List[Any]):
+        """Write one batch; raise to have it retried"""
+        raise NotImplementedError
+
+    def _release(self, batch: List[Any]):
+        """Called once a batch is written or dropped"""
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if item is None:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+
+    def _write(self, batch: List[Any]):
+        delay = self.retry_delay
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        self.dropped += len(batch)
+                        logger.error(f"{self.name}: dropping {len(batch)} items after {attempt + 1} attempts: {e}")
+                        return
+                    self.retries += 1
+                    logger.warning(f"{self.name}: writing {len(batch)} items failed, retrying in {delay:.2f}s: {e}")
+                    time.sleep(delay)
+                    delay *= 2
+                else:
+                    self.written += len(batch)
+                    self.batches += 1
+                    return
+        finally:
+            self._release(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until everything submitted so far has been written or dropped"""
+        self._queue.join()
+
+    def close(self):
+        """Write whatever is queued and stop the worker"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'queued': self._queue.qsize(),
+            'submitted': self.submitted,
+            'written': self.written,
+            'batches': self.batches,
+            'retries': self.retries,
+            'dropped': self.dropped
+        }
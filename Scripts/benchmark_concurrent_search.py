@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Search throughput of EnhancedVectorStore with concurrent readers, alone and while a writer ingests.
+
+Also checks every hit for torn reads (a document whose id does not match its content).
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RAG_System.complete_rag_system import EnhancedVectorStore
+import argparse
+import itertools
+import tempfile
+import threading
+import time
+import numpy as np
+
+def run_mixed(store, n_readers: int, duration: float, write_batch: int):
+    """Run n_readers search loops, plus one writer when write_batch > 0"""
+    counter = itertools.count()
+    stop = threading.Event()
+    latencies = []
+    torn = [0]
+    written = [0]
+    lock = threading.Lock()
+
+    def reader():
+        local = []
+        while not stop.is_set():
+            query = f"question {next(counter)} about SwiftUI layout"
+            start = time.perf_counter()
+            results = store.search(query, top_k=5, threshold=-1.0)
+            local.append((time.perf_counter() - start) * 1000)
+            bad = sum(doc.id != store.document_id(doc.content, doc.source) for doc in results)
+            if bad:
+                with lock:
+                    torn[0] += bad
+        with lock:
+            latencies.extend(local)
+
+    def writer():
+        for batch in itertools.count():
+            if stop.is_set():
+                break
+            contents = [f"Ingested note {batch}-{i} on Core ML and SwiftUI" for i in range(write_batch)]
+            store.add_documents(contents, ["benchmark"] * write_batch)
+            written[0] += write_batch
+
+    threads = [threading.Thread(target=reader) for _ in range(n_readers)]
+    if write_batch:
+        threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return np.array(latencies), torn[0], written[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--documents', type=int, default=5000, help='documents loaded before measuring')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per run')
+    parser.add_argument('--write-batch', type=int, default=16, help='documents per writer call')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    store = EnhancedVectorStore(embedding_model=args.model, db_path=db_path)
+    store.add_documents([f"Reference document {i} covering Swift topic {i % 97}" for i in range(args.documents)],
+                        ["benchmark"] * args.documents)
+
+    print(f"Model: {args.model}, {args.documents} documents, {args.duration:.0f}s per run")
+    print("\n" + "=" * 76)
+    print(f"{'load':<8} {'readers':>8} {'QPS':>10} {'p50 ms':>10} {'p99 ms':>10} {'docs/s':>10} {'torn':>8}")
+    print("=" * 76)
+
+    for n_readers in (1, 4, 16):
+        for label, write_batch in (('read', 0), ('mixed', args.write_batch)):
+            latencies, torn, written = run_mixed(store, n_readers, args.duration, write_batch)
+            print(f"{label:<8} {n_readers:>8} {len(latencies) / args.duration:>10.1f} "
+                  f"{np.percentile(latencies, 50):>10.2f} {np.percentile(latencies, 99):>10.2f} "
+                  f"{written / args.duration:>10.1f} {torn:>8}")
+
+if __name__ == "__main__":
+    main()
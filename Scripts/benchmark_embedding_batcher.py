@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Query-encoding throughput with and without the EmbeddingBatcher at 1/8/32 concurrent clients.
+
+Every query is unique so the embedding cache never short-circuits the model.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RAG_System.embedding_batcher import EmbeddingBatcher
+from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import itertools
+import threading
+import time
+import numpy as np
+
+def run_clients(encode, n_clients: int, duration: float):
+    """Hammer encode() from n_clients threads and collect per-call latencies"""
+    counter = itertools.count()
+    stop_at = time.perf_counter() + duration
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        local = []
+        while time.perf_counter() < stop_at:
+            query = f"benchmark query number {next(counter)} about SwiftUI and Core ML"
+            start = time.perf_counter()
+            encode(query)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    with ThreadPoolExecutor(max_workers=n_clients) as pool:
+        for _ in range(n_clients):
+            pool.submit(client)
+
+    return np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per run')
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model)
+    model.encode(["warm up"])
+
+    print(f"Model: {args.model}, {args.duration:.0f}s per run, "
+          f"batcher max_batch={args.max_batch} max_wait={args.max_wait_ms}ms")
+    print("\n" + "=" * 68)
+    print(f"{'mode':<10} {'clients':>8} {'QPS':>10} {'p50 ms':>10} {'p99 ms':>10} {'batch':>8}")
+    print("=" * 68)
+
+    for n_clients in (1, 8, 32):
+        direct = run_clients(lambda q: model.encode([q], normalize_embeddings=True), n_clients, args.duration)
+        print(f"{'direct':<10} {n_clients:>8} {len(direct) / args.duration:>10.1f} "
+              f"{np.percentile(direct, 50):>10.2f} {np.percentile(direct, 99):>10.2f} {1:>8.1f}")
+
+        batcher = EmbeddingBatcher(model, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+        batched = run_clients(batcher.encode, n_clients, args.duration)
+        stats = batcher.stats()
+        batcher.close()
+        print(f"{'batched':<10} {n_clients:>8} {len(batched) / args.duration:>10.1f} "
+              f"{np.percentile(batched, 50):>10.2f} {np.percentile(batched, 99):>10.2f} "
+              f"{stats['mean_batch_size']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Vector-only vs hybrid (BM25 + vector, reciprocal-rank fusion) retrieval on the seed data plus a synthetic API corpus.
+
+Reports hit@1, hit@k, MRR, latency and how often each mode would fall through to web search.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RAG_System.complete_rag_system import EnhancedVectorStore, ProductionRAGSystem
+import argparse
+import json
+import random
+import tempfile
+import time
+import numpy as np
+
+FRAMEWORKS = ["Foundation", "UIKit", "SwiftUI", "Core ML", "Combine", "AVFoundation", "MapKit", "CloudKit"]
+VERBS = ["configures", "schedules", "observes", "caches", "validates", "renders", "streams", "persists"]
+OBJECTS = ["network requests", "view layouts", "model predictions", "audio sessions",
+           "map annotations", "database records", "user notifications", "background tasks"]
+
+def seed_queries(seed_path: str):
+    """Seed documents with a keyword query (first tag) and a question per document"""
+    with open(seed_path) as f:
+        documents = json.load(f)['documents']
+    corpus = [(doc['content'], doc['source']) for doc in documents]
+    queries = []
+    for doc in documents:
+        target = EnhancedVectorStore.document_id(doc['content'], doc['source'])
+        queries.append(('keyword', ' '.join(doc['metadata']['tags'][:2]), target))
+        queries.append(('question', f"Tell me about {doc['id'].replace('_', ' ')}", target))
+    return corpus, queries
+
+def synthetic_queries(n_documents: int, rng: random.Random):
+    """API reference entries whose names only appear in their own document"""
+    corpus, queries = [], []
+    for i in range(n_documents):
+        framework = rng.choice(FRAMEWORKS)
+        api = f"{rng.choice(['NS', 'UI', 'AV', 'CK', 'MK'])}{rng.choice(['Shared', 'Deferred', 'Remote', 'Local'])}" \
+              f"{rng.choice(['Session', 'Controller', 'Store', 'Queue'])}{i}"
+        verb, obj = rng.choice(VERBS), rng.choice(OBJECTS)
+        content = f"{api} is a {framework} API that {verb} {obj}. Create one per scene and keep a strong reference."
+        source = f"{framework} Reference"
+        corpus.append((content, source))
+        target = EnhancedVectorStore.document_id(content, source)
+        queries.append(('keyword', api, target))
+        queries.append(('question', f"Which {framework} API {verb} {obj}?", target))
+    return corpus, queries
+
+def evaluate(store, queries, top_k: int, hybrid: bool):
+    latencies, ranks, fallbacks = [], [], 0
+    for _, query, target in queries:
+        start = time.perf_counter()
+        results = store.search(query, top_k=top_k, hybrid=hybrid)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids = [doc.id for doc in results]
+        ranks.append(ids.index(target) + 1 if target in ids else None)
+        fallbacks += ProductionRAGSystem.needs_web_results(results, top_k)
+
+    found = [rank for rank in ranks if rank is not None]
+    return {
+        'hit@1': sum(rank == 1 for rank in found) / len(ranks),
+        f'hit@{top_k}': len(found) / len(ranks),
+        'mrr': sum(1.0 / rank for rank in found) / len(ranks),
+        'p50_ms': np.percentile(latencies, 50),
+        'p99_ms': np.percentile(latencies, 99),
+        'web_fallback': fallbacks / len(ranks)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--documents', type=int, default=2000, help='synthetic documents')
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    seed_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'database', 'seed_data', 'base_knowledge.json')
+    seed_corpus, seed_query_set = seed_queries(seed_path)
+    synth_corpus, synth_query_set = synthetic_queries(args.documents, random.Random(args.seed))
+
+    store = EnhancedVectorStore(embedding_model=args.model, db_path=os.path.join(tempfile.mkdtemp(), 'hybrid.db'))
+    corpus = seed_corpus + synth_corpus
+    store.add_documents([content for content, _ in corpus], [source for _, source in corpus])
+
+    print(f"Model: {args.model}, {len(corpus)} documents, top_k={args.top_k}")
+    header = f"{'queries':<20} {'mode':<8} {'hit@1':>7} {f'hit@{args.top_k}':>7} {'MRR':>7} " \
+             f"{'p50 ms':>8} {'p99 ms':>8} {'web':>7}"
+    print("\n" + "=" * len(header))
+    print(header)
+    print("=" * len(header))
+
+    for name, query_set in (('seed', seed_query_set), ('synthetic', synth_query_set)):
+        for kind in ('keyword', 'question'):
+            subset = [q for q in query_set if q[0] == kind]
+            for mode, hybrid in (('vector', False), ('hybrid', True)):
+                r = evaluate(store, subset, args.top_k, hybrid)
+                print(f"{f'{name}/{kind}':<20} {mode:<8} {r['hit@1']:>7.3f} {r[f'hit@{args.top_k}']:>7.3f} "
+                      f"{r['mrr']:>7.3f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['web_fallback']:>7.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Recall vs. latency report for the FAISS index types against the flat baseline.
+
+Uses the embeddings stored in a rag_store.db when --db is given, otherwise a
+synthetic clustered corpus of the requested size.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RAG_System.index_factory import IndexConfig, build_index, search_parameters
+from RAG_System.quantization import decode_embedding
+import argparse
+import sqlite3
+import time
+import numpy as np
+
+def load_embeddings(db_path: str, dimension: int) -> np.ndarray:
+    """Load stored document embeddings (float32 or quantized blobs) from the vector store database"""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT embedding FROM documents').fetchall()
+    conn.close()
+    return np.vstack([decode_embedding(row[0], dimension) for row in rows])
+
+def synthetic_embeddings(n: int, dimension: int, n_clusters: int = 100, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, closer to sentence embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dimension)).astype('float32')
+    labels = rng.integers(0, n_clusters, size=n)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((n, dimension)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def timed_search(index, queries: np.ndarray, top_k: int, params=None):
+    """Search one query at a time (the API's access pattern) and collect latencies"""
+    labels = np.empty((len(queries), top_k), dtype=np.int64)
+    latencies = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, found = index.search(query[None, :], top_k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        labels[i] = found[0]
+    return labels, np.array(latencies)
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', help='rag_store.db to take embeddings from')
+    parser.add_argument('--size', type=int, default=100000, help='synthetic corpus size')
+    parser.add_argument('--dimension', type=int, default=384, help='embedding dimension, also of --db')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--nlist', type=int, default=1024)
+    args = parser.parse_args()
+
+    vectors = load_embeddings(args.db, args.dimension) if args.db else synthetic_embeddings(args.size, args.dimension)
+    n, dimension = vectors.shape
+    ids = np.arange(n, dtype=np.int64)
+    queries = vectors[np.random.default_rng(1).choice(n, size=min(args.queries, n), replace=False)]
+    queries = queries + 0.05 * np.random.default_rng(2).standard_normal(queries.shape).astype('float32')
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"Corpus: {n} vectors x {dimension} dims, {len(queries)} queries, recall@{args.top_k}")
+
+    flat = build_index(IndexConfig(), dimension)
+    flat.add_with_ids(vectors, ids)
+    truth, flat_latency = timed_search(flat, queries, args.top_k)
+
+    sweeps = [
+        (IndexConfig(index_type="ivf_flat", nlist=args.nlist), "nprobe", [1, 4, 16, 64]),
+        (IndexConfig(index_type="hnsw"), "ef_search", [16, 32, 64, 128]),
+        (IndexConfig(index_type="ivf_pq", nlist=args.nlist, pq_m=dimension // 8 if dimension % 8 == 0 else 1),
+         "nprobe", [1, 4, 16, 64]),
+    ]
+
+    print("\n" + "=" * 72)
+    print(f"{'index':<10} {'param':<14} {'recall':>8} {'p50 ms':>9} {'p99 ms':>9} {'build s':>9}")
+    print("=" * 72)
+    print(f"{'flat':<10} {'-':<14} {1.0:>8.3f} {np.percentile(flat_latency, 50):>9.3f} "
+          f"{np.percentile(flat_latency, 99):>9.3f} {'-':>9}")
+
+    for config, param_name, values in sweeps:
+        start = time.perf_counter()
+        index = build_index(config, dimension, vectors)
+        index.add_with_ids(vectors, ids)
+        build_time = time.perf_counter() - start
+
+        for value in values:
+            params = search_parameters(index, **{param_name: value})
+            found, latency = timed_search(index, queries, args.top_k, params)
+            print(f"{config.index_type:<10} {f'{param_name}={value}':<14} "
+                  f"{recall_at_k(found, truth):>8.3f} {np.percentile(latency, 50):>9.3f} "
+                  f"{np.percentile(latency, 99):>9.3f} {build_time:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Memory and recall of quantized indexes (fp16, int8, binary) against the float32 flat baseline.
+
+Reports index memory per million vectors, database bytes per vector, recall@k with and without
+re-ranking the top candidates against the stored vectors, and per-query latency. Uses the
+embeddings in a rag_store.db when --db is given, otherwise a synthetic clustered corpus.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RAG_System.index_factory import IndexConfig, build_index
+from RAG_System.quantization import encode_embedding, decode_embedding, index_bytes
+from benchmark_index import load_embeddings, synthetic_embeddings, timed_search, recall_at_k
+import argparse
+import time
+import numpy as np
+
+def rerank(stored: np.ndarray, queries: np.ndarray, candidates: np.ndarray, top_k: int) -> np.ndarray:
+    """Re-score candidates with the decoded stored vectors, as the store does with rerank_factor"""
+    found = np.empty((len(queries), top_k), dtype=np.int64)
+    for i, (query, row) in enumerate(zip(queries, candidates)):
+        row = row[row >= 0]
+        found[i] = row[np.argsort(-(stored[row] @ query))[:top_k]]
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='rag_store.db to take embeddings from')
+    parser.add_argument('--size', type=int, default=100000, help='synthetic corpus size')
+    parser.add_argument('--dimension', type=int, default=384, help='embedding dimension, also of --db')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--rerank-factor', type=int, nargs='+', default=[4, 10])
+    args = parser.parse_args()
+
+    vectors = load_embeddings(args.db, args.dimension) if args.db else synthetic_embeddings(args.size, args.dimension)
+    n, dimension = vectors.shape
+    ids = np.arange(n, dtype=np.int64)
+    queries = vectors[np.random.default_rng(1).choice(n, size=min(args.queries, n), replace=False)]
+    queries = queries + 0.05 * np.random.default_rng(2).standard_normal(queries.shape).astype('float32')
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"Corpus: {n} vectors x {dimension} dims, {len(queries)} queries, recall@{args.top_k}")
+    print("\n" + "=" * 82)
+    print(f"{'quantization':<13} {'rerank':>7} {'MB / 1M':>9} {'db B/vec':>9} {'recall':>8} "
+          f"{'p50 ms':>9} {'p99 ms':>9} {'build s':>9}")
+    print("=" * 82)
+
+    truth = None
+    for quantization in ("none", "fp16", "int8", "binary"):
+        start = time.perf_counter()
+        index = build_index(IndexConfig(quantization=quantization), dimension, vectors)
+        index.add_with_ids(vectors, ids)
+        build_time = time.perf_counter() - start
+
+        memory = index_bytes(index) / n * 1e6 / 2 ** 20
+        stored_size = len(encode_embedding(vectors[0], quantization))
+        found, latency = timed_search(index, queries, args.top_k)
+        if truth is None:
+            truth = found
+        print(f"{quantization:<13} {'-':>7} {memory:>9.1f} {stored_size:>9} {recall_at_k(found, truth):>8.3f} "
+              f"{np.percentile(latency, 50):>9.3f} {np.percentile(latency, 99):>9.3f} {build_time:>9.2f}")
+        if quantization == "none":
+            continue
+
+        stored = np.vstack([decode_embedding(encode_embedding(v, quantization), dimension) for v in vectors])
+        for factor in args.rerank_factor:
+            candidates, latency = timed_search(index, queries, min(args.top_k * factor, n))
+            start = time.perf_counter()
+            found = rerank(stored, queries, candidates, args.top_k)
+            rerank_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            print(f"{quantization:<13} {f'x{factor}':>7} {memory:>9.1f} {stored_size:>9} "
+                  f"{recall_at_k(found, truth):>8.3f} {np.percentile(latency, 50) + rerank_ms:>9.3f} "
+                  f"{np.percentile(latency, 99) + rerank_ms:>9.3f} {build_time:>9.2f}")
+
+if __name__ == "__main__":
+    main()
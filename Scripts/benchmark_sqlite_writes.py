@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Document-table write throughput: a new connection per batch with one execute per row (the old
+pattern) vs SQLiteConnectionManager's per-thread WAL connections with executemany.
+
+Each writer thread inserts its share of the documents in batches, as concurrent ingestion would.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RAG_System.sqlite_pool import SQLiteConnectionManager
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import sqlite3
+import tempfile
+import time
+import numpy as np
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS documents (
+        id TEXT PRIMARY KEY,
+        content TEXT NOT NULL,
+        source TEXT NOT NULL,
+        embedding BLOB NOT NULL,
+        metadata TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        faiss_id INTEGER
+    )
+'''
+INSERT = '''
+    INSERT OR REPLACE INTO documents (id, content, source, embedding, metadata, timestamp, faiss_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+def make_rows(n_documents: int, dimension: int):
+    rng = np.random.default_rng(0)
+    embedding = rng.standard_normal(dimension).astype(np.float32).tobytes()
+    return [(f"doc-{i}", f"Document {i} about SwiftUI state and Core ML models.", "Benchmark",
+             embedding, json.dumps({'i': i}), "2024-01-01T00:00:00", i) for i in range(n_documents)]
+
+def write_per_call(db_path: str, batch):
+    conn = sqlite3.connect(db_path, timeout=30)
+    cursor = conn.cursor()
+    for row in batch:
+        cursor.execute(INSERT, row)
+    conn.commit()
+    conn.close()
+
+def write_pooled(manager: SQLiteConnectionManager, batch):
+    with manager.transaction() as cursor:
+        cursor.executemany(INSERT, batch)
+
+def run(mode: str, rows, threads: int, batch_size: int):
+    db_path = os.path.join(tempfile.mkdtemp(), 'writes.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute(SCHEMA)
+    conn.close()
+
+    manager = SQLiteConnectionManager(db_path)
+    write = (lambda batch: write_pooled(manager, batch)) if mode == 'pooled' else \
+            (lambda batch: write_per_call(db_path, batch))
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+
+    latencies = []
+    def timed(batch):
+        start = time.perf_counter()
+        write(batch)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, batches))
+    elapsed = time.perf_counter() - start
+    manager.close()
+    return len(rows) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=20000)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1, 16, 256])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    rows = make_rows(args.documents, args.dimension)
+    print(f"{args.documents} documents, {args.dimension}-dim embeddings")
+    print("\n" + "=" * 66)
+    print(f"{'mode':<10} {'threads':>8} {'batch':>8} {'docs/s':>12} {'p50 ms':>12} {'p99 ms':>12}")
+    print("=" * 66)
+
+    for batch_size in args.batch_size:
+        # Row-at-a-time commits are slow; cap them so the run stays short
+        subset = rows if batch_size > 1 else rows[:min(len(rows), 2000)]
+        for threads in args.threads:
+            for mode in ('per-call', 'pooled'):
+                rate, p50, p99 = run(mode, subset, threads, batch_size)
+                print(f"{mode:<10} {threads:>8} {batch_size:>8} {rate:>12.0f} {p50:>12.2f} {p99:>12.2f}")
+
+if __name__ == "__main__":
+    main()
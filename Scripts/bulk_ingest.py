@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Bulk-load documents into the RAG store from JSONL files or {"documents": [...]} JSON files.
+
+Records are streamed, chunked like add_documents, encoded in fixed-size batches
+across a process pool and written with executemany in large WAL transactions.
+The FAISS index is built once at the end. Progress is checkpointed per input
+file in the same transaction as the rows, so rerunning after a crash resumes
+where the last commit left off.
+
+Each record needs "content" and "source"; "metadata" is optional.
+With no inputs the seed data in database/seed_data/base_knowledge.json is loaded.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RAG_System.complete_rag_system import EnhancedVectorStore
+from RAG_System.index_factory import IndexConfig
+from RAG_System.quantization import QUANTIZATIONS
+from RAG_System.chunking import batched
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import argparse
+import json
+import time
+
+SEED_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'database', 'seed_data', 'base_knowledge.json')
+
+_worker_model = None
+
+def init_worker(model_name: str):
+    """Load one model per pool process"""
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+def encode_batch(texts):
+    return _worker_model.encode(texts, normalize_embeddings=True, batch_size=len(texts))
+
+def read_records(path: str, skip: int):
+    """Yield (record number, content, source, metadata), skipping already committed records"""
+    if path.endswith('.json'):
+        with open(path) as f:
+            records = json.load(f)['documents']
+        for number, record in enumerate(records):
+            if number >= skip:
+                yield number, record['content'], record['source'], record.get('metadata', {})
+        return
+
+    with open(path) as f:
+        for number, line in enumerate(f):
+            if number < skip or not line.strip():
+                continue
+            record = json.loads(line)
+            yield number, record['content'], record['source'], record.get('metadata', {})
+
+def iter_chunks(store, records):
+    """Chunk records like add_documents, tagging each chunk with its record and whether it is the last one"""
+    for number, content, source, metadata in records:
+        chunks = list(store.iter_chunks([content], [source], [metadata]))
+        for index, (chunk, chunk_source, chunk_metadata) in enumerate(chunks):
+            yield number, index == len(chunks) - 1, chunk, chunk_source, chunk_metadata
+
+def ingest_file(store, conn, path: str, pool, args):
+    """Stream one input into the store, returning (records, chunks written)"""
+    cursor = conn.cursor()
+    row = cursor.execute('SELECT records FROM ingest_checkpoints WHERE input = ?', (path,)).fetchone()
+    start = row[0] if row else 0
+    if start:
+        print(f"{path}: resuming after {start} committed records")
+
+    batches = batched(iter_chunks(store, read_records(path, start)), args.batch_size)
+    pending = deque()
+    committed = start
+    written = 0
+    uncommitted_batches = 0
+
+    def write(batch, embeddings):
+        nonlocal committed, written, uncommitted_batches
+        _, _, contents, sources, metadata = zip(*batch)
+        written += store.insert_documents(cursor, list(contents), list(sources), embeddings, list(metadata))
+        # Only records whose last chunk is written count as done; a partly written
+        # record is redone on resume and its first chunks are skipped as duplicates
+        number, is_last = batch[-1][0], batch[-1][1]
+        committed = number + 1 if is_last else number
+        uncommitted_batches += 1
+        if uncommitted_batches >= args.commit_every:
+            commit()
+
+    def commit():
+        nonlocal uncommitted_batches
+        cursor.execute('INSERT OR REPLACE INTO ingest_checkpoints (input, records) VALUES (?, ?)',
+                       (path, committed))
+        conn.commit()
+        uncommitted_batches = 0
+
+    for batch in batches:
+        texts = [item[2] for item in batch]
+        if pool is None:
+            write(batch, store.embedding_model.model.encode(texts, normalize_embeddings=True))
+            continue
+        # Keep a bounded number of batches in flight so memory stays flat
+        pending.append((batch, pool.submit(encode_batch, texts)))
+        if len(pending) >= args.workers * 2:
+            done_batch, future = pending.popleft()
+            write(done_batch, future.result())
+
+    while pending:
+        done_batch, future = pending.popleft()
+        write(done_batch, future.result())
+    commit()
+    return committed - start, written
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', default=[SEED_DATA], help='.jsonl or .json files')
+    parser.add_argument('--db', default='Database/data/rag_store.db')
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--index-type', default=os.environ.get('RAG_INDEX_TYPE', 'flat'))
+    parser.add_argument('--quantization', default=os.environ.get('RAG_QUANTIZATION', 'none'),
+                        choices=QUANTIZATIONS)
+    parser.add_argument('--batch-size', type=int, default=256, help='chunks per encode call')
+    parser.add_argument('--commit-every', type=int, default=8, help='batches per transaction')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help='encoder processes (0 encodes in this process)')
+    args = parser.parse_args()
+
+    store = EnhancedVectorStore(args.model, db_path=args.db,
+                                index_config=IndexConfig(index_type=args.index_type, quantization=args.quantization),
+                                lazy_documents=True)
+
+    # The store's connection is already in WAL mode with synchronous=NORMAL
+    conn = store.db.connection()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+            input TEXT PRIMARY KEY,
+            records INTEGER NOT NULL
+        )
+    ''')
+    conn.commit()
+
+    pool = ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(args.model,)) if args.workers else None
+    start = time.time()
+    try:
+        for path in args.inputs:
+            records, written = ingest_file(store, conn, os.path.abspath(path), pool, args)
+            print(f"{path}: {records} records, {written} new chunks")
+    finally:
+        if pool:
+            pool.shutdown()
+
+    print("Building FAISS index...")
+    store.rebuild_index()
+    print(f"Done in {time.time() - start:.1f}s, {store.document_count} documents indexed")
+    store.close()
+
+if __name__ == "__main__":
+    main()
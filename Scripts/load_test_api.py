@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Closed-loop load test for the RAG API: p50/p99 latency and RPS per server and concurrency level.
+
+Start the servers first, e.g.
+    python API_Server/rag_api.py                      # Flask on :5000
+    python API_Server/rag_api_async.py                # FastAPI/uvicorn on :8000
+then
+    python Scripts/load_test_api.py --url flask=http://localhost:5000 --url async=http://localhost:8000
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import itertools
+import threading
+import time
+import numpy as np
+import requests
+
+QUERIES = [
+    "How do I manage state in SwiftUI?",
+    "What is Core ML used for?",
+    "Explain retrieval augmented generation",
+    "Best practices for iOS memory management",
+    "How does Swift differ from Objective-C?",
+]
+
+def run_load(base_url: str, endpoint: str, concurrency: int, duration: float):
+    """Each client sends its next request as soon as the previous one returns"""
+    counter = itertools.count()
+    stop_at = time.perf_counter() + duration
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client():
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < stop_at:
+            query = QUERIES[next(counter) % len(QUERIES)]
+            body = {'message': query} if endpoint == 'conversation' else {'query': query, 'top_k': 5}
+            start = time.perf_counter()
+            try:
+                response = session.post(f"{base_url}/api/{endpoint}", json=body, timeout=30)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                local.append((time.perf_counter() - start) * 1000)
+            else:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+
+    return np.array(latencies), errors[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', action='append', required=True, metavar='NAME=URL',
+                        help='server to test, repeatable')
+    parser.add_argument('--endpoint', default='retrieve', choices=['retrieve', 'conversation'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per run')
+    args = parser.parse_args()
+
+    servers = [url.split('=', 1) if '=' in url else (url, url) for url in args.url]
+
+    # Warm every server so model loading and first-query caches don't skew the first run
+    for _, url in servers:
+        requests.post(f"{url}/api/retrieve", json={'query': QUERIES[0]}, timeout=60)
+
+    print(f"Endpoint: /api/{args.endpoint}, {args.duration:.0f}s per run")
+    print("\n" + "=" * 70)
+    print(f"{'server':<10} {'clients':>8} {'RPS':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    print("=" * 70)
+
+    for concurrency in args.concurrency:
+        for name, url in servers:
+            latencies, errors = run_load(url, args.endpoint, concurrency, args.duration)
+            if len(latencies) == 0:
+                print(f"{name:<10} {concurrency:>8} {'-':>10} {'-':>10} {'-':>10} {errors:>8}")
+                continue
+            print(f"{name:<10} {concurrency:>8} {len(latencies) / args.duration:>10.1f} "
+                  f"{np.percentile(latencies, 50):>10.2f} {np.percentile(latencies, 99):>10.2f} {errors:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -26,23 +26,29 @@ def setup_database():
             source TEXT NOT NULL,
             embedding BLOB NOT NULL,
             metadata TEXT NOT NULL,
-            timestamp TEXT NOT NULL
+            timestamp TEXT NOT NULL,
+            faiss_id INTEGER
         )
     ''')
     
+    # documents_fts (BM25) is created and backfilled by EnhancedVectorStore on open
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS conversations (
             id TEXT PRIMARY KEY,
             session_id TEXT NOT NULL,
             user_message TEXT NOT NULL,
             assistant_response TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            metadata TEXT DEFAULT '{}'
+            context TEXT DEFAULT '',
+            metadata TEXT DEFAULT '{}',
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     ''')
     
     # Create indexes for better performance
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_source ON documents(source)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_faiss_id ON documents(faiss_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_timestamp ON documents(timestamp)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations(session_id)')
     
@@ -13,7 +13,7 @@ def test_rag_system():
     print("Initializing RAG System...")
     rag = ProductionRAGSystem()
     
-    print(f"✅ RAG System initialized with {len(rag.vector_store.documents)} documents")
+    print(f"✅ RAG System initialized with {rag.vector_store.document_count} documents")
     
     # Test queries
     test_queries = [
@@ -85,7 +85,7 @@ def test_rag_system():
     print("="*60)
     
     print(f"\n📊 Final Statistics:")
-    print(f"   Total documents in store: {len(rag.vector_store.documents)}")
+    print(f"   Total documents in store: {rag.vector_store.document_count}")
     print(f"   Conversation exchanges: {len(rag.conversation_memory.conversations)}")
     print(f"   Embedding dimension: {rag.vector_store.dimension}")
     
@@ -1,9 +1,25 @@
 import unittest
 import sys
 import os
+import sqlite3
+import json
+import numpy as np
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from RAG_System.complete_rag_system import ProductionRAGSystem, ConversationMemory, EnhancedVectorStore
+from RAG_System.complete_rag_system import ProductionRAGSystem, ConversationMemory, EnhancedVectorStore, Document
+from RAG_System.index_factory import IndexConfig, index_type_of, quantization_of, trained_nlist
+from RAG_System.embedding_cache import CachedEmbeddingModel
+from RAG_System.embedding_batcher import EmbeddingBatcher
+from RAG_System.ingestion import IngestionWorker
+from RAG_System.chunking import TextChunker
+from RAG_System.sqlite_pool import SQLiteConnectionManager
+from RAG_System.query_cache import SemanticQueryCache
+from RAG_System.session_store import SessionManager
+from RAG_System.conversation_writer import ConversationWriter
+from RAG_System.context_window import ContextWindow, count_tokens
+from RAG_System.memory_manager import MemoryManager
+from RAG_System.history_embeddings import HistoryEmbeddingCache
+from RAG_System.fact_store import FactStore
 
 class TestRAGSystem(unittest.TestCase):
     
@@ -32,6 +48,33 @@ class TestRAGSystem(unittest.TestCase):
                 self.assertTrue(hasattr(doc, 'source'))
                 self.assertTrue(hasattr(doc, 'relevance_score'))
     
+    def test_streamed_retrieval_matches_retrieve_context(self):
+        """Test that the staged retrieval starts with local hits and ends with the ranked list"""
+        query = "What is Swift programming?"
+        stages = list(self.rag_system.retrieve_context_stream(query, top_k=3))
+        
+        self.assertEqual(stages[0][0], 'local')
+        self.assertEqual(stages[-1][0], 'final')
+        self.assertEqual([doc.content for doc in stages[-1][1]],
+                         [doc.content for doc in self.rag_system.retrieve_context(query, top_k=3)])
+    
+    def test_batch_web_lookups_run_concurrently(self):
+        """Test that batched queries needing web results fetch them side by side"""
+        import time
+        def slow_search(query, max_results=5):
+            time.sleep(0.2)
+            return [{'content': f"Web answer about {query}", 'source': 'Web', 'url': ''}]
+        self.rag_system.web_retriever.search_web = slow_search
+        queries = [f"Obscure topic number {i}" for i in range(4)]
+        
+        start = time.monotonic()
+        results = self.rag_system.retrieve_context_batch(queries, top_ks=[10] * 4)
+        elapsed = time.monotonic() - start
+        
+        self.assertLess(elapsed, 0.6)
+        for query, docs in zip(queries, results):
+            self.assertIn(f"Web answer about {query}", [doc.content for doc in docs])
+    
     def test_conversation_memory(self):
         """Test conversation memory functionality"""
         memory = ConversationMemory()
@@ -72,8 +115,9 @@ class TestVectorStore(unittest.TestCase):
     
     def tearDown(self):
         """Clean up"""
-        if os.path.exists(self.temp_db):
-            os.remove(self.temp_db)
+        for path in (self.temp_db,) + self.vector_store._snapshot_paths():
+            if os.path.exists(path):
+                os.remove(path)
     
     def test_add_documents(self):
         """Test adding documents to vector store"""
@@ -95,6 +139,976 @@ class TestVectorStore(unittest.TestCase):
         
         self.assertGreater(len(results), 0)
         self.assertIn("Swift", results[0].content)
+    
+    def test_search_batch_matches_single_search(self):
+        """Test that batched search returns the same hits, in input order"""
+        contents = ["Swift is a programming language", "Python is also a programming language"]
+        self.vector_store.add_documents(contents, ["Swift Docs", "Python Docs"])
+        
+        queries = ["Python programming", "Swift programming"]
+        batched = self.vector_store.search_batch(queries, top_k=[1, 2])
+        
+        self.assertEqual(len(batched), 2)
+        self.assertEqual(len(batched[0]), 1)
+        for query, results in zip(queries, batched):
+            single = self.vector_store.search(query, top_k=len(results))
+            self.assertEqual([doc.id for doc in results], [doc.id for doc in single])
+    
+    def test_readding_documents_does_not_duplicate_rows(self):
+        """Test that re-adding an existing document keeps a single FAISS row"""
+        contents = ["Swift is a programming language", "Swift is a programming language"]
+        sources = ["Swift Docs", "Swift Docs"]
+        
+        self.vector_store.add_documents(contents, sources)
+        self.vector_store.add_documents(contents[:1], sources[:1], [{"updated": True}])
+        
+        self.assertEqual(self.vector_store.index.ntotal, len(self.vector_store.documents))
+        results = self.vector_store.search("Swift programming", top_k=5)
+        self.assertEqual(len({doc.id for doc in results}), len(results))
+    
+    def test_id_mapping_survives_reload(self):
+        """Test that FAISS ids map back to the same documents after a reload"""
+        contents = ["Swift is a programming language", "Python is also a programming language"]
+        sources = ["Swift Docs", "Python Docs"]
+        self.vector_store.add_documents(contents, sources)
+        
+        reloaded = EnhancedVectorStore(db_path=self.temp_db)
+        self.assertEqual(reloaded.index.ntotal, len(reloaded.documents))
+        
+        results = reloaded.search("Python programming", top_k=1)
+        self.assertGreater(len(results), 0)
+        self.assertEqual(results[0].source, "Python Docs")
+
+class TestLazyDocuments(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.temp_db = tempfile.mktemp(suffix='.db')
+        self.vector_store = EnhancedVectorStore(db_path=self.temp_db, lazy_documents=True,
+                                                document_cache_size=1)
+    
+    def tearDown(self):
+        """Clean up"""
+        for path in (self.temp_db,) + self.vector_store._snapshot_paths():
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_documents_fetched_on_demand(self):
+        """Test that lazy stores keep no documents resident and still return content"""
+        contents = ["Swift is a programming language", "Python is also a programming language"]
+        self.vector_store.add_documents(contents, ["Swift Docs", "Python Docs"])
+        
+        self.assertEqual(len(self.vector_store.documents), 0)
+        self.assertEqual(self.vector_store.document_count, 2)
+        
+        results = self.vector_store.search("Swift programming", top_k=2)
+        self.assertIn("Swift", results[0].content)
+        self.assertLessEqual(len(self.vector_store.document_cache), 1)
+    
+    def test_lazy_store_deduplicates_across_reloads(self):
+        """Test that re-adding a persisted document does not add a second vector"""
+        self.vector_store.add_documents(["Swift is a programming language"], ["Swift Docs"])
+        
+        reloaded = EnhancedVectorStore(db_path=self.temp_db, lazy_documents=True)
+        reloaded.add_documents(["Swift is a programming language"], ["Swift Docs"], [{"updated": True}])
+        
+        self.assertEqual(reloaded.document_count, 1)
+        self.assertEqual(reloaded.search("Swift programming", top_k=1)[0].metadata, {"updated": True})
+
+class TestIndexSnapshot(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_db = os.path.join(self.temp_dir, 'rag_store.db')
+    
+    def tearDown(self):
+        """Clean up"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_snapshot_reused_when_current(self):
+        """Test that a current snapshot is loaded instead of rebuilding"""
+        vector_store = EnhancedVectorStore(db_path=self.temp_db)
+        vector_store.add_documents(["Swift is a programming language", "Python is also a programming language"],
+                                   ["Swift Docs", "Python Docs"])
+        vector_store.save_snapshot()
+        
+        reloaded = EnhancedVectorStore(db_path=self.temp_db)
+        self.assertEqual(reloaded.index.ntotal, 2)
+        self.assertTrue(all(doc.embedding is None for doc in reloaded.documents.values()))
+        self.assertEqual(reloaded.search("Python programming", top_k=1)[0].source, "Python Docs")
+    
+    def test_stale_snapshot_triggers_rebuild(self):
+        """Test that writes after the snapshot force a rebuild from the database"""
+        vector_store = EnhancedVectorStore(db_path=self.temp_db)
+        vector_store.add_documents(["Swift is a programming language"], ["Swift Docs"])
+        vector_store.save_snapshot()
+        vector_store.add_documents(["Python is also a programming language"], ["Python Docs"])
+        
+        reloaded = EnhancedVectorStore(db_path=self.temp_db)
+        self.assertEqual(reloaded.index.ntotal, 2)
+        self.assertTrue(all(doc.embedding is not None for doc in reloaded.documents.values()))
+
+class TestIndexFactory(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.temp_db = tempfile.mktemp(suffix='.db')
+    
+    def tearDown(self):
+        """Clean up"""
+        base = os.path.splitext(self.temp_db)[0]
+        for path in (self.temp_db, f"{base}.faiss", f"{base}.ids.npy", f"{base}.snapshot.json"):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_ivf_index_trains_once_corpus_is_large_enough(self):
+        """Test that an IVF store starts flat and switches to IVF after enough documents"""
+        vector_store = EnhancedVectorStore(db_path=self.temp_db,
+                                           index_config=IndexConfig(index_type="ivf_flat", nlist=4))
+        self.assertEqual(index_type_of(vector_store.index), "flat")
+        
+        contents = [f"Document {i} about topic {i % 7}" for i in range(100)]
+        vector_store.add_documents(contents, ["Test Source"] * len(contents))
+        self.assertEqual(index_type_of(vector_store.index), "ivf_flat")
+        
+        results = vector_store.search(contents[5], top_k=1, nprobe=4)
+        self.assertEqual(results[0].content, contents[5])
+    
+    def test_ivf_index_retrained_as_corpus_grows(self):
+        """Test that an IVF index trained on a small corpus gets more lists later and after reload"""
+        config = IndexConfig(index_type="ivf_flat", nlist=8)
+        vector_store = EnhancedVectorStore(db_path=self.temp_db, index_config=config)
+        contents = [f"Document {i} about topic {i % 11}" for i in range(8 * 39)]
+        vector_store.add_documents(contents[:40], ["Test Source"] * 40)
+        self.assertEqual(trained_nlist(vector_store.index), 1)
+        
+        vector_store.add_documents(contents[40:], ["Test Source"] * (len(contents) - 40))
+        self.assertEqual(trained_nlist(vector_store.index), 8)
+        self.assertEqual(vector_store.document_count, len(contents))
+        self.assertEqual(vector_store.search(contents[100], top_k=1, nprobe=8)[0].content, contents[100])
+        vector_store.save_snapshot()
+        vector_store.close()
+        
+        # A snapshot saved while undertrained is rebuilt on load
+        manifest_path = os.path.splitext(self.temp_db)[0] + ".snapshot.json"
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['trained_nlist'], 8)
+        manifest['trained_nlist'] = 1
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+        reloaded = EnhancedVectorStore(db_path=self.temp_db, index_config=config, lazy_documents=True)
+        self.assertEqual(trained_nlist(reloaded.index), 8)
+        reloaded.close()
+    
+    def test_unknown_index_type_rejected(self):
+        """Test that an unknown index type fails fast"""
+        with self.assertRaises(ValueError):
+            IndexConfig(index_type="annoy")
+    
+    def test_quantized_stores_search_and_reload(self):
+        """Test that int8 and binary stores keep compact vectors, find exact matches and reload"""
+        contents = [f"Document {i} about topic {i % 7}" for i in range(50)]
+        for quantization in ("int8", "binary"):
+            config = IndexConfig(quantization=quantization, rerank_factor=4)
+            vector_store = EnhancedVectorStore(db_path=self.temp_db, index_config=config)
+            vector_store.add_documents(contents, ["Test Source"] * len(contents))
+            self.assertEqual(quantization_of(vector_store.index), quantization)
+            self.assertEqual(vector_store.search(contents[5], top_k=1)[0].content, contents[5])
+            
+            blob = vector_store.db.connection().execute('SELECT embedding FROM documents LIMIT 1').fetchone()[0]
+            self.assertEqual(len(blob), vector_store.dimension + 4)
+            vector_store.save_snapshot()
+            vector_store.close()
+            
+            reloaded = EnhancedVectorStore(db_path=self.temp_db, index_config=config, lazy_documents=True)
+            self.assertEqual(reloaded.document_count, len(contents))
+            self.assertEqual(reloaded.search(contents[9], top_k=1)[0].content, contents[9])
+            reloaded.close()
+            self.tearDown()
+    
+    def test_binary_quantization_requires_flat_index(self):
+        """Test that unsupported quantization combinations fail fast"""
+        with self.assertRaises(ValueError):
+            IndexConfig(index_type="hnsw", quantization="binary")
+
+class TestEmbeddingCache(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.cache_path = tempfile.mktemp(suffix='.db')
+    
+        self.models = []
+    
+    def tearDown(self):
+        """Clean up"""
+        for model in self.models:
+            model.close()
+        for path in (self.cache_path, f"{self.cache_path}-wal", f"{self.cache_path}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _model(self):
+        model = CachedEmbeddingModel("all-MiniLM-L6-v2", self.cache_path)
+        self.models.append(model)
+        return model
+    
+    def test_repeated_texts_encoded_once(self):
+        """Test that repeats within and across calls hit the cache"""
+        model = self._model()
+        first = model.encode(["What is SwiftUI?", "What is SwiftUI?"], normalize_embeddings=True)
+        second = model.encode(["What is  SwiftUI? "], normalize_embeddings=True)
+        
+        self.assertEqual(model.encoded, 1)
+        self.assertTrue((first[0] == second[0]).all())
+        self.assertEqual(model.stats()['memory']['hits'], 1)
+    
+    def test_persistent_tier_survives_restart(self):
+        """Test that a new process reuses embeddings stored in SQLite"""
+        self._model().encode(["Core ML"], normalize_embeddings=True)
+        
+        restarted = self._model()
+        restarted.encode(["Core ML"], normalize_embeddings=True)
+        
+        self.assertEqual(restarted.encoded, 0)
+        self.assertEqual(restarted.disk_hits, 1)
+    
+    def test_persistent_entries_of_wrong_size_ignored(self):
+        """Test that a stored blob that does not match the model dimension is re-encoded"""
+        model = self._model()
+        model.encode(["Core ML"], normalize_embeddings=True)
+        with model.db.transaction() as cursor:
+            cursor.execute('UPDATE embedding_cache SET embedding = substr(embedding, 1, 16)')
+        
+        restarted = self._model()
+        embedding = restarted.encode("Core ML", normalize_embeddings=True)
+        
+        self.assertEqual(restarted.disk_hits, 0)
+        self.assertEqual(restarted.encoded, 1)
+        self.assertEqual(embedding.shape, (model.dimension,))
+
+class TestEmbeddingBatcher(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.model = CachedEmbeddingModel("all-MiniLM-L6-v2")
+        self.batcher = EmbeddingBatcher(self.model, max_batch_size=8, max_wait_ms=50)
+    
+    def tearDown(self):
+        """Clean up"""
+        self.batcher.close()
+    
+    def test_concurrent_requests_share_batches(self):
+        """Test that concurrent encodes are coalesced and match direct encoding"""
+        from concurrent.futures import ThreadPoolExecutor
+        queries = [f"Question {i} about Swift" for i in range(16)]
+        
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            embeddings = list(pool.map(self.batcher.encode, queries))
+        
+        self.assertLess(self.batcher.batches, len(queries))
+        expected = self.model.encode(queries, normalize_embeddings=True)
+        for embedding, reference in zip(embeddings, expected):
+            self.assertTrue(abs(embedding - reference).max() < 1e-5)
+    
+    def test_cached_query_skips_batch_window(self):
+        """Test that a cached query resolves without queueing"""
+        self.batcher.encode("What is Core ML?")
+        future = self.batcher.submit("What is Core ML?")
+        
+        self.assertTrue(future.done())
+        self.assertEqual(self.batcher.cache_hits, 1)
+
+class TestConcurrentAccess(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.temp_db = tempfile.mktemp(suffix='.db')
+        self.vector_store = EnhancedVectorStore(db_path=self.temp_db)
+        self.vector_store.add_documents([f"Seed document {i} about Swift" for i in range(20)],
+                                        ["Seed"] * 20)
+    
+    def tearDown(self):
+        """Clean up"""
+        for path in (self.temp_db,) + self.vector_store._snapshot_paths():
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_searches_during_writes_see_consistent_documents(self):
+        """Stress test: every hit resolves to a whole document while writers add more"""
+        import threading
+        errors = []
+        searches = [0]
+        stop = threading.Event()
+        
+        def reader():
+            while not stop.is_set():
+                try:
+                    for doc in self.vector_store.search("Swift document", top_k=10, threshold=-1.0):
+                        expected_id = EnhancedVectorStore.document_id(doc.content, doc.source)
+                        if doc.id != expected_id:
+                            errors.append(f"torn read: {doc.id}")
+                    searches[0] += 1
+                except Exception as e:
+                    errors.append(repr(e))
+        
+        def writer(n):
+            for batch in range(10):
+                contents = [f"Writer {n} batch {batch} document {i} about Swift" for i in range(5)]
+                self.vector_store.add_documents(contents, [f"Writer {n}"] * 5)
+        
+        readers = [threading.Thread(target=reader) for _ in range(8)]
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(2)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertGreater(searches[0], 0)
+        self.assertEqual(self.vector_store.document_count, 120)
+        self.assertEqual(len(self.vector_store.documents), 120)
+
+class TestHybridSearch(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.temp_db = tempfile.mktemp(suffix='.db')
+        self.vector_store = EnhancedVectorStore(db_path=self.temp_db)
+        self.vector_store.add_documents([
+            "Core ML is Apple's framework for running machine learning models on device.",
+            "SwiftUI uses a declarative syntax to describe user interfaces.",
+            "URLSession coordinates a group of related network data transfer tasks.",
+            "Combine provides a declarative Swift API for processing values over time."
+        ], ["Core ML Docs", "SwiftUI Docs", "Foundation Docs", "Combine Docs"])
+    
+    def tearDown(self):
+        """Clean up"""
+        for path in (self.temp_db,) + self.vector_store._snapshot_paths():
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_keyword_query_ranks_lexical_match_first(self):
+        """Test that an exact API name wins through BM25 fusion"""
+        results = self.vector_store.search("URLSession", top_k=2, threshold=-1.0, hybrid=True)
+        
+        self.assertEqual(results[0].source, "Foundation Docs")
+        self.assertLessEqual(results[0].relevance_score, 1.0)
+    
+    def test_vector_only_strong_match_keeps_cosine_score(self):
+        """Test that fusion keeps cosine scores, so a strong vector hit beats web fallback"""
+        from dataclasses import replace
+        from datetime import datetime
+        strong = Document(id="a", content="Core ML runs models on device", source="Vector", embedding=None,
+                          metadata={}, timestamp=datetime.now(), relevance_score=0.9)
+        lexical = replace(strong, id="b", source="Lexical", relevance_score=0.4)
+        web = replace(strong, id="w", source="Web", relevance_score=0.7)
+        
+        fused = EnhancedVectorStore._fuse_lexical([strong], [lexical], top_k=2)
+        self.assertEqual([(doc.source, doc.relevance_score) for doc in fused], [("Vector", 0.9), ("Lexical", 0.4)])
+        self.assertFalse(ProductionRAGSystem.needs_web_results(fused, top_k=2))
+        self.assertEqual([doc.source for doc in ProductionRAGSystem.rank_results(fused, 2, [web])], ["Vector", "Web"])
+    
+    def test_partial_lexical_hits_respect_threshold(self):
+        """Test that BM25 matches missing a query term are dropped below the cosine threshold"""
+        self.assertEqual(self.vector_store.search("URLSession widgets", top_k=2, threshold=0.99, hybrid=True), [])
+    
+    def test_exact_keyword_match_kept_and_skips_web(self):
+        """Test that a hit containing every query term survives the threshold and answers the query"""
+        vector_only = self.vector_store.search("Core ML", top_k=5, threshold=0.99)
+        results = self.vector_store.search("Core ML", top_k=5, threshold=0.99, hybrid=True)
+        
+        self.assertEqual([doc.source for doc in results], ["Core ML Docs"])
+        self.assertTrue(results[0].lexical_match)
+        self.assertLess(results[0].relevance_score, 0.99)
+        self.assertTrue(ProductionRAGSystem.needs_web_results(vector_only, top_k=5))
+        self.assertFalse(ProductionRAGSystem.needs_web_results(results, top_k=5))
+    
+    def test_lexical_index_updated_incrementally(self):
+        """Test that add_documents makes new text searchable by keyword"""
+        self.vector_store.add_documents(["ARKit blends digital objects with the real world."], ["ARKit Docs"])
+        
+        hits = self.vector_store.lexical_search("ARKit", limit=5)
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(self.vector_store._fetch_documents(hits)[hits[0]].source, "ARKit Docs")
+    
+    def test_existing_store_backfills_lexical_index(self):
+        """Test that a store created before the FTS table gets it rebuilt on open"""
+        import sqlite3
+        conn = sqlite3.connect(self.temp_db)
+        conn.execute('DROP TABLE documents_fts')
+        conn.commit()
+        conn.close()
+        
+        reopened = EnhancedVectorStore(db_path=self.temp_db)
+        self.assertEqual(len(reopened.lexical_search("Combine values", limit=5)), 1)
+    
+    def test_empty_lexical_index_rebuilt_on_open(self):
+        """Test that an FTS table created empty next to existing documents is backfilled"""
+        import sqlite3
+        conn = sqlite3.connect(self.temp_db)
+        conn.execute('DROP TABLE documents_fts')
+        conn.execute('''
+            CREATE VIRTUAL TABLE documents_fts USING fts5(
+                content, source, content='documents', content_rowid='faiss_id', tokenize='porter unicode61'
+            )
+        ''')
+        conn.commit()
+        conn.close()
+        
+        reopened = EnhancedVectorStore(db_path=self.temp_db)
+        self.assertEqual(len(reopened.lexical_search("Combine values", limit=5)), 1)
+    
+    def test_stopwords_only_query_has_no_lexical_candidates(self):
+        """Test that filler words alone don't count as lexical evidence"""
+        self.assertEqual(EnhancedVectorStore.lexical_query("what is the"), "")
+        self.assertEqual(self.vector_store.lexical_search("what is the", limit=5), [])
+
+class TestChunking(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.temp_db = tempfile.mktemp(suffix='.db')
+        self.vector_store = EnhancedVectorStore(db_path=self.temp_db)
+        self.vector_store.chunker = TextChunker(max_tokens=20, overlap=5)
+        self.long_document = " ".join(f"SwiftUI layout rule {i} explains stacks and frames." for i in range(12))
+    
+    def tearDown(self):
+        """Clean up"""
+        for path in (self.temp_db,) + self.vector_store._snapshot_paths():
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_sliding_windows_overlap(self):
+        """Test that windows respect max_tokens and share the overlap"""
+        words = [f"w{i}" for i in range(25)]
+        chunks = TextChunker(max_tokens=10, overlap=2).split(" ".join(words))
+        
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(all(len(chunk.split()) <= 10 for chunk in chunks))
+        self.assertEqual(chunks[0].split()[-2:], chunks[1].split()[:2])
+        self.assertEqual(chunks[-1].split()[-1], "w24")
+    
+    def test_short_document_stored_whole(self):
+        """Test that documents within the window keep their content and id"""
+        self.vector_store.add_documents(["Swift is a programming language"], ["Swift Docs"])
+        
+        doc = next(iter(self.vector_store.documents.values()))
+        self.assertEqual(doc.id, EnhancedVectorStore.document_id("Swift is a programming language", "Swift Docs"))
+        self.assertNotIn('parent_id', doc.metadata)
+    
+    def test_long_document_chunked_and_collapsed(self):
+        """Test that a long document becomes chunks that search returns once"""
+        self.vector_store.add_documents((text for text in [self.long_document]), iter(["Layout Guide"]),
+                                        batch_size=2)
+        
+        chunks = list(self.vector_store.documents.values())
+        parent_id = EnhancedVectorStore.document_id(self.long_document, "Layout Guide")
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(doc.metadata['parent_id'] == parent_id for doc in chunks))
+        
+        results = self.vector_store.search("SwiftUI layout stacks frames", top_k=3)
+        self.assertEqual(len(results), 1)
+        self.assertGreater(results[0].metadata['matched_chunks'], 1)
+        self.assertLess(len(results[0].content), len(self.long_document))
+
+class TestReadReplica(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up a writer store and a replica sharing its database"""
+        import tempfile
+        import queue
+        self.temp_db = tempfile.mktemp(suffix='.db')
+        self.writer = EnhancedVectorStore(db_path=self.temp_db, lazy_documents=True)
+        self.writer.add_documents(["Swift is a programming language"], ["Swift Docs"])
+        self.writer.save_snapshot()
+        self.write_queue = queue.Queue()
+        self.replica = EnhancedVectorStore(db_path=self.temp_db, lazy_documents=True,
+                                           write_queue=self.write_queue, refresh_interval=0.0)
+    
+    def tearDown(self):
+        """Clean up"""
+        for path in (self.temp_db,) + self.writer._snapshot_paths():
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_replica_forwards_writes_and_picks_up_snapshots(self):
+        """Test that replica writes reach the writer and come back through a snapshot"""
+        self.replica.add_documents(["Core ML runs models on device"], ["Core ML Docs"])
+        self.assertEqual(self.replica.document_count, 1)
+        
+        self.writer.add_embedded_documents(*self.write_queue.get_nowait())
+        self.writer.save_snapshot()
+        
+        results = self.replica.search("Core ML models", top_k=2)
+        self.assertEqual(self.replica.document_count, 2)
+        self.assertEqual(self.replica.store_version, self.writer.store_version)
+        self.assertEqual(results[0].source, "Core ML Docs")
+    
+    def test_replica_requires_lazy_documents(self):
+        """Test that replicas refuse to hold documents they could not refresh"""
+        with self.assertRaises(ValueError):
+            EnhancedVectorStore(db_path=self.temp_db, write_queue=self.write_queue)
+
+class TestIngestionWorker(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.temp_db = tempfile.mktemp(suffix='.db')
+        self.vector_store = EnhancedVectorStore(db_path=self.temp_db)
+        self.worker = IngestionWorker(self.vector_store, batch_size=8, flush_interval=0.05)
+    
+    def tearDown(self):
+        """Clean up"""
+        self.worker.close()
+        for path in (self.temp_db,) + self.vector_store._snapshot_paths():
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_precomputed_embeddings_written_in_background(self):
+        """Test that queued documents land in the store without re-encoding"""
+        contents = ["Swift is a programming language", "Python is also a programming language"]
+        embeddings = self.vector_store.embedding_model.encode(contents, normalize_embeddings=True)
+        encoded_before = self.vector_store.embedding_model.encoded
+        
+        self.worker.submit(contents, ["Swift Docs", "Python Docs"], embeddings)
+        self.worker.flush()
+        
+        self.assertEqual(self.vector_store.document_count, 2)
+        self.assertEqual(self.vector_store.embedding_model.encoded, encoded_before)
+        self.assertEqual(self.worker.stats()['written'], 2)
+    
+    def test_pending_duplicates_dropped(self):
+        """Test that the same document queued twice is written once"""
+        contents = ["Swift is a programming language"] * 2
+        embeddings = self.vector_store.embedding_model.encode(contents, normalize_embeddings=True)
+        
+        accepted = self.worker.submit(contents, ["Swift Docs"] * 2, embeddings)
+        self.worker.flush()
+        
+        self.assertEqual(accepted, 1)
+        self.assertEqual(self.vector_store.document_count, 1)
+    
+    def test_failed_batch_retried(self):
+        """Test that a batch whose write fails once is retried and written"""
+        worker = IngestionWorker(self.vector_store, flush_interval=0.05, retry_delay=0.01)
+        write = self.vector_store.add_embedded_documents
+        attempts = []
+        def flaky_write(*args):
+            attempts.append(args)
+            if len(attempts) == 1:
+                raise sqlite3.OperationalError("database is locked")
+            return write(*args)
+        self.vector_store.add_embedded_documents = flaky_write
+        
+        contents = ["Swift is a programming language"]
+        worker.submit(contents, ["Swift Docs"], self.vector_store.embedding_model.encode(contents))
+        worker.close()
+        
+        self.assertEqual(self.vector_store.document_count, 1)
+        self.assertEqual(worker.stats()['retries'], 1)
+        self.assertEqual(worker.stats()['dropped'], 0)
+    
+    def test_batch_dropped_after_retries(self):
+        """Test that a batch that keeps failing is dropped, counted and released"""
+        worker = IngestionWorker(self.vector_store, flush_interval=0.05, max_retries=2, retry_delay=0.01)
+        def failing_write(*args):
+            raise sqlite3.OperationalError("database is locked")
+        self.vector_store.add_embedded_documents = failing_write
+        
+        contents = ["Swift is a programming language"]
+        embeddings = self.vector_store.embedding_model.encode(contents)
+        worker.submit(contents, ["Swift Docs"], embeddings)
+        worker.flush()
+        
+        self.assertEqual(worker.stats()['retries'], 2)
+        self.assertEqual(worker.stats()['dropped'], 1)
+        self.assertEqual(worker.submit(contents, ["Swift Docs"], embeddings), 1)
+        worker.close()
+
+class TestBulkInsert(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.temp_db = tempfile.mktemp(suffix='.db')
+        self.vector_store = EnhancedVectorStore(db_path=self.temp_db, lazy_documents=True)
+    
+    def tearDown(self):
+        """Clean up"""
+        for path in (self.temp_db,) + self.vector_store._snapshot_paths():
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_insert_then_rebuild_index(self):
+        """Test that bulk-inserted rows are deduplicated and searchable after one rebuild"""
+        contents = ["Swift is a programming language", "Core ML runs models on device",
+                    "Swift is a programming language"]
+        sources = ["Swift Docs", "Core ML Docs", "Swift Docs"]
+        embeddings = self.vector_store.embedding_model.encode(contents, normalize_embeddings=True)
+        
+        conn = sqlite3.connect(self.temp_db)
+        cursor = conn.cursor()
+        written = self.vector_store.insert_documents(cursor, contents, sources, embeddings, [{}] * 3)
+        written += self.vector_store.insert_documents(cursor, contents[:1], sources[:1], embeddings[:1], [{}])
+        conn.commit()
+        conn.close()
+        
+        self.assertEqual(written, 2)
+        self.assertEqual(self.vector_store.document_count, 0)
+        # Readers keep the old version until the index holds the new rows
+        self.assertEqual(self.vector_store.store_version, 0)
+        
+        self.vector_store.rebuild_index()
+        self.assertEqual(self.vector_store.store_version, 1)
+        results = self.vector_store.search("Core ML models", top_k=2, hybrid=True)
+        self.assertEqual(self.vector_store.document_count, 2)
+        self.assertEqual(results[0].source, "Core ML Docs")
+
+class TestSQLiteConnectionManager(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.temp_db = tempfile.mktemp(suffix='.db')
+        self.manager = SQLiteConnectionManager(self.temp_db)
+        with self.manager.transaction() as cursor:
+            cursor.execute('CREATE TABLE items (name TEXT PRIMARY KEY)')
+    
+    def tearDown(self):
+        """Clean up"""
+        self.manager.close()
+        for path in (self.temp_db, f"{self.temp_db}-wal", f"{self.temp_db}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_connection_reused_per_thread_in_wal_mode(self):
+        """Test that a thread keeps its connection and other threads get their own"""
+        import threading
+        conn = self.manager.connection()
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.manager.connection()))
+        thread.start()
+        thread.join()
+        
+        self.assertIs(self.manager.connection(), conn)
+        self.assertIsNot(other[0], conn)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+    
+    def test_transaction_rolls_back_on_error(self):
+        """Test that a failed transaction leaves no partial batch behind"""
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.manager.transaction() as cursor:
+                cursor.executemany('INSERT INTO items (name) VALUES (?)', [('a',), ('b',), ('a',)])
+        
+        with self.manager.transaction() as cursor:
+            cursor.executemany('INSERT INTO items (name) VALUES (?)', [('a',), ('b',)])
+        count = self.manager.connection().execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        self.assertEqual(count, 2)
+
+class TestSemanticQueryCache(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up a cache over fixed query embeddings"""
+        import numpy as np
+        self.embeddings = {
+            "what is swiftui": np.array([1.0, 0.0, 0.0], dtype=np.float32),
+            "explain swiftui please": np.array([0.99, 0.141, 0.0], dtype=np.float32),
+            "core ml models": np.array([0.0, 0.0, 1.0], dtype=np.float32)
+        }
+        self.cache = SemanticQueryCache(lambda text: self.embeddings[SemanticQueryCache.normalize_query(text)],
+                                        dimension=3, maxsize=2, similarity_threshold=0.95)
+    
+    def test_normalized_text_hit_and_version_invalidation(self):
+        """Test that case and punctuation variants hit, and a newer corpus version drops entries"""
+        self.cache.put("What is SwiftUI?", 5, 1, ["swiftui doc"])
+        
+        self.assertEqual(self.cache.get("what is swiftui", 5, 1), ["swiftui doc"])
+        self.assertIsNone(self.cache.get("what is swiftui", 3, 1))
+        self.assertIsNone(self.cache.get("what is swiftui", 5, 2))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats()['exact_hits'], 1)
+    
+    def test_similar_query_hit_and_eviction(self):
+        """Test that a near-duplicate embedding reuses results and old entries are evicted"""
+        self.cache.put("what is swiftui", 5, 1, ["swiftui doc"])
+        
+        self.assertEqual(self.cache.get("Explain SwiftUI, please", 5, 1), ["swiftui doc"])
+        self.assertIsNone(self.cache.get("core ml models", 5, 1))
+        self.assertEqual(self.cache.stats()['semantic_hits'], 1)
+        
+        self.cache.put("core ml models", 5, 1, ["core ml doc"])
+        self.cache.put("explain swiftui please", 3, 1, ["swiftui doc"])
+        self.assertIsNone(self.cache.get("what is swiftui", 5, 1))
+        self.assertEqual(len(self.cache), 2)
+    
+    def test_retrieve_context_cached_until_corpus_changes(self):
+        """Test that repeat queries are served from the cache until documents are added"""
+        rag_system = ProductionRAGSystem()
+        # Keep web ingestion from changing the corpus between the calls
+        rag_system.fetch_web_results = lambda query, top_k: []
+        
+        first = rag_system.retrieve_context("What is Swift programming?", top_k=3)
+        embedded = rag_system.history_embeddings.stats()
+        second = rag_system.retrieve_context("what is swift programming", top_k=3)
+        self.assertEqual([doc.id for doc in first], [doc.id for doc in second])
+        self.assertEqual(rag_system.query_cache.stats()['exact_hits'], 1)
+        # An exact hit is answered from the normalized text alone, without embedding the query
+        self.assertEqual(rag_system.history_embeddings.stats(), embedded)
+        
+        rag_system.vector_store.add_documents(["Swift 6 adds strict concurrency checking"], ["Swift Blog"])
+        rag_system.retrieve_context("what is swift programming", top_k=3)
+        self.assertEqual(rag_system.query_cache.stats()['exact_hits'], 1)
+    
+    def test_write_interleaved_with_cached_retrieve(self):
+        """Test that a retrieve racing a write never caches old results under the new version"""
+        rag_system = ProductionRAGSystem()
+        rag_system.fetch_web_results = lambda query, top_k: []
+        content = "Zephyr widgets are assembled in orbital foundries"
+        rw_lock = rag_system.vector_store._rw_lock
+        write_lock = rw_lock.write_lock
+        
+        def racing_write_lock():
+            # Runs after the SQLite commit, before the writer publishes the new rows
+            rw_lock.write_lock = write_lock
+            rag_system.retrieve_context(content, top_k=3)
+            return write_lock()
+        rw_lock.write_lock = racing_write_lock
+        rag_system.vector_store.add_documents([content], ["Zephyr Docs"])
+        
+        results = rag_system.retrieve_context(content, top_k=3)
+        self.assertIn(content, [doc.content for doc in results])
+    
+    def test_retrieval_steps_pause_for_web_results(self):
+        """Test that the shared retrieval flow hands the web fetch to its caller, then caches the result"""
+        rag_system = ProductionRAGSystem()
+        rag_system.needs_web_results = lambda local_results, top_k: True
+        web_results = [{'content': "Flutter renders its own widgets with Skia", 'source': "Web: Flutter", 'url': ''}]
+        
+        steps = rag_system.retrieval_steps("What is Flutter?", top_k=3)
+        web_request, results = rag_system.advance(steps)
+        self.assertEqual(web_request, ("What is Flutter?", 3))
+        self.assertIsNone(results)
+        _, results = rag_system.advance(steps, web_results)
+        self.assertIn("Web: Flutter", [doc.source for doc in results])
+        
+        web_request, cached = rag_system.advance(rag_system.retrieval_steps("what is flutter", top_k=3))
+        self.assertIsNone(web_request)
+        self.assertEqual([doc.id for doc in cached], [doc.id for doc in results])
+    
+    def test_repeated_web_augmented_query_cached(self):
+        """Test that re-fetched web results already in the store don't invalidate the cache"""
+        rag_system = ProductionRAGSystem()
+        rag_system.needs_web_results = lambda local_results, top_k: True
+        rag_system.fetch_web_results = lambda query, top_k: [
+            {'content': "Kotlin Multiplatform shares code between Android and iOS", 'source': "Web: Kotlin", 'url': ''}
+        ]
+        
+        for _ in range(4):
+            rag_system.retrieve_context("What is Kotlin Multiplatform?", top_k=3)
+            rag_system.ingestion_worker.flush()
+        version = rag_system.vector_store.store_version
+        rag_system.retrieve_context("What is Kotlin Multiplatform?", top_k=3)
+        
+        self.assertEqual(rag_system.vector_store.store_version, version)
+        self.assertGreaterEqual(rag_system.query_cache.stats()['exact_hits'], 3)
+        self.assertLessEqual(rag_system.query_cache.stats()['invalidations'], 1)
+
+class TestSessionManager(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.temp_db = tempfile.mktemp(suffix='.db')
+        self.db = SQLiteConnectionManager(self.temp_db)
+        self.sessions = SessionManager(self.db, ConversationMemory, max_sessions=1)
+    
+    def tearDown(self):
+        """Clean up"""
+        self.db.close()
+        for path in (self.temp_db, f"{self.temp_db}-wal", f"{self.temp_db}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def test_sessions_isolated_and_reloaded_after_eviction(self):
+        """Test that sessions keep separate histories that survive eviction"""
+        self.sessions.add_exchange("alice", "What is SwiftUI?", "A declarative UI framework.")
+        self.sessions.add_exchange("bob", "What is Core ML?", "On-device machine learning.")
+        self.sessions.add_exchange("alice", "And Combine?", "Reactive streams.")
+        
+        self.assertEqual(self.sessions.stats()['evictions'], 2)
+        history = self.sessions.history("bob")
+        self.assertEqual([message['content'] for message in history],
+                         ["What is Core ML?", "On-device machine learning."])
+        self.assertEqual(len(self.sessions.get("alice").conversations), 2)
+        self.assertEqual(len(self.sessions), 1)
+    
+    def test_idle_sessions_evicted(self):
+        """Test that sessions idle past the timeout leave memory"""
+        sessions = SessionManager(self.db, ConversationMemory, idle_timeout=0.0)
+        sessions.add_exchange("alice", "Hello", "Hi there!")
+        sessions.get("bob")
+        
+        self.assertEqual(len(sessions), 1)
+        self.assertEqual(sessions.history("alice")[0]['content'], "Hello")
+    
+    def test_turns_written_behind_in_batches(self):
+        """Test that queued turns are visible before they are flushed and land in one transaction"""
+        writer = ConversationWriter(self.db, batch_size=100, flush_interval=60.0)
+        sessions = SessionManager(self.db, ConversationMemory, max_sessions=1, writer=writer)
+        for i in range(3):
+            sessions.add_exchange("alice", f"Question {i}", f"Answer {i}")
+        sessions.add_exchange("bob", "Hello", "Hi there!")
+        
+        self.assertEqual(len(sessions.get("alice").conversations), 3)
+        writer.close()
+        
+        stored = self.db.connection().execute('SELECT COUNT(*) FROM conversations').fetchone()[0]
+        self.assertEqual(stored, 4)
+        self.assertEqual(writer.stats()['batches'], 1)
+    
+    def test_turn_submitted_during_close_still_written(self):
+        """Test that close() racing a submit waits for it instead of stranding the turn"""
+        import threading
+        writer = ConversationWriter(self.db, flush_interval=0.01)
+        closing = threading.Thread(target=writer.close)
+        check_open = writer._check_open
+        def racing_check_open():
+            check_open()
+            # close() runs between the open check and the enqueue
+            closing.start()
+            closing.join(timeout=0.2)
+        writer._check_open = racing_check_open
+        writer.submit(("turn-1", "alice", "Q", "A", "", "{}", "2024-01-01T00:00:00"))
+        closing.join()
+        
+        stored = self.db.connection().execute('SELECT COUNT(*) FROM conversations').fetchone()[0]
+        self.assertEqual(stored, 1)
+        self.assertEqual(writer.pending("alice"), [])
+
+class TestContextWindow(unittest.TestCase):
+    
+    def test_window_trimmed_at_turn_boundaries(self):
+        """Test that the window drops whole turns once the token budget is spent"""
+        window = ContextWindow(token_budget=10, max_turns=5, separator="|")
+        for turn in ["one two three", "four five six", "seven eight nine", "ten eleven"]:
+            window.append(turn)
+        
+        self.assertEqual(window.text(), "four five six|seven eight nine|ten eleven")
+        self.assertEqual(window.tokens, 8)
+        self.assertEqual(window.text(max_turns=1), "ten eleven")
+    
+    def test_window_follows_ring_buffer(self):
+        """Test that the window stays consistent as old turns leave the history"""
+        window = ContextWindow(token_budget=100, max_turns=3, max_history=3)
+        for i in range(10):
+            window.append(f"turn {i} ")
+            self.assertLessEqual(len(window), 3)
+        
+        self.assertEqual(window.text(), "turn 7 turn 8 turn 9 ")
+        self.assertEqual(window.tokens, sum(count_tokens(f"turn {i} ") for i in (7, 8, 9)))
+    
+    def test_memory_manager_context_budget(self):
+        """Test that MemoryManager never cuts a message to fit its budget"""
+        memory = MemoryManager(context_window=12)
+        memory.add_exchange("What is Swift?", "A programming language.")
+        memory.add_exchange("Who makes it?", "Apple.")
+        
+        self.assertEqual(memory.get_context(), "User: Who makes it?\nAssistant: Apple.")
+        self.assertLessEqual(count_tokens(memory.get_context()), 12)
+
+class TestHistoryEmbeddingCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.encoded = []
+        def encode_many(texts):
+            self.encoded.extend(texts)
+            return [np.eye(4, dtype=np.float32)[len(text) % 4] for text in texts]
+        self.cache = HistoryEmbeddingCache(encode_many)
+    
+    def test_history_messages_encoded_once(self):
+        """Test that a follow-up turn only encodes the messages it has not seen"""
+        history = [{'role': 'user', 'content': 'What is Swift?'}, {'role': 'assistant', 'content': 'A language.'}]
+        self.cache.context_embedding("What is Swift?", [], session_id="alice")
+        self.cache.context_embedding("Who makes it?", history, session_id="alice")
+        
+        self.assertEqual(self.encoded, ["What is Swift?", "A language.", "Who makes it?"])
+    
+    def test_context_embedding_weighted_and_normalized(self):
+        """Test that the query dominates the blend and the result has unit length"""
+        history = [{'role': 'user', 'content': 'abcde'}]
+        embedding = self.cache.context_embedding("abc", history)
+        
+        self.assertAlmostEqual(float(np.linalg.norm(embedding)), 1.0, places=5)
+        self.assertGreater(embedding[3], embedding[1])
+    
+    def test_retrieval_with_history(self):
+        """Test that retrieval with history reuses the cached message embeddings"""
+        rag_system = ProductionRAGSystem()
+        history = [{'role': 'user', 'content': 'Tell me about Apple platforms'}]
+        rag_system.local_search("What is SwiftUI?", history, top_k=2)
+        rag_system.local_search("And Swift?", history, top_k=2)
+        
+        self.assertEqual(rag_system.history_embeddings.stats()['hits'], 1)
+
+class TestFactStore(unittest.TestCase):
+    
+    def setUp(self):
+        topics = ["swift", "coffee", "berlin", "cats"]
+        def encode(texts):
+            vectors = np.zeros((len(texts), len(topics)), dtype=np.float32)
+            for i, text in enumerate(texts):
+                for j, topic in enumerate(topics):
+                    vectors[i, j] = topic in text.lower()
+            return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-6)
+        self.facts = FactStore(encode, len(topics), max_facts=2)
+    
+    def test_duplicates_replaced_and_least_recent_evicted(self):
+        """Test that a restated fact replaces the old one and the store stays capped"""
+        self.facts.add("I work with Swift", timestamp="1")
+        self.facts.add("I like coffee", timestamp="2")
+        self.facts.add("I work with Swift at Apple", timestamp="3")
+        self.assertEqual([f["fact"] for f in self.facts.facts()], ["I like coffee", "I work with Swift at Apple"])
+        
+        self.facts.relevant("Swift tips", k=1)
+        self.facts.add("I am in Berlin", timestamp="4")
+        self.assertEqual([f["fact"] for f in self.facts.facts()], ["I work with Swift at Apple", "I am in Berlin"])
+        self.assertEqual(self.facts.stats()['evictions'], 1)
+    
+    def test_memory_manager_recalls_relevant_facts(self):
+        """Test that user context is chosen by relevance to the query"""
+        memory = MemoryManager(fact_store=self.facts)
+        memory.add_exchange("I like coffee", "Noted.")
+        memory.add_exchange("I am learning Swift", "Great!")
+        memory.add_exchange("What is SwiftUI?", "A UI framework.")
+        
+        self.assertEqual(len(memory.important_facts), 2)
+        self.assertEqual(memory.get_user_context("Good coffee in town?", max_facts=1), "User context: I like coffee")
+    
+    def test_memory_manager_loads_model_with_first_fact(self):
+        """Test that the fact store is built on the first fact, using an injected model"""
+        model = CachedEmbeddingModel("all-MiniLM-L6-v2")
+        memory = MemoryManager(embedding_model=model)
+        memory.add_exchange("What is SwiftUI?", "A UI framework.")
+        self.assertIsNone(memory._fact_store)
+        self.assertEqual(memory.get_user_context("SwiftUI"), "")
+        
+        memory.add_exchange("I am learning Swift", "Great!")
+        self.assertEqual(model.encoded, 1)
+        self.assertEqual(memory.get_user_context("Swift"), "User context: I am learning Swift")
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
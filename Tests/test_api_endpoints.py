@@ -14,7 +14,8 @@ class TestAPIEndpoints(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Set up class-level fixtures"""
-        cls.base_url = "http://localhost:5000/api"
+        # RAG_API_URL=http://localhost:8000 runs the same checks against the async server
+        cls.base_url = os.environ.get('RAG_API_URL', 'http://localhost:5000') + "/api"
         cls.wait_for_server()
     
     @classmethod
@@ -82,6 +83,75 @@ class TestAPIEndpoints(unittest.TestCase):
         self.assertIn('retrieved_context', data)
         self.assertIn('ready_for_llm', data)
     
+    def test_conversation_stream_endpoint(self):
+        """Test streaming conversation endpoint"""
+        payload = {
+            "message": "Tell me about iOS development",
+            "history": []
+        }
+        
+        response = requests.post(
+            f"{self.base_url}/conversation/stream",
+            json=payload,
+            stream=True
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+        
+        events = [json.loads(line) for line in response.iter_lines() if line]
+        self.assertEqual(events[0]['event'], 'local')
+        self.assertEqual(events[-1]['event'], 'final')
+        self.assertIn('retrieved_context', events[-1])
+        self.assertTrue(all(event['event'] in ('local', 'web', 'final') for event in events))
+    
+    def test_conversation_session_endpoint(self):
+        """Test that recorded turns are kept per session"""
+        import uuid
+        session_id = uuid.uuid4().hex
+        
+        response = requests.post(
+            f"{self.base_url}/conversation/exchange",
+            json={
+                "session_id": session_id,
+                "user_message": "What is SwiftUI?",
+                "assistant_response": "SwiftUI is Apple's declarative UI framework."
+            }
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['history_length'], 1)
+        
+        response = requests.post(
+            f"{self.base_url}/conversation",
+            json={"message": "How do I manage state in it?", "session_id": session_id}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['session_id'], session_id)
+    
+    def test_retrieve_batch_endpoint(self):
+        """Test batch retrieve endpoint"""
+        payload = {
+            "queries": [
+                "What is Swift programming?",
+                {"query": "How does SwiftUI work?", "top_k": 2}
+            ],
+            "top_k": 3
+        }
+        
+        response = requests.post(
+            f"{self.base_url}/retrieve_batch",
+            json=payload,
+            headers={"Content-Type": "application/json"}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([r['query'] for r in data['results']],
+                         ["What is Swift programming?", "How does SwiftUI work?"])
+        self.assertLessEqual(len(data['results'][1]['retrieved_documents']), 2)
+    
     def test_add_knowledge_endpoint(self):
         """Test add knowledge endpoint"""
         payload = {
@@ -0,0 +1,190 @@
+import unittest
+import json
+import threading
+import time
+import sys
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RAG_System.complete_rag_system import WebKnowledgeRetriever
+from RAG_System.ttl_cache import TTLCache
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves canned Wikipedia and DuckDuckGo responses; 'slow' queries stall"""
+    delay = 0.0
+    served = 0
+
+    def do_GET(self):
+        StubHandler.served += 1
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        if url.path.startswith('/api/rest_v1/page/summary/'):
+            title = url.path.rsplit('/', 1)[-1]
+            if title == 'slow':
+                time.sleep(self.delay)
+            if title == 'missing':
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = {'title': title, 'extract': f"Summary of {title}",
+                    'content_urls': {'desktop': {'page': f"https://en.wikipedia.org/wiki/{title}"}}}
+        elif url.path == '/w/api.php':
+            query = params['srsearch'][0]
+            body = {'query': {'search': [{'title': query, 'snippet': f"<b>Article</b> about {query}"}]}}
+        elif url.path == '/ddg/':
+            query = params['q'][0]
+            body = {'Abstract': f"Instant answer for {query}", 'AbstractURL': 'https://duckduckgo.com/x',
+                    'Heading': query, 'RelatedTopics': []}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestWebKnowledgeRetriever(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the stub server on a free local port"""
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def make_retriever(self, **kwargs):
+        return WebKnowledgeRetriever(wikipedia_url=self.base_url, duckduckgo_url=f"{self.base_url}/ddg/", **kwargs)
+
+    def test_all_sources_combined(self):
+        """Test that results from every source are merged in priority order"""
+        results = self.make_retriever().search_web("Swift", max_results=5)
+
+        sources = [r['source'] for r in results]
+        self.assertEqual(sources, ["Wikipedia: Swift", "Wikipedia: Swift", "DuckDuckGo: Swift"])
+        self.assertEqual(results[1]['content'], "Article about Swift")
+
+    def test_deadline_returns_partial_results(self):
+        """Test that a stalled source is dropped instead of delaying the response"""
+        StubHandler.delay = 2.0
+        retriever = self.make_retriever(deadline=0.5)
+
+        start = time.time()
+        results = retriever.search_web("slow")
+        elapsed = time.time() - start
+
+        self.assertLess(elapsed, 1.5)
+        self.assertNotIn("Summary of slow", [r['content'] for r in results])
+        self.assertIn("Article about slow", [r['content'] for r in results])
+
+    def test_concurrent_searches_share_pool(self):
+        """Test that simultaneous searches don't queue behind each other's stalled sources"""
+        StubHandler.delay = 1.5
+        retriever = self.make_retriever(deadline=0.5, concurrency=4)
+        results = [None] * 4
+        
+        def search(i):
+            results[i] = retriever.search_web("slow")
+        threads = [threading.Thread(target=search, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        for found in results:
+            self.assertIn("Article about slow", [r['content'] for r in found])
+
+    def test_queued_calls_cancelled_at_deadline(self):
+        """Test that source calls that never started are not run after the deadline"""
+        StubHandler.delay = 1.0
+        retriever = self.make_retriever(deadline=0.3, max_workers=1)
+        served = StubHandler.served
+        
+        self.assertEqual(retriever.search_web("slow"), [])
+        time.sleep(1.2)
+        self.assertEqual(StubHandler.served, served + 1)
+
+    def test_failed_source_is_skipped(self):
+        """Test that an unreachable source does not fail the search"""
+        retriever = WebKnowledgeRetriever(wikipedia_url=self.base_url,
+                                          duckduckgo_url="http://127.0.0.1:9/", source_timeout=0.5)
+        results = retriever.search_web("Swift")
+
+        self.assertTrue(all(r['source'].startswith("Wikipedia") for r in results))
+        self.assertGreater(len(results), 0)
+
+    def test_repeated_query_served_from_cache(self):
+        """Test that a normalized repeat of a query makes no HTTP requests"""
+        retriever = self.make_retriever(cache=TTLCache())
+        first = retriever.search_web("What is SwiftUI?")
+        
+        served = StubHandler.served
+        second = retriever.search_web("what is  swiftui")
+        
+        self.assertEqual(StubHandler.served, served)
+        self.assertEqual(first, second)
+        self.assertEqual(retriever.cache.stats()['hits'], 3)
+
+    def test_empty_results_cached_briefly(self):
+        """Test that empty results are cached with the negative TTL"""
+        retriever = self.make_retriever(cache=TTLCache(), negative_ttl=0.2, sources=("wikipedia_summary",))
+        self.assertEqual(retriever.search_web("missing"), [])
+        
+        served = StubHandler.served
+        retriever.search_web("missing")
+        self.assertEqual(StubHandler.served, served)
+        
+        time.sleep(0.3)
+        retriever.search_web("missing")
+        self.assertEqual(StubHandler.served, served + 1)
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        import tempfile
+        self.db_path = tempfile.mktemp(suffix='.db')
+        self.cache = TTLCache(maxsize=2, db_path=self.db_path)
+
+    def tearDown(self):
+        """Clean up"""
+        self.cache.close()
+        for path in (self.db_path, f"{self.db_path}-wal", f"{self.db_path}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_persistent_tier_trimmed_to_maxsize(self):
+        """Test that evictions keep the table at the most recently written maxsize entries"""
+        for i in range(5):
+            self.cache.put(f"query {i}", [f"result {i}"])
+
+        rows = self.cache.db.connection().execute(f'SELECT key FROM {self.cache.table} ORDER BY key').fetchall()
+        self.assertEqual([row[0] for row in rows], ["query 3", "query 4"])
+
+    def test_persistent_tier_survives_restart(self):
+        """Test that a new cache on the same file serves stored entries"""
+        self.cache.put("What is SwiftUI?", ["A UI framework"])
+
+        restarted = TTLCache(maxsize=2, db_path=self.db_path)
+        self.assertEqual(restarted.get("What is SwiftUI?"), ["A UI framework"])
+        restarted.close()
+
+if __name__ == '__main__':
+    unittest.main()
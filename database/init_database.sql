@@ -8,10 +8,18 @@ CREATE TABLE IF NOT EXISTS documents (
     embedding BLOB NOT NULL,
     metadata TEXT NOT NULL DEFAULT '{}',
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    faiss_id INTEGER UNIQUE, -- int64 row id in the FAISS IndexIDMap
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
+-- BM25 full-text index over documents for hybrid retrieval
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    content, source,
+    content='documents', content_rowid='faiss_id',
+    tokenize='porter unicode61'
+);
+
 -- Conversations table for chat history
 CREATE TABLE IF NOT EXISTS conversations (
     id TEXT PRIMARY KEY,